@@ -0,0 +1,347 @@
+"""
+Online anomaly detection on the live readings: what is normal for a location
+at this hour of the week, and which readings deviate sharply from it.
+
+Every reading updates an exponentially weighted mean and variance of current
+speed and delay (travel time - free flow travel time) for its location and
+hour of week, plus one for the location across all hours, which stands in
+until the hour-of-week state has seen enough readings. Each update is O(1).
+A reading alerts when its speed falls, or its delay rises, more than
+VISION_ANOMALY_Z standard deviations past the mean. Readings are clipped to
+that band before they update the state, so an incident does not drag the
+baseline along with it.
+
+Readings come from the live snapshot and from the ingest daemon: its
+micro-batches are read back from the history store (observe_store), from the
+last row id seen, which the checkpoint keeps across restarts.
+
+Alerts go to a bounded in-memory log (the Live Data page's System Alert
+banner and alert log) and are appended to VISION_ALERT_LOG as JSON lines.
+The state is checkpointed to VISION_ANOMALY_STATE at most every
+VISION_ANOMALY_CHECKPOINT seconds and loaded on start. In a pre-forked
+vision_service only the parent process holds a detector.
+
+    python anomaly_detector.py replay          # learn the baselines from the history store
+    python anomaly_detector.py alerts          # recent alerts from the checkpoint
+
+    VISION_ANOMALY_STATE=anomaly_state.npz   checkpoint path ("" disables)
+    VISION_ALERT_LOG=alerts.jsonl            alert log path ("" disables)
+    VISION_ANOMALY_ALPHA=0.1                 EWMA weight of the newest reading
+    VISION_ANOMALY_Z=4                       alert threshold, standard deviations
+    VISION_ANOMALY_CHECKPOINT=60             min seconds between checkpoints
+    VISION_ALERT_WINDOW=3600                 seconds an alert stays on the banner
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANOMALY_STATE = os.environ.get("VISION_ANOMALY_STATE", os.path.join(BASE_DIR, "anomaly_state.npz")) or None
+ALERT_LOG = os.environ.get("VISION_ALERT_LOG", os.path.join(BASE_DIR, "alerts.jsonl")) or None
+ANOMALY_ALPHA = float(os.environ.get("VISION_ANOMALY_ALPHA", 0.1))
+ANOMALY_Z = float(os.environ.get("VISION_ANOMALY_Z", 4))
+ANOMALY_CHECKPOINT = float(os.environ.get("VISION_ANOMALY_CHECKPOINT", 60))
+ALERT_WINDOW = float(os.environ.get("VISION_ALERT_WINDOW", 3600))
+
+WARMUP = 8              # readings before a state can raise alerts
+SPEED_FLOOR = 2.0       # km/h: least standard deviation, so a flat series
+DELAY_FLOOR = 30.0      # s:    doesn't alert on tiny wobbles
+COOLDOWN = 900          # s between alerts of one kind at one location
+ALERTS_KEPT = 200       # alerts kept in memory (and in the checkpoint)
+ALL_HOURS = -1          # hour-of-week slot of the location-wide state
+
+# State slots: [n, speed mean, speed variance, delay mean, delay variance]
+N, SPEED, SPEED_VAR, DELAY, DELAY_VAR = range(5)
+
+# traffic_data columns observe_frame needs, plus the row origin for observe_store
+STORED_COLUMNS = ["timestamp", "location_name", "currentSpeed", "delay_time", "source"]
+
+Alert = namedtuple("Alert", ["time", "location_name", "kind", "value", "expected", "z"])
+
+
+def hour_of_week(moment):
+    return moment.weekday() * 24 + moment.hour
+
+
+class AnomalyDetector:
+    def __init__(self, alpha=ANOMALY_ALPHA, z=ANOMALY_Z, path=ANOMALY_STATE, alert_log=ALERT_LOG,
+                 checkpoint_interval=ANOMALY_CHECKPOINT):
+        self.alpha = alpha
+        self.z = z
+        self.path = path
+        self.alert_log = alert_log
+        self.checkpoint_interval = checkpoint_interval
+        self._state = {}            # (location name, hour of week or ALL_HOURS) -> state slots
+        self._last_seen = {}        # location name -> time of the last reading observed
+        self._last_alert = {}       # (location name, kind) -> time of the last alert
+        self._alerts = deque(maxlen=ALERTS_KEPT)
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self.stored_id = None        # last history store row id observe_store has read
+        self._saved_at = time.monotonic()
+        self.counters = {"readings": 0, "repeats": 0, "alerts": 0, "checkpoints": 0}
+
+    @classmethod
+    def load(cls, path=ANOMALY_STATE, **kwargs):
+        detector = cls(path=path, **kwargs)
+        if path and os.path.exists(path):
+            detector._restore(path)
+        return detector
+
+    # ---------------- UPDATES ----------------
+    def observe(self, name, when, speed, delay):
+        # One reading at `when` (epoch seconds); returns the alerts it raised
+        with self._lock:
+            return self._observe(name, when, hour_of_week(datetime.fromtimestamp(when)), speed, delay)
+
+    def observe_results(self, results):
+        # FlowResults from the flow cache; each reading counts once however
+        # many viewers fetched it
+        import traffic_metrics
+
+        alerts = []
+        with self._lock:
+            for res in results:
+                flow = res.flow
+                if res.error is not None or flow is None:
+                    continue
+                speed, travel, free_flow = (flow.get("currentSpeed"), flow.get("currentTravelTime"),
+                                            flow.get("freeFlowTravelTime"))
+                if speed is None or travel is None or free_flow is None:
+                    continue
+                alerts.extend(self._observe(res.name, res.fetched_at,
+                                            hour_of_week(datetime.fromtimestamp(res.fetched_at)),
+                                            speed, float(traffic_metrics.delay(travel, free_flow))))
+        self.checkpoint()
+        return alerts
+
+    def observe_frame(self, df):
+        # History rows (timestamp, location_name, currentSpeed, delay_time) in time order
+        import pandas as pd
+
+        when = pd.to_datetime(df["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+        keep = (when.notna() & df["location_name"].notna() & df["currentSpeed"].notna()
+                & df["delay_time"].notna()).to_numpy()
+        when = when[keep]
+        # Stored timestamps are local wall-clock times; epochs like the live
+        # readings' fetched_at, converted once per distinct hour
+        hours = when.dt.floor("h")
+        starts = {hour: time.mktime(hour.timetuple()) for hour in hours.unique()}
+        epochs = hours.map(starts).to_numpy() + (when - hours).dt.total_seconds().to_numpy()
+        slots = (when.dt.dayofweek * 24 + when.dt.hour).to_numpy()
+        alerts = []
+        with self._lock:
+            for name, at, slot, speed, delay in zip(df["location_name"].to_numpy()[keep].tolist(), epochs.tolist(),
+                                                    slots.tolist(), df["currentSpeed"].to_numpy()[keep].tolist(),
+                                                    df["delay_time"].to_numpy()[keep].tolist()):
+                alerts.extend(self._observe(name, at, slot, speed, delay))
+        return alerts
+
+    def observe_store(self, store, chunk_rows=50_000):
+        # Readings the ingest daemon appended to the history store since the
+        # last call, in insertion order; the first call only marks the end.
+        # A concurrent call returns at once instead of reading them twice
+        if not self._store_lock.acquire(blocking=False):
+            return []
+        try:
+            last_id = store.last_id()
+            if self.stored_id is None or self.stored_id > last_id:
+                # First run, or the store was rebuilt under us
+                self.stored_id = last_id
+                return []
+            alerts = []
+            while self.stored_id < last_id:
+                rows = store.readings_since(self.stored_id, STORED_COLUMNS, chunk_rows)
+                if rows.empty:
+                    break
+                self.stored_id = int(rows["id"].iloc[-1])
+                alerts.extend(self.observe_frame(rows[rows["source"] == "ingest"]))
+            self.checkpoint()
+            return alerts
+        finally:
+            self._store_lock.release()
+
+    def _observe(self, name, when, slot, speed, delay):
+        # Caller holds self._lock; `slot` is the reading's hour of week
+        if when <= self._last_seen.get(name, -math.inf):
+            self.counters["repeats"] += 1
+            return []
+        self._last_seen[name] = when
+        self.counters["readings"] += 1
+
+        hourly = self._state.get((name, slot))
+        overall = self._state.get((name, ALL_HOURS))
+        if hourly is None:
+            hourly = self._state[(name, slot)] = [0, 0.0, 0.0, 0.0, 0.0]
+        if overall is None:
+            overall = self._state[(name, ALL_HOURS)] = [0, 0.0, 0.0, 0.0, 0.0]
+
+        # Judge against the hour of week once it is warm, else the location
+        baseline = hourly if hourly[N] >= WARMUP else overall
+        alerts = []
+        if baseline[N] >= WARMUP:
+            speed_sd = max(math.sqrt(baseline[SPEED_VAR]), SPEED_FLOOR)
+            delay_sd = max(math.sqrt(baseline[DELAY_VAR]), DELAY_FLOOR)
+            speed_z = (speed - baseline[SPEED]) / speed_sd
+            delay_z = (delay - baseline[DELAY]) / delay_sd
+            if speed_z <= -self.z:
+                alerts.append(self._alert(name, when, "speed_drop", speed, baseline[SPEED], speed_z))
+            if delay_z >= self.z:
+                alerts.append(self._alert(name, when, "delay_spike", delay, baseline[DELAY], delay_z))
+
+        for state in (hourly, overall):
+            self._update(state, speed, delay)
+        return [alert for alert in alerts if alert is not None]
+
+    def _update(self, state, speed, delay):
+        # EWMA mean/variance; once warm, readings are clipped to the alert band
+        if state[N] == 0:
+            state[:] = [1, speed, 0.0, delay, 0.0]
+            return
+        alpha = self.alpha
+        for value, mean, var, floor in ((speed, SPEED, SPEED_VAR, SPEED_FLOOR), (delay, DELAY, DELAY_VAR, DELAY_FLOOR)):
+            if state[N] >= WARMUP:
+                band = self.z * max(math.sqrt(state[var]), floor)
+                value = min(max(value, state[mean] - band), state[mean] + band)
+            diff = value - state[mean]
+            increment = alpha * diff
+            state[mean] += increment
+            state[var] = (1 - alpha) * (state[var] + diff * increment)
+        state[N] += 1
+
+    def _alert(self, name, when, kind, value, expected, z):
+        # Caller holds self._lock; None while the location/kind is cooling down
+        if when - self._last_alert.get((name, kind), -math.inf) < COOLDOWN:
+            return None
+        self._last_alert[(name, kind)] = when
+        alert = Alert(datetime.fromtimestamp(when).strftime("%Y-%m-%d %H:%M:%S"), name, kind,
+                      round(float(value), 1), round(float(expected), 1), round(float(z), 1))
+        self._alerts.append(alert)
+        self.counters["alerts"] += 1
+        if self.alert_log:
+            with open(self.alert_log, "a") as f:
+                f.write(json.dumps(alert._asdict()) + "\n")
+        return alert
+
+    # ---------------- READS ----------------
+    def alerts(self, limit=50, since=None):
+        # Newest first; `since` is a "YYYY-MM-DD HH:MM:SS" lower bound
+        with self._lock:
+            alerts = [alert for alert in reversed(self._alerts) if since is None or alert.time >= since]
+        return alerts[:limit]
+
+    def baseline(self, name, when):
+        # (readings, speed mean, speed sd, delay mean, delay sd) alerts at
+        # `when` would be judged against, or None while nothing is warm
+        with self._lock:
+            hourly = self._state.get((name, hour_of_week(datetime.fromtimestamp(when))))
+            state = hourly if hourly is not None and hourly[N] >= WARMUP else self._state.get((name, ALL_HOURS))
+            if state is None or state[N] < WARMUP:
+                return None
+            return (state[N], state[SPEED], math.sqrt(state[SPEED_VAR]), state[DELAY], math.sqrt(state[DELAY_VAR]))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters["states"] = len(self._state)
+            counters["locations"] = len(self._last_seen)
+        return counters
+
+    # ---------------- CHECKPOINT ----------------
+    def checkpoint(self, force=False):
+        # Save if the interval has passed since the last save (or `force`)
+        if not self.path or (not force and time.monotonic() - self._saved_at < self.checkpoint_interval):
+            return False
+        self.save(self.path)
+        return True
+
+    def save(self, path):
+        with self._lock:
+            keys = list(self._state)
+            last_seen = list(self._last_seen.items())
+            last_alert = list(self._last_alert.items())
+            arrays = {
+                "names": np.array([name for name, _ in keys], dtype=str),
+                "hours": np.array([hour for _, hour in keys], dtype=np.int16),
+                "state": np.array([self._state[key] for key in keys], dtype=np.float64).reshape(len(keys), 5),
+                "seen_names": np.array([name for name, _ in last_seen], dtype=str),
+                "seen_at": np.array([at for _, at in last_seen], dtype=np.float64),
+                "meta": np.array(json.dumps({
+                    "alpha": self.alpha,
+                    "stored_id": self.stored_id,
+                    "last_alert": [[name, kind, at] for (name, kind), at in last_alert],
+                    "alerts": [alert._asdict() for alert in self._alerts],
+                })),
+            }
+            self._saved_at = time.monotonic()
+            self.counters["checkpoints"] += 1
+        # Written aside and renamed, so a crash never leaves half a checkpoint
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    def _restore(self, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            state = data["state"].tolist()
+            self._state = {(name, int(hour)): row
+                           for name, hour, row in zip(data["names"].tolist(), data["hours"].tolist(), state)}
+            self._last_seen = dict(zip(data["seen_names"].tolist(), data["seen_at"].tolist()))
+        self._last_alert = {(name, kind): at for name, kind, at in meta["last_alert"]}
+        self.stored_id = meta.get("stored_id")
+        self._alerts.extend(Alert(**alert) for alert in meta["alerts"])
+
+
+def replay(store, detector, chunk_rows=200_000):
+    # Feed the stored history through the detector in time order
+    import pandas as pd
+
+    conn = store.connect()
+    alerts = 0
+    for chunk in pd.read_sql_query(
+            "SELECT timestamp, location_name, currentSpeed, delay_time FROM traffic_data ORDER BY timestamp",
+            conn, chunksize=chunk_rows):
+        alerts += len(detector.observe_frame(chunk))
+    return alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-location anomaly detection on traffic readings")
+    parser.add_argument("command", choices=["replay", "alerts"])
+    parser.add_argument("--state", default=ANOMALY_STATE, help="checkpoint path")
+    parser.add_argument("--fresh", action="store_true", help="replay into empty state instead of the checkpoint")
+    parser.add_argument("--limit", type=int, default=20, help="alerts to list")
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        from history_store import get_store
+        detector = AnomalyDetector(path=args.state) if args.fresh else AnomalyDetector.load(args.state)
+        store = get_store()
+        store.sync_csv()
+        started = time.perf_counter()
+        alerts = replay(store, detector)
+        elapsed = time.perf_counter() - started
+        stats = detector.stats()
+        print(f"{stats['readings']:,} readings in {elapsed:.2f}s ({stats['readings'] / max(elapsed, 1e-9):,.0f}/s), "
+              f"{stats['states']:,} states, {alerts} alerts")
+        if args.state:
+            detector.save(args.state)
+            print(f"saved {args.state}")
+        return
+
+    detector = AnomalyDetector.load(args.state)
+    for alert in detector.alerts(args.limit):
+        print(f"{alert.time}  {alert.location_name:<28} {alert.kind:<12} {alert.value:>8} "
+              f"(expected {alert.expected}, z {alert.z})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
+import html
+import os
+from datetime import datetime, timedelta
+
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import requests
-import pickle
-from datetime import datetime
+
+import instrumentation
+from instrumentation import span
+from live_monitor import LIVE_REFRESH
+
+# Pages import what they need (models, sklearn, matplotlib...) when they are
+# first shown, so a cold start that lands on Home loads none of it
+APP_CSS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.css")
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -14,159 +21,121 @@ st.set_page_config(
 )
 
 # ---------------- GLOBAL CSS ----------------
-st.markdown("""
-<style>
-/* Main Background */
-.stApp {
-    background: radial-gradient(circle at 50% 10%, #1a3c2f 0%, #050b08 60%);
-    color: #eafff4;
-}
-
-/* Hide Streamlit Header */
-header {visibility: hidden;}
-footer {visibility: hidden;}
-
-/* Custom Scrollbar */
-::-webkit-scrollbar {
-    width: 6px;
-    background: #050b08;
-}
-::-webkit-scrollbar-thumb {
-    background: #22e38a;
-    border-radius: 3px;
-}
-
-/* TYPEOGRAPHY */
-h1, h2, h3, h4, h5, h6, p, div, span {
-    font-family: 'Inter', sans-serif;
-}
-
-/* MAIN TITLE */
-.main-title {
-    font-size: 80px;
-    font-weight: 900;
-    text-align: center;
-    margin-bottom: 0px;
-    line-height: 1.1;
-    letter-spacing: -2px;
-}
-.green-text { 
-    color: #22e38a; 
-    text-shadow: 0 0 20px rgba(34,227,138,0.4);
-}
-.subtitle {
-    text-align: center;
-    font-size: 18px;
-    opacity: 0.7;
-    margin-top: 10px;
-    margin-bottom: 40px;
-    font-weight: 300;
-}
-
-/* GLASS CARDS */
-.glass-card {
-    background: rgba(12, 30, 24, 0.4);
-    border-radius: 12px;
-    padding: 24px;
-    border: 1px solid rgba(34,227,138,0.1);
-    backdrop-filter: blur(10px);
-    transition: all 0.3s ease;
-    height: 100%;
-}
-.glass-card:hover {
-    border-color: #22e38a;
-    transform: translateY(-5px);
-    box-shadow: 0 10px 30px rgba(34,227,138,0.1);
-}
-.card-icon {
-    font-size: 24px;
-    margin-bottom: 12px;
-    color: #22e38a;
-}
-.card-title {
-    font-size: 16px;
-    font-weight: 700;
-    margin-bottom: 8px;
-    color: #fff;
-}
-.card-desc {
-    font-size: 14px;
-    color: #8fa39a;
-    line-height: 1.5;
-}
-
-/* BUTTONS */
-.stButton button {
-    width: 100%;
-    border-radius: 30px;
-    height: 50px;
-    font-weight: 600;
-    border: none;
-    transition: 0.3s;
-    background: #1a3c2f; /* Dark Green Default */
-    color: #22e38a;
-    border: 1px solid #22e38a;
-}
-.stButton button:hover {
-    background: #22e38a;
-    color: #050b08;
-    box-shadow: 0 0 15px rgba(34,227,138,0.4);
-}
-
-/* Primary Button Override (Gradient Green) */
-div[data-testid="column"]:nth-of-type(1) .stButton button, 
-div[data-testid="stVerticalBlock"] > .stButton button {
-    background: linear-gradient(135deg, #1fcf82, #22e38a);
-    color: #050b08;
-    border: none;
-    box-shadow: 0 0 20px rgba(34,227,138,0.3);
-}
-div[data-testid="column"]:nth-of-type(1) .stButton button:hover,
-div[data-testid="stVerticalBlock"] > .stButton button:hover {
-    box-shadow: 0 0 30px rgba(34,227,138,0.6);
-    transform: scale(1.02);
-}
-
-/* Secondary Button Override */
-div[data-testid="column"]:nth-of-type(2) .stButton button {
-    background: rgba(34,227,138,0.1); /* Slight fill for better visibility */
-    border: 1px solid #22e38a;
-    color: #22e38a;
-}
-div[data-testid="column"]:nth-of-type(2) .stButton button:hover {
-    background: #22e38a;
-    color: #000;
-}
-
-/* FOOTER STATS */
-.footer-stat {
-    text-align: center;
-    padding: 20px;
-}
-.footer-val {
-    font-size: 28px;
-    font-weight: 800;
-    color: #22e38a;
-    margin-bottom: 5px;
-}
-.footer-label {
-    font-size: 14px;
-    color: #8fa39a;
-}
-
-/* SIDEBAR START */
-section[data-testid="stSidebar"] {
-    background-color: #050b08;
-    border-right: 1px solid #1a3c2f;
-}
-section[data-testid="stSidebar"] h2 {
-    color: white;
-    font-size: 24px;
-    margin-bottom: 30px;
-    padding-left: 10px;
-}
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def app_css():
+    # Read once per server process; reruns re-send the same style-only element,
+    # which st.html keeps out of the page layout
+    with open(APP_CSS, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+st.html(app_css())
+
+# ---------------- SHARED RESOURCES ----------------
+def get_backend():
+    # Models, the live flow cache, the forecaster and the history store live in
+    # one backend per process, or in vision_service.py when VISION_SERVICE_URL
+    # is set, so several dashboard processes share a single copy
+    from vision_service import get_backend
+    return get_backend()
+
+def location_page(names, key, search=False):
+    # Up to one page of locations as they are; past PAGE_SIZE a city filter
+    # (plus a search box) and a pager narrow them to one page, so selectboxes,
+    # tables, charts and live fetches stay page-sized however large the catalog
+    from location_catalog import PAGE_SIZE, get_catalog, paginate
+
+    if len(names) <= PAGE_SIZE:
+        return names
+    catalog = get_catalog()
+    columns = st.columns([2, 2, 1] if search else [4, 1])
+    with columns[0]:
+        city = st.selectbox("City", ["All cities"] + catalog.cities(names), key=f"{key}_city")
+    query = None
+    if search:
+        with columns[1]:
+            query = st.text_input("Search", key=f"{key}_search", placeholder="name, alias or id")
+    if city != "All cities" or query:
+        names = catalog.filter_names(names, None if city == "All cities" else city, query)
+    pages = max(1, -(-len(names) // PAGE_SIZE))
+    with columns[-1]:
+        page = st.selectbox("Page", range(1, pages + 1), key=f"{key}_page")
+    shown, _ = paginate(names, page)
+    st.caption(f"{len(names):,} locations · page {page} of {pages}")
+    return shown
+
+def live_page_ids(key):
+    # Catalog ids of the live locations on the current page (None: all of them)
+    from location_catalog import get_catalog
+
+    catalog = get_catalog()
+    names = [loc.name for loc in catalog.live]
+    shown = location_page(names, key)
+    return None if len(shown) == len(names) else [catalog.find(name).id for name in shown]
+
+@st.cache_resource
+def live_tables():
+    # Live Data tables shared by every session of this server process
+    from live_monitor import LiveTables
+    return LiveTables()
+
+def alert_text(alert):
+    name, at = html.escape(alert.location_name), alert.time[11:16]
+    if alert.kind == "speed_drop":
+        return f"{name}: speed {alert.value:.0f} km/h (usually {alert.expected:.0f}) at {at}"
+    return f"{name}: delay {alert.value:.0f}s (usually {alert.expected:.0f}s) at {at}"
+
+def alert_panel(backend, banner):
+    # System Alert banner with the anomaly detector's alerts of the last
+    # ALERT_WINDOW seconds (into the `banner` placeholder), then the alert log
+    from anomaly_detector import ALERT_WINDOW
+
+    alerts = backend.alerts()
+    since = (datetime.now() - timedelta(seconds=ALERT_WINDOW)).strftime("%Y-%m-%d %H:%M:%S")
+    recent = alerts[alerts["time"] >= since]
+    if recent.empty:
+        message = "Real-time data feed active. Fetching latest traffic flow segments."
+    else:
+        shown = " · ".join(alert_text(alert) for alert in recent.head(3).itertuples())
+        message = f"{len(recent)} incident(s) in the last {ALERT_WINDOW / 60:.0f} min. {shown}"
+    banner.markdown(f"""
+        <div style='background:rgba(255, 50, 50, 0.1); border:1px solid #ff3232; padding:10px; border-radius:8px; margin-bottom:20px'>
+            🔴 <b>System Alert:</b> {message}
+        </div>
+    """, unsafe_allow_html=True)
+    if not alerts.empty:
+        with st.expander(f"Alert log ({len(alerts)})"):
+            st.dataframe(alerts, width="stretch", hide_index=True)
+
+@st.fragment(run_every=LIVE_REFRESH)
+def live_monitor(live_ids):
+    # Auto-refresh: only this fragment reruns on each tick. Expired points are
+    # refetched through the shared cache, changed rows are rebuilt once for
+    # all viewers, and an unchanged table goes to the browser as a reference
+    # to its cached copy
+    from live_monitor import TREND_COLUMN, LiveView
+
+    backend = get_backend()
+    banner = st.empty()
+    view = st.session_state.setdefault("live_view", LiveView())
+    with span("live_update"):
+        flow_results, cache_stats = backend.live_snapshot(live_ids)
+        df, table = live_tables().table(flow_results, backend.live_trends)
+        changed = view.changed(flow_results)
+    for res in flow_results:
+        if res.error is not None:
+            st.error(f"Error fetching data for {res.name}: {res.error}")
+
+    if not df.empty:
+        st.dataframe(table, width="stretch", column_config={
+            TREND_COLUMN: st.column_config.LineChartColumn(TREND_COLUMN, width="medium"),
+        })
+        st.caption(
+            f"{len(changed)} of {len(df)} locations updated · refreshes every {LIVE_REFRESH:.0f}s · "
+            f"shared cache: {cache_stats['hit_rate']:.0%} hit rate · TTL {cache_stats['ttl']:.0f}s"
+        )
+    else:
+        st.warning("No data fetched. Please check API connection.")
+    alert_panel(backend, banner)
 
 # ---------------- NAVIGATION ----------------
 from streamlit_option_menu import option_menu
@@ -174,35 +143,6 @@ from streamlit_option_menu import option_menu
 with st.sidebar:
     # Custom Header
     st.markdown("""
-        <style>
-        .nav-header {
-            display: flex;
-            align-items: center;
-            padding: 10px 0px 20px 10px;
-        }
-        .logo-box {
-            background: #22e38a;
-            width: 40px;
-            height: 40px;
-            border-radius: 10px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            margin-right: 15px;
-            box-shadow: 0 0 15px rgba(34,227,138,0.4);
-        }
-        .logo-icon {
-            color: #050b08;
-            font-size: 24px;
-            font-weight: bold;
-        }
-        .app-name {
-            color: #22e38a;
-            font-size: 24px;
-            font-weight: 800;
-            letter-spacing: -1px;
-        }
-        </style>
         <div class="nav-header">
             <div class="logo-box">
                 <span class="logo-icon">⚡</span>
@@ -212,10 +152,16 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     # Navigation Menu
+    nav_options = ["Home", "Live Data", "Prediction", "Analytics"]
+    nav_icons = ["house", "broadcast", "activity", "bar-chart-fill"]
+    if instrumentation.ENABLED:
+        # Stage timing panel, only while span recording is on (VISION_PERF=1)
+        nav_options.append("Performance")
+        nav_icons.append("speedometer2")
     page = option_menu(
         menu_title=None,
-        options=["Home", "Live Data", "Prediction", "Analytics"],
-        icons=["house", "broadcast", "activity", "bar-chart-fill"],
+        options=nav_options,
+        icons=nav_icons,
         menu_icon="cast",
         default_index=0,
         key="nav_menu",
@@ -247,6 +193,9 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
 
+# Spans recorded from here on are attributed to this rerun
+instrumentation.begin_run(page)
+
 # ---------------- HOME PAGE ----------------
 if page == "Home":
     # 1) HERO SECTION
@@ -317,37 +266,33 @@ if page == "Home":
 # ---------------- PREDICTION PAGE ----------------
 elif page == "Prediction":
     st.markdown("<h1 style='text-align: center'>Traffic <span class='green-text'>Prediction</span></h1>", unsafe_allow_html=True)
+    backend = get_backend()
     
     # Validation flags
     models_loaded = False
     
     # Load Models & Encoders
     try:
-        # Load using joblib instead of pickle
-        import joblib
-        traffic_model = joblib.load('traffic_level_model.pkl')
-        vehicle_model = joblib.load('vehicle_count_model.pkl')
-        location_ohe = joblib.load('location_ohe.pkl')
-        date_encoder = joblib.load('date_encoder.pkl')
-        time_encoder = joblib.load('time_encoder.pkl')
-        traffic_le = joblib.load('traffic_label_encoder.pkl')
+        # Loaded once per process by the registry (or the service); reruns
+        # reuse the in-memory objects
+        with span("model_load"):
+            model_version, model_stats = backend.model_info()
             
         models_loaded = True
     except Exception as e:
         st.error(f"Error loading models: {e}")
         st.warning("Please ensure all 6 pickle files are in the directory.")
 
-    # Unique Locations (Loaded from CSV to ensure consistency)
+    # Unique Locations (from the history store, kept in sync with the CSV)
     try:
-        df_loc = pd.read_csv('vehicle_data.csv')
-        location_options = sorted(df_loc['location_name'].unique().tolist())
+        with span("history_sync"):
+            location_options = backend.location_names()
+        if not location_options:
+            raise ValueError("history store is empty")
     except:
-        # Fallback if CSV read fails
-        location_options = [
-            "Agra Fort, India", "Bangalore, India", "Bhopal, India", 
-            "Chandigarh, India", "Chennai, India", "India Gate, Delhi, India", 
-            "Kolkata, India", "Lucknow, India", "Mumbai, India", "Taj Mahal, India"
-        ]
+        # Fallback if CSV read fails: every location in the catalog
+        from location_catalog import get_catalog
+        location_options = get_catalog().names
 
     # Clean spacing
     st.markdown('<div style="height: 30px;"></div>', unsafe_allow_html=True)
@@ -361,7 +306,7 @@ elif page == "Prediction":
         # INPUTS
         st.markdown("### 📅 Trip Details")
         
-        selected_location = st.selectbox("Select Location", location_options)
+        selected_location = st.selectbox("Select Location", location_page(location_options, "predict", search=True))
         
         col_d, col_t = st.columns(2)
         with col_d:
@@ -371,61 +316,21 @@ elif page == "Prediction":
             
         st.markdown('<div style="height: 20px;"></div>', unsafe_allow_html=True)
         
-        if st.button("Predict Traffic & Count 🚀"):
+        col_predict, col_outlook = st.columns(2)
+        with col_predict:
+            predict_clicked = st.button("Predict Traffic & Count 🚀")
+        with col_outlook:
+            outlook_clicked = st.button("Short-Term Outlook ⏱️")
+
+        if predict_clicked:
             if models_loaded:
                 try:
-                    # 1. Prepare Data Frame for input
-                    
-                    # Transform Location (OneHotEncoder expects DataFrame)
-                    loc_df = pd.DataFrame({'location_name': [selected_location]})
-                    loc_encoded = location_ohe.transform(loc_df)
-                    loc_encoded_df = pd.DataFrame(
-                        loc_encoded, 
-                        columns=location_ohe.get_feature_names_out(['location_name'])
-                    )
-                    
-                    # Transform Date & Time (LabelEncoder expects 1D array/list)
-                    # Note: LabelEncoder encodes strings/values to integers. 
-                    # If the model expects One-Hot features for these, using LabelEncoder is unusual for linear models but ok for Trees.
-                    # We pass the raw value as a list.
-                    
-                    # IMPORTANT: LabelEncoders typically expect the exact strings seen during training.
-                    # If date/time are continuous or high-cardinality, LabelEncoder might fail on unseen data.
-                    # Assuming the training data covered these or handled them generically.
-                    # For safety, we will convert to string as they likely were during training.
-                    
-                    # Adjust format to match likely training format (YYYY-MM-DD and HH:MM)
-                    date_str = selected_date.strftime("%Y-%m-%d") if not isinstance(selected_date, str) else selected_date
-                    time_str = selected_time.strftime("%H:%M") if not isinstance(selected_time, str) else selected_time
-                    
-                    # Handle unseen labels for LabelEncoder (Naive approach: assign 0 or mode if error, but try/except block handles it)
-                    # Or check classes_ if needed. For now, try direct transform.
-                    
-                    # For safer execution in production, we should handle unseen labels, 
-                    # but let's try standard transform first.
-                    try:
-                        date_encoded_val = date_encoder.transform([date_str])[0]
-                    except ValueError:
-                         # Fallback for unseen date: use mode or 0
-                         date_encoded_val = 0 
-                         
-                    try:
-                        time_encoded_val = time_encoder.transform([time_str])[0]
-                    except ValueError:
-                         time_encoded_val = 0
-
-                    date_encoded = pd.DataFrame({'date': [date_encoded_val]})
-                    time_encoded = pd.DataFrame({'time': [time_encoded_val]})
-                    
-                    # Combine all features
-                    input_features = pd.concat([loc_encoded_df, date_encoded, time_encoded], axis=1)
-                    
-                    # PREDICT TRAFFIC LEVEL (Classification)
-                    traffic_pred_encoded = traffic_model.predict(input_features)
-                    traffic_level = traffic_le.inverse_transform(traffic_pred_encoded)[0]
-                    
-                    # PREDICT VEHICLE COUNT (Regression)
-                    vehicle_count = vehicle_model.predict(input_features)[0]
+                    # Inputs are encoded with the precompiled lookup tables
+                    # (identical to the sklearn encoders for known labels;
+                    # unseen dates/times resolve to the nearest known slot)
+                    with span("predict"):
+                        # Traffic level (classification) and vehicle count (regression)
+                        traffic_level, vehicle_count = backend.predict(selected_location, selected_date, selected_time)
                     
                     # Display Results
                     st.markdown("---")
@@ -460,17 +365,95 @@ elif page == "Prediction":
                     st.caption("Debug Info: Model/Encoder input mismatch.")
             else:
                 st.warning("Models are not loaded correctly.")
+
+        if outlook_clicked:
+            # 15/30/60-minute forecasts from the latest stored readings
+            try:
+                with span("flow_forecast"):
+                    outlook, train_stats = backend.outlook()
+                loc_outlook = outlook[outlook["location_name"] == selected_location]
+
+                st.markdown("---")
+                if not loc_outlook.empty:
+                    for col, row in zip(st.columns(len(loc_outlook)), loc_outlook.itertuples()):
+                        with col:
+                            st.markdown(f"""
+                                <div style="text-align:center; padding:10px;">
+                                    <div style="color:#8fa39a; font-size:14px; margin-bottom:5px">+{row.horizon_min} min</div>
+                                    <div style="color:#ffffff; font-size:24px; font-weight:bold;">{row.currentSpeed:.0f} km/h</div>
+                                    <div style="color:#8fa39a; font-size:12px;">Delay {row.delay_time:.0f}s · Ratio {row.speed_ratio:.2f}</div>
+                                </div>
+                            """, unsafe_allow_html=True)
+                    st.caption(f"Based on readings up to {loc_outlook['as_of'].iloc[0]}")
+                else:
+                    st.warning("No stored readings for this location yet.")
+
+                with st.expander("All Locations"):
+                    st.dataframe(outlook, use_container_width=True, hide_index=True)
+                    st.dataframe(train_stats, use_container_width=True, hide_index=True)
+            except Exception as e:
+                st.error(f"Outlook Error: {e}")
                 
         st.markdown('</div>', unsafe_allow_html=True)
         st.info("Select details to forecast traffic conditions using AI.")
 
+        if models_loaded:
+            with st.expander("Model Registry"):
+                cache = backend.prediction_stats()
+                st.caption(f"Version {model_version} · prediction cache {cache['hit_rate']:.0%} hit rate "
+                           f"({cache['hits']:,} hits, {cache['entries']:,} entries)")
+                st.dataframe(model_stats, use_container_width=True, hide_index=True)
+
+    # ---------------- NETWORK FORECAST (BATCH) ----------------
+    st.markdown('<div style="height: 40px;"></div>', unsafe_allow_html=True)
+    st.markdown("### 🗺️ Network Forecast")
+    st.caption("Every location × every time slot in one vectorized pass.")
+
+    col_fd, col_days, col_freq = st.columns(3)
+    with col_fd:
+        forecast_start = st.date_input("Start Date", datetime.now(), key="forecast_start")
+    with col_days:
+        forecast_days = st.selectbox("Days", [1, 2, 3, 7], key="forecast_days")
+    with col_freq:
+        forecast_freq = st.selectbox("Slot (minutes)", [60, 30, 15, 5, 1], key="forecast_freq")
+    forecast_locations = location_page(location_options, "forecast")
+
+    if st.button("Forecast All Locations 📈"):
+        if models_loaded:
+            try:
+                from batch_predict import vehicle_count_matrix
+                from chart_cache import get_chart_cache
+
+                with span("forecast"):
+                    forecast = backend.forecast_grid(forecast_locations, forecast_start, forecast_days, forecast_freq)
+                    matrix = vehicle_count_matrix(forecast)
+
+                # Heatmap: locations x time slots (re-rendered only when the forecast changes)
+                st.image(get_chart_cache().heatmap(matrix, forecast_days > 1), width="stretch")
+
+                st.dataframe(forecast, use_container_width=True, hide_index=True)
+                st.download_button("Download Forecast CSV", forecast.to_csv(index=False), "network_forecast.csv", "text/csv")
+            except Exception as e:
+                st.error(f"Forecast Error: {e}")
+        else:
+            st.warning("Models are not loaded correctly.")
+
 # ---------------- ANALYTICS PAGE ----------------
 elif page == "Analytics":
     st.markdown("# System <span class='green-text'>Analytics</span>", unsafe_allow_html=True)
+    import traffic_metrics
+    from chart_cache import get_chart_cache
+    backend = get_backend()
     
+    # Live snapshot from the shared flow cache (no dependency on the Live Data page)
+    live_ids = live_page_ids("analytics")
+    with span("live_fetch"):
+        flow_results, _ = backend.live_snapshot(live_ids)
+    from live_monitor import live_flow_frame
+    df_analytics, _ = live_flow_frame(flow_results)
+
     # Check if data exists
-    if 'traffic_data' in st.session_state and not st.session_state['traffic_data'].empty:
-        df_analytics = st.session_state['traffic_data']
+    if not df_analytics.empty:
         
         # Calculate Real KPIs
         avg_speed = df_analytics["Current Speed (km/h)"].mean()
@@ -498,65 +481,21 @@ elif page == "Analytics":
         st.markdown('<div style="height: 30px;"></div>', unsafe_allow_html=True)
         st.markdown("### Traffic Speed Analysis (Live Snapshot)")
 
+        # Charts are rendered once per distinct input and served as cached PNGs
+        charts = get_chart_cache()
+
         # Comparison Bar Chart
-        fig, ax = plt.subplots(figsize=(10, 5))
-        
-        # Set positions
-        x = range(len(df_analytics))
-        width = 0.35
-        
-        # Plot bars
-        ax.bar(x, df_analytics["Current Speed (km/h)"], width, label='Current Speed', color='#22e38a')
-        # Removed Free Flow Speed bar as requested
-        
-        # Styling
-        ax.set_facecolor('#050b08')
-        fig.patch.set_facecolor('#050b08')
-        ax.set_xticks(x)
-        ax.set_xticklabels(df_analytics["Location Name"], rotation=45, ha='right', color='#8fa39a', fontsize=8)
-        ax.tick_params(axis='y', colors='#8fa39a')
-        # Legend might not be needed if only one bar, but keeping for clarity or removing if preferred. 
-        # Since label is set, ax.legend() will show it. Let's keep it simple.
-        ax.legend(facecolor='#050b08', edgecolor='#22e38a', labelcolor='white')
-        ax.grid(color='#1a3c2f', linestyle='--', alpha=0.3)
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['bottom'].set_color('#1a3c2f')
-        ax.spines['left'].set_color('#1a3c2f')
-        
-        st.pyplot(fig)
+        st.image(charts.speed_bars(df_analytics), width="stretch")
         
         # --- Live Delay Analysis ---
         st.markdown('<div style="height: 30px;"></div>', unsafe_allow_html=True)
         st.markdown("### Live Traffic Delays by Location")
         
         # Calculate Delay per Location for Live Data
-        df_analytics['Live Delay (s)'] = df_analytics['Current Travel Time (s)'] - df_analytics['Free Flow Travel Time (s)']
-        
-        fig_d, axd = plt.subplots(figsize=(10, 5))
-        
-        # Set positions
-        x_d = range(len(df_analytics))
-        
-        # Plot bars for delay
-        colors = ['#ff3232' if d > 60 else '#ffa500' if d > 0 else '#22e38a' for d in df_analytics['Live Delay (s)']]
+        df_analytics['Live Delay (s)'] = traffic_metrics.delay(df_analytics['Current Travel Time (s)'],
+                                                               df_analytics['Free Flow Travel Time (s)'])
         
-        axd.bar(x_d, df_analytics['Live Delay (s)'], color=colors, alpha=0.8)
-        
-        # Styling
-        axd.set_facecolor('#050b08')
-        fig_d.patch.set_facecolor('#050b08')
-        axd.set_xticks(x_d)
-        axd.set_xticklabels(df_analytics["Location Name"], rotation=45, ha='right', color='#8fa39a', fontsize=8)
-        axd.set_ylabel("Delay (seconds)", color='#8fa39a')
-        axd.tick_params(axis='y', colors='#8fa39a')
-        axd.grid(color='#1a3c2f', linestyle='--', alpha=0.3)
-        axd.spines['top'].set_visible(False)
-        axd.spines['right'].set_visible(False)
-        axd.spines['bottom'].set_color('#1a3c2f')
-        axd.spines['left'].set_color('#1a3c2f')
-        
-        st.pyplot(fig_d)
+        st.image(charts.delay_bars(df_analytics), width="stretch")
         
         st.caption("Delay = Current Travel Time - Free Flow Travel Time")
 
@@ -566,172 +505,140 @@ elif page == "Analytics":
         
         # Load and Process Data for Charts
         try:
-            df_hist = pd.read_csv('vehicle_data.csv')
-            
-            # --- Data Processing ---
-            # Convert timestamp to datetime (Fix for format error)
-            # Handling DD-MM-YYYY HH:MM or similar formats with dayfirst=True
-            df_hist['timestamp'] = pd.to_datetime(
-                df_hist['timestamp'],
-                format="%Y-%m-%d %H:%M:%S",
-                errors="coerce"
-            )
-            
-            # Extract Hour
-            df_hist['hour'] = df_hist['timestamp'].dt.hour
-            
-            # Calculate Delay (Current Travel Time - Free Flow Travel Time)
-            # Assuming columns exist: 'currentTravelTime' and 'freeFlowTravelTime' based on typical TomTom data
-            # If not, we might need to rely on speed difference as a proxy or skip delay if cols missing.
-            # Let's check columns printed in previous step: 
-            # id,timestamp,latitude,longitude,location_name,frc,currentSpeed,freeFlowSpeed,currentTravelTime,freeFlowTravelTime,confidence
-            # (Hypothetical standard schema, checking 'currentSpeed' availability is confirmed)
-            
-            # Calculate averages by hour
-            hourly_stats = df_hist.groupby('hour').agg({
-                'currentSpeed': 'mean',
-                'currentTravelTime': 'mean',
-                'freeFlowTravelTime': 'mean'
-            }).reset_index()
-            
-            hourly_stats['avg_delay'] = hourly_stats['currentTravelTime'] - hourly_stats['freeFlowTravelTime']
-            
-            # --- Chart 1: Average Traffic Speed vs Hour ---
-            st.markdown("#### Average Traffic Speed Across the Day")
-            
-            fig1, ax1 = plt.subplots(figsize=(10, 4))
-            ax1.plot(hourly_stats['hour'], hourly_stats['currentSpeed'], marker='o', linestyle='-', color='#22e38a', linewidth=2, markersize=6)
-            
-            # Styling Chart 1
-            ax1.set_facecolor('#050b08')
-            fig1.patch.set_facecolor('#050b08')
-            ax1.set_xlabel("Time of Day (Hour)", color='#8fa39a', fontsize=10)
-            ax1.set_ylabel("Average Traffic Speed (km/h)", color='#8fa39a', fontsize=10)
-            ax1.set_title("Average Traffic Speed Across the Day", color='white', fontsize=12, pad=15)
-            ax1.tick_params(axis='x', colors='#8fa39a')
-            ax1.tick_params(axis='y', colors='#8fa39a')
-            ax1.grid(color='#1a3c2f', linestyle='--', alpha=0.3)
-            ax1.set_xticks(range(0, 24)) # Show all hours
-            
-            # Remove spines
-            ax1.spines['top'].set_visible(False)
-            ax1.spines['right'].set_visible(False)
-            ax1.spines['bottom'].set_color('#1a3c2f')
-            ax1.spines['left'].set_color('#1a3c2f')
-            
-            st.pyplot(fig1)
-            
-            # --- Chart 2: Average Traffic Delay vs Hour ---
-            st.markdown('<div style="height: 20px;"></div>', unsafe_allow_html=True)
-            st.markdown("#### Traffic Delay Pattern During the Day")
+            # Hourly means come pre-aggregated from the history store; syncing
+            # only parses rows appended to vehicle_data.csv since last time.
+            # A filtered slice reads only its own date/location partitions
+            from datetime import date as date_cls
+            from history_query import HistoryFilter
+            options = backend.history_filters()
+            f1, f2, f3 = st.columns([2, 3, 2])
+            start = end = None
+            if options["start"]:
+                first, last = date_cls.fromisoformat(options["start"]), date_cls.fromisoformat(options["end"])
+                with f1:
+                    history_dates = st.date_input("Date range", value=(first, last), min_value=first,
+                                                  max_value=last, key="history_dates")
+                # A full range (or an open end while picking) leaves that bound unrestricted
+                if history_dates and history_dates[0] > first:
+                    start = history_dates[0].isoformat()
+                if len(history_dates) > 1 and history_dates[1] < last:
+                    end = history_dates[1].isoformat()
+            with f2:
+                history_locations = st.multiselect("Locations", options["locations"], key="history_locations",
+                                                   placeholder="All locations")
+            with f3:
+                history_frcs = st.multiselect("Road class (FRC)", options["frcs"], key="history_frcs",
+                                              placeholder="All classes")
+
+            with span("history_query"):
+                hourly_stats = backend.hourly_profile(HistoryFilter(start, end, history_locations, history_frcs))
+            if hourly_stats.empty:
+                st.info("No historical readings match these filters.")
+            else:
+                st.caption(f"{int(hourly_stats['readings'].sum()):,} readings")
             
-            fig2, ax2 = plt.subplots(figsize=(10, 4))
-            ax2.plot(hourly_stats['hour'], hourly_stats['avg_delay'], marker='s', linestyle='--', color='#ff3232', linewidth=2, markersize=6)
+                # --- Chart 1: Average Traffic Speed vs Hour ---
+                st.markdown("#### Average Traffic Speed Across the Day")
             
-            # Styling Chart 2
-            ax2.set_facecolor('#050b08')
-            fig2.patch.set_facecolor('#050b08')
-            ax2.set_xlabel("Time of Day (Hour)", color='#8fa39a', fontsize=10)
-            ax2.set_ylabel("Average Traffic Delay (sec)", color='#8fa39a', fontsize=10)
-            ax2.set_title("Traffic Delay Pattern During the Day", color='white', fontsize=12, pad=15)
-            ax2.tick_params(axis='x', colors='#8fa39a')
-            ax2.tick_params(axis='y', colors='#8fa39a')
-            ax2.grid(color='#1a3c2f', linestyle='--', alpha=0.3)
-            ax2.set_xticks(range(0, 24))
+                st.image(charts.hourly_line(hourly_stats, 'currentSpeed', "Average Traffic Speed Across the Day",
+                                            "Average Traffic Speed (km/h)", '#22e38a'), width="stretch")
             
-            # Remove spines
-            ax2.spines['top'].set_visible(False)
-            ax2.spines['right'].set_visible(False)
-            ax2.spines['bottom'].set_color('#1a3c2f')
-            ax2.spines['left'].set_color('#1a3c2f')
+                # --- Chart 2: Average Traffic Delay vs Hour ---
+                st.markdown('<div style="height: 20px;"></div>', unsafe_allow_html=True)
+                st.markdown("#### Traffic Delay Pattern During the Day")
             
-            st.pyplot(fig2)
+                st.image(charts.hourly_line(hourly_stats, 'avg_delay', "Traffic Delay Pattern During the Day",
+                                            "Average Traffic Delay (sec)", '#ff3232', marker='s', linestyle='--'),
+                         width="stretch")
+
+                # --- Percentiles: the tails the means above hide ---
+                st.markdown('<div style="height: 20px;"></div>', unsafe_allow_html=True)
+                st.markdown("#### Speed and Delay Percentiles")
+                with span("history_percentiles"):
+                    tails = backend.percentiles(HistoryFilter(start, end, history_locations))
+                tails["metric"] = tails["metric"].map({"currentSpeed": "Speed (km/h)", "delay_time": "Delay (s)",
+                                                       "speed_ratio": "Speed Ratio"})
+                st.dataframe(tails.round(2), width="stretch", hide_index=True)
+                st.caption("From mergeable quantile sketches, within 1% of the exact values"
+                           + (" · all road classes (sketches are kept per location, date and hour)"
+                              if history_frcs else ""))
             
         except Exception as e:
             st.error(f"Could not load historical analytics: {e}")
             st.caption("Ensure 'vehicle_data.csv' has columns: timestamp, currentSpeed, currentTravelTime, freeFlowTravelTime")
+    else:
         # Empty State
         st.info("No live data available for analytics.")
         st.markdown("""
             <div style="text-align: center; padding: 40px; color: #8fa39a;">
-                Go to the <b>Live Data</b> page and click 'Refresh' to generate analytics.
+                The live traffic feed could not be reached. Check the API connection on the <b>Live Data</b> page.
             </div>
         """, unsafe_allow_html=True)
 
 # ---------------- LIVE DATA PAGE ----------------
 elif page == "Live Data":
     st.markdown("# Live <span class='green-text'>Monitoring</span>", unsafe_allow_html=True)
-    
-    st.markdown("""
-        <div style='background:rgba(255, 50, 50, 0.1); border:1px solid #ff3232; padding:10px; border-radius:8px; margin-bottom:20px'>
-            🔴 <b>System Alert:</b> Real-time data feed active. Fetching latest traffic flow segments.
-        </div>
-    """, unsafe_allow_html=True)
+    backend = get_backend()
 
-    # API Configuration
-    api_key = "VK1Ay21GpKGvAMvUrmpZUlyGOeRZI8pb"
-    
-    # 10 Locations (latitude, longitude)
-    locations = [
-        (27.1767, 78.0081, "Taj Mahal, Agra"),
-        (27.1879, 78.0129, "Agra Fort"),
-        (28.6129, 77.2295, "India Gate, Delhi"),
-        (19.0760, 72.8777, "Mumbai Central"),
-        (12.9716, 77.5946, "Bangalore City"),
-        (13.0827, 80.2707, "Chennai Central"),
-        (22.5726, 88.3639, "Kolkata"),
-        (26.8467, 80.9462, "Lucknow"),
-        (23.2599, 77.4126, "Bhopal"),
-        (30.7333, 76.7794, "Chandigarh")
-    ]
+    live_ids = live_page_ids("live")
+    auto_refresh = st.toggle("Auto-refresh", key="live_auto",
+                             help=f"Update the table every {LIVE_REFRESH:.0f}s with speed trends")
+    # Filled after the fetch, so the banner includes what it detected
+    banner = None if auto_refresh else st.empty()
 
-    if st.button("Refresh Live Data 🔄"):
+    if auto_refresh:
+        live_monitor(live_ids)
+    elif st.button("Refresh Live Data 🔄"):
         with st.spinner("Fetching live traffic data..."):
-            results = []
+            # Served from the shared cache; only expired points go upstream,
+            # concurrently over one pooled session
+            with span("live_fetch"):
+                flow_results, cache_stats = backend.live_snapshot(live_ids)
+            from live_monitor import live_flow_frame
+            df, errors = live_flow_frame(flow_results)
+            for name, error in errors:
+                st.error(f"Error fetching data for {name}: {error}")
             
-            for lat, lon, name in locations:
-                try:
-                    url = f"https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json?key={api_key}&point={lat},{lon}"
-                    response = requests.get(url)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        flow_data = data.get("flowSegmentData", {})
-                        
-                        current_speed = flow_data.get("currentSpeed", 0)
-                        free_flow_speed = flow_data.get("freeFlowSpeed", 0)
-                        confidence = flow_data.get("confidence", 0)
-                        current_travel_time = flow_data.get("currentTravelTime", 0)
-                        free_flow_travel_time = flow_data.get("freeFlowTravelTime", 0)
-                        
-                        # Calculate congestion level
-                        congestion = "Low"
-                        if current_speed < free_flow_speed * 0.5:
-                            congestion = "High"
-                        elif current_speed < free_flow_speed * 0.8:
-                            congestion = "Moderate"
-
-                        results.append({
-                            "Location Name": name,
-                            "Coordinates": f"{lat:.4f}, {lon:.4f}",
-                            "Current Speed (km/h)": current_speed,
-                            "Free Flow Speed (km/h)": free_flow_speed,
-                            "Current Travel Time (s)": current_travel_time,
-                            "Free Flow Travel Time (s)": free_flow_travel_time,
-                            "Congestion Level": congestion,
-                            "Confidence": f"{confidence * 100:.0f}%"
-                        })
-                except Exception as e:
-                    st.error(f"Error fetching data for {name}: {e}")
-            
-            if results:
-                df = pd.DataFrame(results)
-                st.session_state['traffic_data'] = df  # Save to session state for Analytics
+            if not df.empty:
                 st.dataframe(df, use_container_width=True)
+                st.caption(
+                    f"Shared cache: {cache_stats['hit_rate']:.0%} hit rate · "
+                    f"{cache_stats['upstream_calls']} API calls · TTL {cache_stats['ttl']:.0f}s"
+                )
                 st.success("Live data updated! Check the Analytics page for detailed insights.")
             else:
                 st.warning("No data fetched. Please check API connection.")
                 
     else:
-        st.info("Click the button above to fetch the latest real-time traffic data.")
+        # Show what the ingestion service (ingest_daemon.py) last wrote, if it is running
+        latest = backend.latest_live_readings()
+        if not latest.empty:
+            from live_monitor import live_table
+            df = live_table(latest)
+            st.caption(f"Latest readings from the ingestion service at {latest['timestamp'].iloc[0]}")
+            st.dataframe(df, use_container_width=True)
+        else:
+            st.info("Click the button above to fetch the latest real-time traffic data.")
+    if banner is not None:
+        alert_panel(backend, banner)
+
+# ---------------- PERFORMANCE PAGE ----------------
+elif page == "Performance":
+    st.markdown("# Stage <span class='green-text'>Timings</span>", unsafe_allow_html=True)
+
+    recorder = instrumentation.get_recorder()
+    last_runs = st.slider("Last N reruns", 1, 200, 20)
+    summary = recorder.summary(last_runs)
+
+    if not summary.empty:
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+        st.bar_chart(summary.set_index("stage")[["p50_ms", "p95_ms"]])
+        spans = recorder.frame(last_runs)
+        st.download_button("Download Spans (JSONL)", spans.to_json(orient="records", lines=True),
+                           "spans.jsonl", "application/x-ndjson")
+    else:
+        st.info("No spans recorded yet. Use the other pages, then come back here.")
 
+    exports = [f"JSONL → {recorder.jsonl_path}" if recorder.jsonl_path else None,
+               f"Prometheus → http://127.0.0.1:{recorder.server.server_port}/metrics" if recorder.server else None]
+    st.caption(" · ".join(e for e in [f"{recorder.run} reruns recorded"] + exports if e))
@@ -0,0 +1,85 @@
+"""
+Vectorized batch inference for the traffic level and vehicle count models.
+
+Builds the whole feature matrix for many (location, date, time) rows at once
+and calls each model's predict once per chunk, instead of running the
+single-row Prediction page path in a loop.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from feature_encoding import FeatureEncoder
+
+DEFAULT_CHUNK_SIZE = 200_000
+
+
+def build_features(models, locations, dates, times, encoder=None):
+    if encoder is None:
+        encoder = FeatureEncoder.from_models(models)
+    return encoder.frame(encoder.transform(locations, dates, times))
+
+
+def iter_predict_batch(models, locations, dates, times, chunk_size=DEFAULT_CHUNK_SIZE, encoder=None):
+    # Yields tidy frames chunk by chunk so millions of rows never need one
+    # feature matrix in memory at the same time
+    if encoder is None:
+        encoder = FeatureEncoder.from_models(models)
+    locations = np.asarray(locations, dtype=object)
+    dates = np.asarray(dates, dtype=object)
+    times = np.asarray(times, dtype=object)
+    traffic_le = models['traffic_le']
+
+    for start in range(0, len(locations), chunk_size):
+        stop = start + chunk_size
+        features = build_features(models, locations[start:stop], dates[start:stop], times[start:stop], encoder)
+        traffic_levels = traffic_le.inverse_transform(models['traffic_model'].predict(features))
+        vehicle_counts = models['vehicle_model'].predict(features)
+        yield pd.DataFrame({
+            'location_name': locations[start:stop],
+            'date': dates[start:stop],
+            'time': times[start:stop],
+            'traffic_level': traffic_levels,
+            'vehicle_count': vehicle_counts.astype(np.int64),  # truncated like the single-row display
+        })
+
+
+def predict_batch(models, locations, dates, times, chunk_size=DEFAULT_CHUNK_SIZE, encoder=None):
+    frames = list(iter_predict_batch(models, locations, dates, times, chunk_size, encoder))
+    if not frames:
+        return pd.DataFrame(columns=['location_name', 'date', 'time', 'traffic_level', 'vehicle_count'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def time_slots(freq_minutes=60):
+    # "HH:MM" labels for one day, matching the Prediction page time format
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 24 * 60, freq_minutes)]
+
+
+def grid_rows(locations, start_date, days=1, freq_minutes=60):
+    # (locations, dates, times) arrays covering every location x every time
+    # slot for `days` days starting at start_date
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+    day_labels = [(start_date + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)]
+    slots = time_slots(freq_minutes)
+
+    n_loc, n_day, n_slot = len(locations), len(day_labels), len(slots)
+    grid_locations = np.repeat(np.asarray(locations, dtype=object), n_day * n_slot)
+    grid_dates = np.tile(np.repeat(np.asarray(day_labels, dtype=object), n_slot), n_loc)
+    grid_times = np.tile(np.asarray(slots, dtype=object), n_loc * n_day)
+    return grid_locations, grid_dates, grid_times
+
+
+def forecast_grid(models, locations, start_date, days=1, freq_minutes=60, chunk_size=DEFAULT_CHUNK_SIZE,
+                  encoder=None):
+    # Every location x every time slot for `days` days starting at start_date
+    return predict_batch(models, *grid_rows(locations, start_date, days, freq_minutes), chunk_size, encoder)
+
+
+def vehicle_count_matrix(forecast):
+    # Location x (date, time) pivot for heatmaps
+    return forecast.pivot_table(
+        index='location_name', columns=['date', 'time'], values='vehicle_count', aggfunc='first'
+    )
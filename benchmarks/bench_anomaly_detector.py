@@ -0,0 +1,144 @@
+"""
+Anomaly detector throughput, detection quality and checkpoint cost.
+
+A synthetic stream: N locations polled every `--interval` minutes for
+`--weeks` weeks. Each location has its own free-flow speed and rush-hour
+dip (some are congested every evening), plus noise. Incidents (speed down to
+15-40% of normal for 2-6 readings, delay up accordingly) are injected
+into the last week. Compared on that week:
+
+    fixed      the dashboard's High congestion rule (speed < 50% of free flow)
+    detector   AnomalyDetector alerts (hour-of-week EWMA baselines)
+
+An incident counts as found if any reading in it is flagged/alerted;
+false alarms are flags on normal readings. Throughput is one core, readings
+fed one at a time through observe() and in batches through observe_frame().
+
+    python benchmarks/bench_anomaly_detector.py --locations 100 --weeks 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+import traffic_metrics
+from anomaly_detector import AnomalyDetector
+
+
+def make_stream(n_locations, weeks, interval_min, incidents, rng):
+    # Readings in time order plus the incident id of each (-1: normal)
+    steps = weeks * 7 * 24 * 60 // interval_min
+    start = pd.Timestamp("2025-06-02 00:00:00").value // 10**9
+    times = start + np.arange(steps) * interval_min * 60
+    hours = (times % 86400) / 3600
+    free_flow = rng.uniform(30, 70, n_locations)
+    # Morning and evening dips; the deepest ones drop below half of free flow
+    dip = rng.uniform(0.1, 0.65, n_locations)
+    shape = np.exp(-((hours - 9) ** 2) / 2) + np.exp(-((hours - 18.5) ** 2) / 3)
+    speed = free_flow[None, :] * (1 - dip[None, :] * shape[:, None])
+    speed = speed * rng.normal(1, 0.05, speed.shape)
+
+    incident = np.full(speed.shape, -1)
+    last_week = steps - 7 * 24 * 60 // interval_min
+    for k in range(incidents):
+        loc = rng.integers(n_locations)
+        at = rng.integers(last_week, steps - 6)
+        length = rng.integers(2, 7)
+        speed[at:at + length, loc] *= rng.uniform(0.15, 0.4)
+        incident[at:at + length, loc] = k
+
+    length_km = rng.uniform(0.5, 3, n_locations)
+    free_flow_time = length_km / free_flow * 3600
+    travel_time = length_km[None, :] / np.maximum(speed, 1) * 3600
+    names = np.array([f"Location {i:04d}" for i in range(n_locations)])
+    frame = pd.DataFrame({
+        "timestamp": pd.to_datetime(np.repeat(times, n_locations), unit="s").strftime("%Y-%m-%d %H:%M:%S"),
+        "epoch": np.repeat(times, n_locations).astype(float),
+        "location_name": np.tile(names, steps),
+        "currentSpeed": np.round(speed).ravel(),
+        "freeFlowSpeed": np.round(np.broadcast_to(free_flow, speed.shape)).ravel(),
+        "delay_time": np.round(travel_time - free_flow_time[None, :]).ravel(),
+        "incident": incident.ravel(),
+        "last_week": np.repeat(np.arange(steps) >= last_week, n_locations),
+    })
+    return frame
+
+
+def score(flags, frame):
+    # (incidents found, incidents, false alarms per 1000 normal readings)
+    week = frame["last_week"].to_numpy()
+    incident = frame["incident"].to_numpy()
+    flags = flags & week
+    found = len(np.unique(incident[flags & (incident >= 0)]))
+    total = len(np.unique(incident[incident >= 0]))
+    normal = week & (incident < 0)
+    return found, total, 1000 * (flags & normal).sum() / max(normal.sum(), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, default=100)
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=5, help="minutes between readings")
+    parser.add_argument("--incidents", type=int, default=200)
+    args = parser.parse_args()
+
+    frame = make_stream(args.locations, args.weeks, args.interval, args.incidents, np.random.default_rng(0))
+    print(f"{len(frame):,} readings: {args.locations} locations x {args.weeks} weeks every {args.interval} min, "
+          f"{args.incidents} incidents in the last week")
+
+    # Throughput: one reading at a time, then batches of one poll's worth of frames
+    detector = AnomalyDetector(path=None, alert_log=None)
+    rows = list(zip(frame["location_name"].tolist(), frame["epoch"].tolist(),
+                    frame["currentSpeed"].tolist(), frame["delay_time"].tolist()))
+    alerted = set()
+    start = time.process_time()
+    for name, at, speed, delay in rows:
+        for alert in detector.observe(name, at, speed, delay):
+            alerted.add((alert.location_name, alert.time))
+    single_s = time.process_time() - start
+
+    batched = AnomalyDetector(path=None, alert_log=None)
+    batch = 24 * 60 // args.interval * args.locations
+    start = time.process_time()
+    for offset in range(0, len(frame), batch):
+        batched.observe_frame(frame.iloc[offset:offset + batch])
+    batch_s = time.process_time() - start
+    print(f"\n{'path':<22} {'readings/s':>12} {'us/reading':>11}")
+    print(f"{'observe()':<22} {len(rows) / single_s:>12,.0f} {single_s / len(rows) * 1e6:>11.2f}")
+    print(f"{'observe_frame(1 day)':<22} {len(rows) / batch_s:>12,.0f} {batch_s / len(rows) * 1e6:>11.2f}")
+
+    # Detection on the last week
+    from datetime import datetime
+    stamps = [datetime.fromtimestamp(at).strftime("%Y-%m-%d %H:%M:%S") for at in frame["epoch"]]
+    detector_flags = np.array([(name, at) in alerted for name, at in zip(frame["location_name"], stamps)])
+    fixed_flags = (traffic_metrics.congestion_class(frame["currentSpeed"], frame["freeFlowSpeed"]) == "High")
+    print(f"\n{'rule':<10} {'incidents found':>16} {'false alarms/1k':>16}")
+    for label, flags in (("fixed", np.asarray(fixed_flags)), ("detector", detector_flags)):
+        found, total, false_rate = score(flags, frame)
+        print(f"{label:<10} {f'{found}/{total}':>16} {false_rate:>16.1f}")
+
+    # Checkpoint
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "anomaly_state.npz")
+        start = time.perf_counter()
+        detector.save(path)
+        save_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        restored = AnomalyDetector.load(path, alert_log=None)
+        load_ms = (time.perf_counter() - start) * 1000
+        same = restored.baseline(rows[-1][0], rows[-1][1]) == detector.baseline(rows[-1][0], rows[-1][1])
+        print(f"\ncheckpoint: {detector.stats()['states']:,} states, {os.path.getsize(path) / 1024:.0f} KB, "
+              f"save {save_ms:.1f} ms, load {load_ms:.1f} ms, restored state identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
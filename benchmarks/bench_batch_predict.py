@@ -0,0 +1,81 @@
+"""
+Rows/sec of the single-row Prediction page path vs batch_predict.
+
+    python benchmarks/bench_batch_predict.py --single-rows 200 --batch-rows 14400 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from batch_predict import predict_batch, time_slots
+from model_registry import get_registry
+
+
+def single_row_predict(models, location, date_str, time_str):
+    # The per-click path from the Prediction page, unchanged
+    location_ohe = models['location_ohe']
+    loc_encoded = location_ohe.transform(pd.DataFrame({'location_name': [location]}))
+    loc_encoded_df = pd.DataFrame(loc_encoded, columns=location_ohe.get_feature_names_out(['location_name']))
+    try:
+        date_encoded_val = models['date_encoder'].transform([date_str])[0]
+    except ValueError:
+        date_encoded_val = 0
+    try:
+        time_encoded_val = models['time_encoder'].transform([time_str])[0]
+    except ValueError:
+        time_encoded_val = 0
+    input_features = pd.concat(
+        [loc_encoded_df, pd.DataFrame({'date': [date_encoded_val]}), pd.DataFrame({'time': [time_encoded_val]})],
+        axis=1
+    )
+    traffic_level = models['traffic_le'].inverse_transform(models['traffic_model'].predict(input_features))[0]
+    vehicle_count = models['vehicle_model'].predict(input_features)[0]
+    return traffic_level, int(vehicle_count)
+
+
+def make_rows(models, n, seed=0):
+    rng = np.random.default_rng(seed)
+    locations = models['location_ohe'].categories_[0]
+    slots = np.asarray(time_slots(1), dtype=object)
+    return (
+        rng.choice(locations, n).astype(object),
+        np.full(n, "2025-05-12", dtype=object),
+        rng.choice(slots, n),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--single-rows", type=int, default=200)
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[14_400, 100_800, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    models = get_registry().load_all()
+
+    locations, dates, times = make_rows(models, args.single_rows)
+    start = time.perf_counter()
+    for row in zip(locations, dates, times):
+        single_row_predict(models, *row)
+    single_rate = args.single_rows / (time.perf_counter() - start)
+    print(f"{'path':<22} {'rows':>10} {'seconds':>9} {'rows/sec':>12}")
+    print(f"{'single-row loop':<22} {args.single_rows:>10} {args.single_rows / single_rate:>9.2f} {single_rate:>12,.0f}")
+
+    for n in args.batch_rows:
+        locations, dates, times = make_rows(models, n)
+        start = time.perf_counter()
+        predict_batch(models, locations, dates, times, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f"{'batch':<22} {n:>10} {elapsed:>9.2f} {n / elapsed:>12,.0f}  ({n / elapsed / single_rate:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
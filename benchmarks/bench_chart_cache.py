@@ -0,0 +1,112 @@
+"""
+Analytics chart rendering across simulated reruns: the old per-rerun pyplot
+figures (never closed, rendered the way st.pyplot does) against the cached
+PNG layer in chart_cache.py.
+
+    python benchmarks/bench_chart_cache.py --reruns 100 --change-every 20
+"""
+import argparse
+import gc
+import io
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from chart_cache import ChartCache
+from location_catalog import get_catalog
+
+
+def rss_mb():
+    # Current RSS from /proc where available, else peak RSS
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_inputs(rng):
+    names = [loc.name for loc in get_catalog().live]
+    live = pd.DataFrame({
+        "Location Name": names,
+        "Current Speed (km/h)": rng.integers(10, 60, len(names)),
+        "Live Delay (s)": rng.integers(-5, 120, len(names)),
+    })
+    hourly = pd.DataFrame({
+        "hour": np.arange(24),
+        "currentSpeed": rng.uniform(20, 50, 24),
+        "avg_delay": rng.uniform(0, 90, 24),
+    })
+    return live, hourly
+
+
+def legacy_rerun(live, hourly):
+    # What the page used to do: four new pyplot figures per rerun, never closed
+    for _ in range(2):
+        fig, ax = plt.subplots(figsize=(10, 5))
+        ax.bar(range(len(live)), live["Current Speed (km/h)"], color='#22e38a')
+        ax.set_xticks(range(len(live)))
+        ax.set_xticklabels(live["Location Name"], rotation=45, ha='right', fontsize=8)
+        fig.savefig(io.BytesIO(), format='png', bbox_inches='tight')
+    for column in ("currentSpeed", "avg_delay"):
+        fig, ax = plt.subplots(figsize=(10, 4))
+        ax.plot(hourly["hour"], hourly[column], marker='o', linewidth=2)
+        ax.set_xticks(range(0, 24))
+        fig.savefig(io.BytesIO(), format='png', bbox_inches='tight')
+
+
+def cached_rerun(charts, live, hourly):
+    charts.speed_bars(live)
+    charts.delay_bars(live)
+    charts.hourly_line(hourly, 'currentSpeed', "Average Traffic Speed Across the Day",
+                       "Average Traffic Speed (km/h)", '#22e38a')
+    charts.hourly_line(hourly, 'avg_delay', "Traffic Delay Pattern During the Day",
+                       "Average Traffic Delay (sec)", '#ff3232', marker='s', linestyle='--')
+
+
+def run(label, reruns, change_every, rerun):
+    rng = np.random.default_rng(0)
+    live, hourly = make_inputs(rng)
+    gc.collect()
+    rss_before = rss_mb()
+    timings = []
+    for i in range(reruns):
+        if change_every and i and i % change_every == 0:
+            live, hourly = make_inputs(rng)
+        start = time.perf_counter()
+        rerun(live, hourly)
+        timings.append(time.perf_counter() - start)
+    gc.collect()
+    timings = np.array(timings) * 1000
+    print(f"{label:<8} {reruns:>7} {timings.mean():>9.1f} {np.percentile(timings, 50):>8.1f} "
+          f"{np.percentile(timings, 95):>8.1f} {rss_mb() - rss_before:>10.1f} {len(plt.get_fignums()):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=100)
+    parser.add_argument("--change-every", type=int, default=20,
+                        help="new live/hourly data every N reruns (0 = never)")
+    args = parser.parse_args()
+
+    import warnings
+    warnings.filterwarnings("ignore", message="More than 20 figures")
+
+    print(f"{'mode':<8} {'reruns':>7} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'RSS +MB':>10} {'open figures':>12}")
+    charts = ChartCache()
+    run("cached", args.reruns, args.change_every, lambda live, hourly: cached_rerun(charts, live, hourly))
+    print(f"         renders={charts.stats['renders']} hits={charts.stats['hits']}")
+    run("legacy", args.reruns, args.change_every, legacy_rerun)
+
+
+if __name__ == "__main__":
+    main()
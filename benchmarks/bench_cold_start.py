@@ -0,0 +1,125 @@
+"""
+Cold start of the dashboard: for each page, a fresh Python process renders
+app.py once (Streamlit's AppTest, live data from the local TomTom stub) under
+`-X importtime`. Reported per page:
+
+    render ms   first script run, i.e. time to the first rendered page
+    import ms   modules the script itself imported (streamlit is already
+                loaded by then, as under `streamlit run`)
+    heavy       which of sklearn/matplotlib/joblib/pandas the page loaded
+
+With --baseline-rev the same is measured on that commit (extracted with
+`git archive`) for comparison. Target: Home loads no models, sklearn or
+matplotlib and renders at least 2x faster than before lazy imports (pandas
+still comes in with Streamlit's custom component call behind the navigation
+menu).
+
+    python benchmarks/bench_cold_start.py --baseline-rev 0227019 --repeats 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import numpy as np
+
+from tomtom_stub import start_stub
+
+PAGES = ("Home", "Live Data", "Prediction", "Analytics")
+HEAVY = ("sklearn", "matplotlib", "joblib", "pandas")
+MARKER = "-- app start --"
+
+# Runs in the child process; everything before MARKER is the test harness
+CHILD = """
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120)
+at.session_state["nav_menu"] = sys.argv[1]
+print(%r, file=sys.stderr, flush=True)
+start = time.perf_counter()
+at.run()
+render_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"render_ms": render_ms, "errors": [str(e.value) for e in at.exception],
+                  "heavy": [m for m in %r if m in sys.modules]}))
+""" % (MARKER, HEAVY)
+
+
+def import_ms(stderr):
+    # Sum of the cumulative times of top-level imports after the marker
+    total, started = 0, False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            started = True
+        elif started and line.startswith("import time:"):
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not name[1:].startswith(" "):
+                total += int(cumulative)
+    return total / 1000
+
+
+def cold_start(tree, page, stub_url):
+    env = {**os.environ, "TOMTOM_BASE_URL": stub_url, "PYTHONWARNINGS": "ignore"}
+    env.pop("VISION_SERVICE_URL", None)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD, page], cwd=tree, env=env,
+                          capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["import_ms"] = import_ms(proc.stderr)
+    return result
+
+
+def extract(rev, tmp):
+    archive = os.path.join(tmp, "baseline.tar")
+    subprocess.run(["git", "archive", "-o", archive, rev], cwd=ROOT, check=True)
+    tree = os.path.join(tmp, "baseline")
+    with tarfile.open(archive) as tar:
+        tar.extractall(tree)
+    return tree
+
+
+def measure(label, tree, pages, repeats, stub_url):
+    print(f"\n{label}")
+    print(f"{'page':<12} {'render ms':>10} {'import ms':>10}  heavy modules loaded")
+    renders = {}
+    for page in pages:
+        # Warm-up run so both trees start from the same OS file cache
+        cold_start(tree, page, stub_url)
+        runs = [cold_start(tree, page, stub_url) for _ in range(repeats)]
+        renders[page] = float(np.median([r["render_ms"] for r in runs]))
+        errors = runs[-1]["errors"]
+        print(f"{page:<12} {renders[page]:>10.0f} {np.median([r['import_ms'] for r in runs]):>10.0f}  "
+              f"{', '.join(runs[-1]['heavy']) or '-'}" + (f"  ERRORS: {errors}" if errors else ""))
+    return renders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", nargs="+", default=list(PAGES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline-rev", help="git revision to compare against")
+    args = parser.parse_args()
+
+    stub = start_stub(latency=0.05)
+    try:
+        current = measure("working tree", ROOT, args.pages, args.repeats, stub.base_url)
+        if args.baseline_rev:
+            with tempfile.TemporaryDirectory() as tmp:
+                baseline = measure(args.baseline_rev, extract(args.baseline_rev, tmp), args.pages,
+                                   args.repeats, stub.base_url)
+            print(f"\n{'page':<12} {'speedup':>8}")
+            for page in args.pages:
+                print(f"{page:<12} {baseline[page] / current[page]:>7.1f}x")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Forest pickles (joblib + sklearn) vs the compact .npz node tables.
+
+Cold load time and RSS are measured in a fresh interpreter per format, so the
+pickle side pays for importing sklearn just like the dashboard does. Latency
+is measured in this process for a single row and for a full day grid.
+
+    python compact_forest.py export                # once, if the .npz files are missing
+    python benchmarks/bench_compact_forest.py --repeats 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import joblib
+import numpy as np
+
+from batch_predict import build_features, time_slots
+from compact_forest import FORESTS, load_forest, validation_matrix
+from model_registry import ModelRegistry
+
+COLD_LOAD = """
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+def rss_kb():
+    with open("/proc/self/status") as f:
+        return next(int(l.split()[1]) for l in f if l.startswith("VmRSS"))
+before = rss_kb()
+start = time.perf_counter()
+if sys.argv[1] == "pickle":
+    import joblib
+    models = [joblib.load(p) for p in sys.argv[2:]]
+else:
+    sys.path.insert(0, {root!r})
+    from compact_forest import load_forest
+    models = [load_forest(p) for p in sys.argv[2:]]
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000, "rss_kb": rss_kb() - before}}))
+"""
+
+
+def cold_load(kind, paths, repeats):
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", COLD_LOAD.format(root=ROOT), kind, *paths],
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout))
+    return np.median([r["ms"] for r in runs]), np.median([r["rss_kb"] for r in runs])
+
+
+def forecast_features(models, days, freq_minutes):
+    locations = models["location_ohe"].categories_[0]
+    dates = [f"2025-05-{12 + d:02d}" for d in range(days)]
+    rows = [(loc, d, t) for loc in locations for d in dates for t in time_slots(freq_minutes)]
+    return build_features(models, *map(list, zip(*rows)))
+
+
+def latency(fn, X, repeats):
+    fn(X)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    pickles = [os.path.join(ROOT, p) for p in FORESTS]
+    compacts = [os.path.join(ROOT, c) for c in FORESTS.values()]
+    missing = [p for p in compacts if not os.path.exists(p)]
+    if missing:
+        sys.exit(f"missing {', '.join(map(os.path.basename, missing))}: run `python compact_forest.py export`")
+
+    print(f"{'format':<8} {'size KB':>9} {'cold load ms':>13} {'load RSS MB':>12}")
+    for kind, paths in (("pickle", pickles), ("compact", compacts)):
+        size = sum(os.path.getsize(p) for p in paths) / 1024
+        ms, rss = cold_load(kind, paths, args.repeats)
+        print(f"{kind:<8} {size:>9,.0f} {ms:>13.1f} {rss / 1024:>12.1f}")
+
+    models = ModelRegistry(ROOT).load_all()
+    _, X_random = validation_matrix(models)
+    # One click, the Forecast page's grids (every location x every slot) and
+    # random encoded rows that rarely share threshold intervals
+    inputs = [("single row", forecast_features(models, 1, 60).iloc[[8]]),
+              ("1 day x 1 min", forecast_features(models, 1, 1)),
+              ("7 days x 15 min", forecast_features(models, 7, 15)),
+              ("random", X_random)]
+
+    print(f"\n{'model':<26} {'input':<16} {'rows':>7} {'sklearn ms':>11} {'compact ms':>11} {'identical':>10}")
+    for pickle_path, compact_path in zip(pickles, compacts):
+        model = joblib.load(pickle_path)
+        compact = load_forest(compact_path)
+        for label, X in inputs:
+            same = np.array_equal(model.predict(X), compact.predict(X))
+            print(f"{os.path.basename(pickle_path):<26} {label:<16} {len(X):>7,} "
+                  f"{latency(model.predict, X, args.repeats):>11.2f} "
+                  f"{latency(compact.predict, X, args.repeats):>11.2f} {str(same):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-call feature encoding cost: sklearn encoders (the old Prediction page
+path) vs the precompiled FeatureEncoder lookup tables.
+
+    python benchmarks/bench_encoding.py --calls 2000
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from feature_encoding import FeatureEncoder
+from model_registry import get_registry
+
+
+def sklearn_encode(models, location, date_str, time_str):
+    location_ohe = models['location_ohe']
+    loc_encoded = location_ohe.transform(pd.DataFrame({'location_name': [location]}))
+    loc_encoded_df = pd.DataFrame(loc_encoded, columns=location_ohe.get_feature_names_out(['location_name']))
+    try:
+        date_encoded_val = models['date_encoder'].transform([date_str])[0]
+    except ValueError:
+        date_encoded_val = 0
+    try:
+        time_encoded_val = models['time_encoder'].transform([time_str])[0]
+    except ValueError:
+        time_encoded_val = 0
+    return pd.concat(
+        [loc_encoded_df, pd.DataFrame({'date': [date_encoded_val]}), pd.DataFrame({'time': [time_encoded_val]})],
+        axis=1
+    )
+
+
+def per_call_us(fn, rows):
+    start = time.perf_counter()
+    for row in rows:
+        fn(*row)
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--batch-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    models = get_registry().load_all()
+    encoder = FeatureEncoder.from_models(models)
+
+    rng = np.random.default_rng(0)
+    locations = models['location_ohe'].categories_[0]
+    known_dates = models['date_encoder'].classes_
+    known_times = models['time_encoder'].classes_
+    known = [(rng.choice(locations), rng.choice(known_dates), rng.choice(known_times)) for _ in range(args.calls)]
+    unseen = [(rng.choice(locations), "2026-01-15", f"{rng.integers(24):02d}:{rng.integers(60):02d}")
+              for _ in range(args.calls)]
+
+    print(f"{'labels':<8} {'sklearn (us/call)':>18} {'lookup (us/call)':>17} {'+ frame (us/call)':>18}")
+    for name, rows in (("known", known), ("unseen", unseen)):
+        before = per_call_us(lambda *r: sklearn_encode(models, *r), rows)
+        after = per_call_us(encoder.transform_one, rows)
+        framed = per_call_us(lambda *r: encoder.frame(encoder.transform_one(*r)), rows)
+        print(f"{name:<8} {before:>18.1f} {after:>17.1f} {framed:>18.1f}")
+
+    n = args.batch_rows
+    idx = rng.integers(len(known), size=n)
+    locs, dates, times = (np.array([known[i][k] for i in idx], dtype=object) for k in range(3))
+    start = time.perf_counter()
+    encoder.transform(locs, dates, times)
+    elapsed = time.perf_counter() - start
+    print(f"batch transform: {n:,} rows in {elapsed:.2f}s ({elapsed / n * 1e6:.2f} us/row)")
+
+
+if __name__ == "__main__":
+    main()
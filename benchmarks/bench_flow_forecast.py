@@ -0,0 +1,88 @@
+"""
+Short-horizon forecast latency (all locations x 15/30/60 min in one pass) and
+incremental window update cost, on synthetic 5-minute polling history.
+
+    python benchmarks/bench_flow_forecast.py --locations 10 1000 --days 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from flow_forecast import SIGNALS, FlowForecaster, LagWindows
+
+
+def synthetic_history(n_locations, days, poll_minutes, rng):
+    # Daily speed profile per location with a rush-hour dip and AR(1) noise
+    stamps = pd.date_range("2025-05-05", periods=days * 24 * 60 // poll_minutes, freq=f"{poll_minutes}min")
+    hours = (stamps.hour + stamps.minute / 60).to_numpy()
+    free_flow = rng.uniform(30, 70, n_locations)
+    free_time = rng.uniform(200, 1000, n_locations)
+    dip = 0.35 * (np.exp(-((hours - 9) ** 2) / 2) + np.exp(-((hours - 18) ** 2) / 2))
+    noise = np.zeros((len(stamps), n_locations))
+    for t in range(1, len(stamps)):
+        noise[t] = 0.8 * noise[t - 1] + rng.normal(0, 0.04, n_locations)
+    ratio = np.clip(0.85 - dip[:, None] + noise, 0.1, 1.2)
+    speed = free_flow[None, :] * ratio
+    delay = free_time[None, :] / ratio - free_time[None, :]
+    return pd.DataFrame({
+        "timestamp": np.repeat(stamps.strftime("%Y-%m-%d %H:%M:%S"), n_locations),
+        "location_name": np.tile([f"Location {i}" for i in range(n_locations)], len(stamps)),
+        "currentSpeed": speed.reshape(-1).round(),
+        "speed_ratio": ratio.reshape(-1).round(2),
+        "delay_time": delay.reshape(-1).round(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--poll-minutes", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'locations':>10} {'rows':>9} {'train s':>8} {'forecast p50 ms':>16} {'p95 ms':>8} "
+          f"{'update p50 ms':>14} {'15-min speed MAE (persistence)':>32}")
+    for n in args.locations:
+        history = synthetic_history(n, args.days, args.poll_minutes, rng)
+        polls = history["timestamp"].nunique()
+        # Hold the last poll back to time the incremental update
+        split = (polls - 1) * n
+        seed, last_poll = history.iloc[:split], history.iloc[split:]
+
+        start = time.perf_counter()
+        forecaster = FlowForecaster().fit(seed)
+        train_s = time.perf_counter() - start
+        windows = LagWindows()
+        windows.update(seed["location_name"].to_numpy(dtype=object), seed["timestamp"],
+                       seed[list(SIGNALS)].to_numpy())
+
+        forecast_ms = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            forecaster.forecast(windows)
+            forecast_ms.append((time.perf_counter() - start) * 1000)
+
+        update_ms = []
+        values = last_poll[list(SIGNALS)].to_numpy()
+        locations = last_poll["location_name"].to_numpy(dtype=object)
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            windows.update(locations, last_poll["timestamp"], values)
+            update_ms.append((time.perf_counter() - start) * 1000)
+
+        h15 = forecaster.train_stats[0]
+        mae = f"{h15.get('currentSpeed_mae', float('nan')):.2f} ({h15.get('currentSpeed_mae_persistence', float('nan')):.2f})"
+        print(f"{n:>10} {len(history):>9,} {train_s:>8.2f} {np.percentile(forecast_ms, 50):>16.2f} "
+              f"{np.percentile(forecast_ms, 95):>8.2f} {np.percentile(update_ms, 50):>14.2f} {mae:>32}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Geo-tagging throughput over NumPy coordinate arrays, for the shipped landmark
+table and for synthetic tables with thousands of hubs.
+
+First, a correctness case with mixed radii: small landmarks next to and
+inside cities with wide radii must tag every point exactly like a brute-force
+search for the nearest landmark whose radius covers it; exits 1 if not.
+
+    python benchmarks/bench_geo_tagging.py --points 1000000 10000000 --landmarks 10 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from geo_tagging import EARTH_RADIUS_KM, GeoTagger
+
+
+def make_tagger(n_landmarks, rng):
+    if n_landmarks == 10:
+        return GeoTagger.from_config()
+    # Hubs scattered over India's bounding box
+    lats = rng.uniform(8.0, 35.0, n_landmarks)
+    lons = rng.uniform(68.0, 97.0, n_landmarks)
+    landmarks = [{"name": f"Hub {i}", "latitude": lat, "longitude": lon}
+                 for i, (lat, lon) in enumerate(zip(lats, lons))]
+    return GeoTagger(landmarks, max_distance_km=1.5)
+
+
+def mixed_radius_check(rng, n_landmarks=200, n_points=20_000):
+    # 1-3 km landmarks and 20-60 km cities around Delhi, points all over the area
+    lats = rng.uniform(27.5, 29.5, n_landmarks)
+    lons = rng.uniform(76.0, 78.5, n_landmarks)
+    radii = np.where(rng.random(n_landmarks) < 0.1, rng.uniform(20, 60, n_landmarks),
+                     rng.uniform(1, 3, n_landmarks))
+    # The smallest case: A (1 km) is 2.2 km away, the city (50 km) 8.9 km
+    lats = np.append(lats, [0.0, 0.0])
+    lons = np.append(lons, [0.0, 0.1])
+    radii = np.append(radii, [1.0, 50.0])
+    tagger = GeoTagger([{"name": f"Landmark {i}", "latitude": lat, "longitude": lon, "radius_km": r}
+                        for i, (lat, lon, r) in enumerate(zip(lats, lons, radii))])
+    lat = np.append(rng.uniform(27.0, 30.0, n_points), 0.0)
+    lon = np.append(rng.uniform(75.5, 79.0, n_points), 0.02)
+
+    # Haversine distance from every point to every landmark
+    p_lat, p_lon, l_lat, l_lon = map(np.radians, (lat[:, None], lon[:, None], lats[None], lons[None]))
+    a = np.sin((l_lat - p_lat) / 2) ** 2 + np.cos(p_lat) * np.cos(l_lat) * np.sin((l_lon - p_lon) / 2) ** 2
+    km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    km = np.where(km <= radii[None], km, np.inf)
+    expected = np.where(np.isfinite(km).any(axis=1), km.argmin(axis=1), len(lats))
+
+    index, _ = tagger.nearest(lat, lon)
+    ok = bool((index == expected).all())
+    print(f"mixed radii: {n_points + 1:,} points, {len(lats)} landmarks, "
+          f"{np.mean(expected < len(lats)):.1%} covered, matches brute force: {'yes' if ok else 'NO'}\n")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[10, 5000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ok = mixed_radius_check(rng)
+    print(f"{'landmarks':>10} {'points':>12} {'seconds':>9} {'points/sec':>14} {'tagged':>8}")
+    for n_landmarks in args.landmarks:
+        tagger = make_tagger(n_landmarks, rng)
+        for n in args.points:
+            # Half the points jittered around a landmark, half anywhere
+            pick = rng.integers(len(tagger.names), size=n)
+            lat = tagger.latitudes[pick] + rng.normal(0, 0.005, n)
+            lon = tagger.longitudes[pick] + rng.normal(0, 0.005, n)
+            anywhere = rng.random(n) < 0.5
+            lat[anywhere] = rng.uniform(8.0, 35.0, anywhere.sum())
+            lon[anywhere] = rng.uniform(68.0, 97.0, anywhere.sum())
+
+            start = time.perf_counter()
+            tags = tagger.tag(lat, lon)
+            elapsed = time.perf_counter() - start
+            tagged = np.mean(tags != tagger.unknown)
+            print(f"{n_landmarks:>10} {n:>12,} {elapsed:>9.2f} {n / elapsed:>14,.0f} {tagged:>8.1%}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
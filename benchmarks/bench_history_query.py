@@ -0,0 +1,97 @@
+"""
+Filtered hourly profiles: latency versus history size for fixed slices.
+
+Stores are built from vehicle_data.csv repeated `scale` times (as in
+bench_rollups). Each slice is answered three ways:
+
+    csv          read_csv of the whole history, then filter and group (the
+                 cost of adding the filters on top of the old full read)
+    raw          traffic_data with the filters pushed into its indexes and
+                 only the four profile columns read
+    partitions   the date/location/FRC partitions (what the page uses)
+
+The raw and partitions answers are checked against each other. A slice's
+partitions time should stay flat as the history around it grows.
+
+    python benchmarks/bench_history_query.py --scales 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from bench_rollups import write_history
+from history_query import PROFILE_COLUMNS, HistoryFilter, hourly_profile, verify
+from history_store import HistoryStore
+
+SLICES = [
+    ("one day", HistoryFilter("2025-06-01", "2025-06-01")),
+    ("one week", HistoryFilter("2025-06-01", "2025-06-07")),
+    ("location x month", HistoryFilter("2025-06-01", "2025-06-30", ["India Gate, Delhi, India"])),
+    ("FRC1 x month", HistoryFilter("2025-06-01", "2025-06-30", frcs=["FRC1"])),
+    ("everything", HistoryFilter()),
+]
+
+
+def csv_profile(csv_path, filters):
+    df = pd.read_csv(csv_path, usecols=PROFILE_COLUMNS + ["location_name", "frc"])
+    day = df["timestamp"].str[:10]
+    keep = np.ones(len(df), dtype=bool)
+    if filters.start:
+        keep &= day >= filters.start
+    if filters.end:
+        keep &= day <= filters.end
+    if filters.locations:
+        keep &= df["location_name"].isin(filters.locations)
+    if filters.frcs:
+        keep &= df["frc"].isin(filters.frcs)
+    df = df[keep]
+    return df.groupby(pd.to_datetime(df["timestamp"]).dt.hour)[PROFILE_COLUMNS[1:]].mean()
+
+
+def timed(fn, repeats):
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = os.path.join(tmp, f"history_{scale}x.csv")
+            write_history(scale, csv_path)
+            store = HistoryStore(os.path.join(tmp, f"history_{scale}x.db"))
+            store.sync_csv(csv_path)
+            partitions = store.connect().execute("SELECT COUNT(*) FROM rollup_date_location_frc_hour").fetchone()[0]
+            print(f"\n{scale}x: {store.row_count():,} readings, {partitions:,} partition rows")
+            print(f"  {'slice':<18} {'readings':>9} {'csv ms':>9} {'raw ms':>9} {'partitions ms':>14}  match")
+            for label, filters in SLICES:
+                _, csv_ms = timed(lambda: csv_profile(csv_path, filters), 1)
+                runs = [verify([filters], store)[0] for _ in range(args.repeats)]
+                profile, _ = timed(lambda: hourly_profile(filters, store), 1)
+                raw_ms = np.median([r[1] for r in runs])
+                partitions_ms = np.median([r[2] for r in runs])
+                ok = all(r[3] for r in runs)
+                print(f"  {label:<18} {int(profile['readings'].sum()):>9,} {csv_ms:>9.1f} {raw_ms:>9.2f} "
+                      f"{partitions_ms:>14.2f}  {'yes' if ok else 'NO'}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
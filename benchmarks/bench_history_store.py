@@ -0,0 +1,81 @@
+"""
+Analytics page data path: re-reading vehicle_data.csv on every render vs
+reading materialized aggregates from the history store, as history grows.
+
+    python benchmarks/bench_history_store.py --scales 1 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from history_store import HISTORY_CSV, HistoryStore
+
+
+def write_scaled_csv(path, scale):
+    # Repeat the shipped history `scale` times with fresh ids
+    base = pd.read_csv(HISTORY_CSV)
+    with open(path, "w", newline="") as f:
+        for i in range(scale):
+            chunk = base.assign(id=range(i * len(base) + 1, (i + 1) * len(base) + 1))
+            chunk.to_csv(f, index=False, header=(i == 0))
+    return len(base) * scale
+
+
+def csv_render(path):
+    # What the Analytics page used to do on every rerun
+    df_hist = pd.read_csv(path)
+    df_hist['timestamp'] = pd.to_datetime(df_hist['timestamp'], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    df_hist['hour'] = df_hist['timestamp'].dt.hour
+    hourly_stats = df_hist.groupby('hour').agg({
+        'currentSpeed': 'mean', 'currentTravelTime': 'mean', 'freeFlowTravelTime': 'mean'
+    }).reset_index()
+    hourly_stats['avg_delay'] = hourly_stats['currentTravelTime'] - hourly_stats['freeFlowTravelTime']
+    sorted(df_hist['location_name'].unique().tolist())
+    return hourly_stats
+
+
+def store_render(store, path):
+    store.sync_csv(path)
+    store.location_names()
+    return store.hourly_profile()
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'csv render (ms)':>16} {'store render (ms)':>18} {'initial sync (s)':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = os.path.join(tmp, f"history_{scale}.csv")
+            rows = write_scaled_csv(csv_path, scale)
+            store = HistoryStore(os.path.join(tmp, f"history_{scale}.db"))
+
+            start = time.perf_counter()
+            store.sync_csv(csv_path)
+            initial_sync = time.perf_counter() - start
+
+            csv_ms = best_of(lambda: csv_render(csv_path), args.repeats) * 1000
+            store_ms = best_of(lambda: store_render(store, csv_path), args.repeats) * 1000
+            print(f"{rows:>12,} {csv_ms:>16.1f} {store_ms:>18.2f} {initial_sync:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Per-span overhead of instrumentation.span() with recording off (the default)
+and on, against a bare loop.
+
+    python benchmarks/bench_instrumentation.py --iterations 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+from instrumentation import span
+
+
+def bare(n):
+    for _ in range(n):
+        pass
+
+
+def spanned(n):
+    for _ in range(n):
+        with span("bench"):
+            pass
+
+
+def per_call_ns(fn, n):
+    start = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    base = per_call_ns(bare, args.iterations)
+    instrumentation.ENABLED = False
+    disabled = per_call_ns(spanned, args.iterations)
+    instrumentation.ENABLED = True
+    # Enabled spans read /proc twice; fewer iterations keep the run short
+    enabled = per_call_ns(spanned, max(1, args.iterations // 10))
+    instrumentation.ENABLED = False
+
+    print(f"{'mode':<10} {'ns/span':>10}")
+    print(f"{'bare loop':<10} {base:>10.0f}")
+    print(f"{'disabled':<10} {disabled - base:>10.0f}")
+    print(f"{'enabled':<10} {enabled - base:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Serial requests.get loop (the old Live Data refresh) vs FlowFetcher,
+both against the local TomTom stub with injected latency.
+
+    python benchmarks/bench_live_fetch.py --latency 0.2 --sizes 10 100 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from live_fetch import FlowFetcher
+from tomtom_stub import start_stub
+
+
+def make_locations(n):
+    return [(12.0 + i * 0.01, 77.0 + i * 0.01, f"Point {i}") for i in range(n)]
+
+
+def serial_refresh(base_url, locations):
+    # Mirrors the original handler: bare requests.get, one location at a time
+    for lat, lon, _ in locations:
+        url = f"{base_url}/traffic/services/4/flowSegmentData/absolute/10/json?key=stub&point={lat},{lon}"
+        requests.get(url).json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--serial-max", type=int, default=100, help="skip the serial path above this size")
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency)
+    fetcher = FlowFetcher("stub", base_url=stub.base_url, max_workers=args.workers)
+
+    print(f"stub latency {args.latency * 1000:.0f} ms, {args.workers} workers")
+    print(f"{'locations':>10} {'serial (s)':>12} {'concurrent (s)':>15}")
+    for n in args.sizes:
+        locations = make_locations(n)
+
+        serial = "-"
+        if n <= args.serial_max:
+            start = time.perf_counter()
+            serial_refresh(stub.base_url, locations)
+            serial = f"{time.perf_counter() - start:.2f}"
+
+        start = time.perf_counter()
+        results = fetcher.fetch_all(locations)
+        concurrent = time.perf_counter() - start
+        failed = sum(r.error is not None for r in results)
+        print(f"{n:>10} {serial:>12} {concurrent:>15.2f}" + (f"  ({failed} failed)" if failed else ""))
+
+    fetcher.close()
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Live Data updates per connected viewer: manual refresh vs auto-refresh.
+
+Each configuration runs in a fresh process with a synthetic catalog of N live
+points (the first page of them on screen) against the local TomTom stub.
+V viewers are separate AppTest sessions sharing one backend, as sessions of
+one Streamlit server do. On every tick a share of the cached readings is aged
+past the TTL (staggered expiry; stub readings drift every second, so each
+refetch is a new reading), then each viewer updates:
+
+    manual   clicks "Refresh Live Data", i.e. a full script rerun
+    auto     an auto-refresh tick: a rerun of the live fragment only
+
+Reported per viewer and tick: CPU time of the rerun (script thread) and the
+bytes of the ForwardMsgs sent to the browser. The browser's message cache is
+emulated the way Streamlit negotiates it, so elements the viewer already
+holds go as hash references. Upstream calls per tick are the same in both
+modes because both read the shared flow cache.
+
+    python benchmarks/bench_live_monitor.py --locations 10 100 --viewers 1 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import time
+
+import numpy as np
+
+import tomtom_stub
+from bench_location_catalog import synthetic_catalog
+from tomtom_stub import start_stub
+
+# Runs in the child: viewers, ticks and expiry share come in as argv[1]
+CHILD = """
+import json, random, sys, time, warnings
+warnings.filterwarnings("ignore")
+import streamlit.testing.v1.local_script_runner as runner
+from streamlit.testing.v1 import AppTest
+from vision_service import get_backend
+
+config = json.loads(sys.argv[1])
+state = {"fragments": [], "cached": set(), "bytes": 0, "cpu": 0.0}
+
+# Auto-refresh ticks rerun only the registered fragments, and every rerun
+# tells the script which messages the browser has cached
+RerunData = runner.RerunData
+def rerun_data(**kwargs):
+    if state["fragments"]:
+        kwargs.update(fragment_id_queue=list(state["fragments"]), is_auto_rerun=True)
+    return RerunData(cached_message_hashes=frozenset(state["cached"]), **kwargs)
+runner.RerunData = rerun_data
+
+forward_msgs = runner.LocalScriptRunner.forward_msgs
+def counted(self):
+    msgs = forward_msgs(self)
+    for msg in msgs:
+        state["bytes"] += len(msg.SerializeToString())
+        if msg.metadata.cacheable:
+            state["cached"].add(msg.hash)
+    return msgs
+runner.LocalScriptRunner.forward_msgs = counted
+
+# One compiled script for every run, as in a server (AppTest recompiles per run)
+script_cache = runner.ScriptCache()
+runner.ScriptCache = lambda: script_cache
+
+# CPU of the script thread only, without the test harness around it
+run_script_thread = runner.LocalScriptRunner._run_script_thread
+def timed(self):
+    start = time.thread_time()
+    try:
+        run_script_thread(self)
+    finally:
+        state["cpu"] += time.thread_time() - start
+runner.LocalScriptRunner._run_script_thread = timed
+
+def expire(share, rng):
+    cache = get_backend().flow_cache
+    with cache._lock:
+        keys = list(cache._entries)
+        for key in rng.sample(keys, int(len(keys) * share)):
+            entry = cache._entries[key]
+            cache._entries[key] = entry._replace(fetched_at=entry.fetched_at - cache.ttl - cache.stale_ttl)
+
+results = {}
+for mode in ("manual", "auto"):
+    viewers = []
+    for _ in range(config["viewers"]):
+        at = AppTest.from_file("app.py", default_timeout=300)
+        at.session_state["nav_menu"] = "Live Data"
+        at.session_state["live_auto"] = mode == "auto"
+        cached = set()
+        state.update(cached=cached, fragments=[])
+        at.run()
+        if mode == "manual":
+            at.button[0].click().run()
+        viewers.append((at, cached, list(at._fragment_storage._fragments) if mode == "auto" else []))
+    # Later trees miss elements sent as cache references
+    rows = len(viewers[0][0].dataframe[0].value)
+
+    rng = random.Random(0)
+    cache = get_backend().flow_cache
+    cpu, sent, calls = [], [], []
+    for _ in range(config["ticks"]):
+        expire(config["expire"], rng)
+        before = cache.stats()["upstream_calls"]
+        for at, cached, fragments in viewers:
+            state.update(cached=cached, fragments=fragments, bytes=0, cpu=0.0)
+            if mode == "manual":
+                at.button[0].click().run()
+            else:
+                at.run()
+            cpu.append(state["cpu"])
+            sent.append(state["bytes"])
+            if at.exception:
+                raise SystemExit(str(at.exception[0].value))
+        calls.append(cache.stats()["upstream_calls"] - before)
+    results[mode] = {"cpu_ms": 1000 * sum(cpu) / len(cpu), "kb": sum(sent) / len(sent) / 1024,
+                     "calls": sum(calls) / len(calls), "rows": rows}
+print(json.dumps(results))
+"""
+
+
+def run_config(catalog_path, stub_url, viewers, ticks, expire):
+    env = {**os.environ, "VISION_LOCATIONS": catalog_path, "TOMTOM_BASE_URL": stub_url, "PYTHONWARNINGS": "ignore"}
+    env.pop("VISION_SERVICE_URL", None)
+    proc = subprocess.run([sys.executable, "-c", CHILD, json.dumps({"viewers": viewers, "ticks": ticks,
+                                                                   "expire": expire})],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--expire", type=float, default=0.1, help="share of readings expiring per tick")
+    args = parser.parse_args()
+
+    synthetic_flow = tomtom_stub.synthetic_flow
+    tomtom_stub.synthetic_flow = lambda lat, lon, now=None: synthetic_flow(lat, lon, time.time() * 60)
+    stub = start_stub(latency=0.02)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in args.locations:
+                path = os.path.join(tmp, f"locations_{n}.json")
+                with open(path, "w") as f:
+                    json.dump({"max_distance_km": 1.5, "locations": synthetic_catalog(n, np.random.default_rng(0))},
+                              f)
+                print(f"\n{n:,} live points, {args.expire:.0%} expiring per tick")
+                print(f"{'viewers':>8} {'mode':<8} {'rows':>5} {'CPU ms/viewer':>14} {'KB/viewer':>10} "
+                      f"{'API calls/tick':>15}")
+                for viewers in args.viewers:
+                    results = run_config(path, stub.base_url, viewers, args.ticks, args.expire)
+                    for mode, r in results.items():
+                        print(f"{viewers:>8} {mode:<8} {r['rows']:>5} {r['cpu_ms']:>14.1f} {r['kb']:>10.1f} "
+                              f"{r['calls']:>15.1f}")
+                    print(f"{'':>8} auto vs manual: {results['manual']['cpu_ms'] / results['auto']['cpu_ms']:.1f}x "
+                          f"less CPU, {results['manual']['kb'] / results['auto']['kb']:.1f}x fewer bytes")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
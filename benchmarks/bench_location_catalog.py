@@ -0,0 +1,133 @@
+"""
+Location catalog at scale: a synthetic catalog of N points (spread over 50
+cities) written as locations.json and loaded the way the dashboard does.
+
+- lookups by id / name / alias vs scanning a list of (lat, lon, name) tuples
+- nearest-location and radius queries (KD-tree)
+- one page of a city for the selectboxes (filter + paginate, per rerun)
+- the Live Data page against the local TomTom stub: a refresh fetches one
+  page of points, vs a snapshot of every live point
+
+    python benchmarks/bench_location_catalog.py --points 10 5000 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import numpy as np
+
+from location_catalog import PAGE_SIZE, LocationCatalog, paginate
+from tomtom_stub import start_stub
+
+# Live Data refresh in a fresh process, catalog and stub from the environment
+CHILD = """
+import time, warnings
+warnings.filterwarnings("ignore")
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=300)
+at.session_state["nav_menu"] = "Live Data"
+at.run()
+start = time.perf_counter()
+at.button[0].click().run()
+rows = at.dataframe[0].value.shape[0] if len(at.dataframe) else 0
+print((time.perf_counter() - start) * 1000, rows, len(at.exception))
+"""
+
+
+def synthetic_catalog(n, rng):
+    cities = [f"City {c:02d}" for c in range(50)]
+    centres = np.column_stack((rng.uniform(9.0, 31.0, 50), rng.uniform(70.0, 92.0, 50)))
+    city = rng.integers(0, 50, n)
+    coords = centres[city] + rng.normal(0, 0.05, (n, 2))
+    return [{"id": f"pt-{i:06d}", "name": f"Point {i}, {cities[c]}", "aliases": [f"P{i}"],
+             "latitude": round(lat, 6), "longitude": round(lon, 6), "city": cities[c], "region": "Synthetic"}
+            for i, (c, (lat, lon)) in enumerate(zip(city, coords))]
+
+
+def per_call_us(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def live_page(path, stub_url):
+    env = {**os.environ, "VISION_LOCATIONS": path, "TOMTOM_BASE_URL": stub_url, "PYTHONWARNINGS": "ignore",
+           "VISION_FLOW_TTL": "0", "VISION_FLOW_STALE_TTL": "0"}
+    env.pop("VISION_SERVICE_URL", None)
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True,
+                         check=True).stdout.split()
+    return float(out[0]), int(out[1]), int(out[2])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 5000])
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub TomTom latency (s)")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    stub = start_stub(latency=args.latency)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in args.points:
+                raw = synthetic_catalog(n, rng)
+                path = os.path.join(tmp, f"locations_{n}.json")
+                with open(path, "w") as f:
+                    json.dump({"max_distance_km": 1.5, "locations": raw}, f)
+
+                start = time.perf_counter()
+                catalog = LocationCatalog.from_config(path)
+                catalog.tagger
+                load_ms = (time.perf_counter() - start) * 1000
+                print(f"\n{n:,} points: loaded and indexed in {load_ms:.1f} ms")
+
+                picks = rng.integers(0, n, args.lookups)
+                tuples = [(r["latitude"], r["longitude"], r["name"]) for r in raw]
+                scan_n = min(args.lookups, 2000)
+                scan = per_call_us(lambda name: next(t for t in tuples if t[2] == name),
+                                   [(raw[i]["name"],) for i in picks[:scan_n]])
+                print(f"  {'by name, list scan':<28} {scan:>10.2f} us")
+                for label, field in (("by id", "id"), ("by name", "name")):
+                    us = per_call_us(catalog.find, [(raw[i][field],) for i in picks])
+                    print(f"  {label + ', catalog':<28} {us:>10.2f} us")
+                us = per_call_us(catalog.find, [(raw[i]["aliases"][0].lower(),) for i in picks])
+                print(f"  {'by alias, catalog':<28} {us:>10.2f} us")
+
+                points = [(raw[i]["latitude"] + 0.001, raw[i]["longitude"]) for i in picks[:2000]]
+                print(f"  {'nearest':<28} {per_call_us(catalog.nearest, points):>10.2f} us")
+                print(f"  {'within 5 km':<28} "
+                      f"{per_call_us(lambda lat, lon: catalog.within(lat, lon, 5.0), points):>10.2f} us")
+
+                names = catalog.names
+                city = catalog.cities()[0]
+                us = per_call_us(lambda: paginate(catalog.filter_names(names, city), 1), [()] * 20)
+                print(f"  {'one city page (' + str(PAGE_SIZE) + ')':<28} {us / 1000:>10.2f} ms")
+
+                render_ms, rows, errors = live_page(path, stub.base_url)
+                print(f"  Live Data refresh: {render_ms:.0f} ms, {rows:,} rows shown"
+                      + (f", {errors} exceptions" if errors else ""))
+                if n > PAGE_SIZE:
+                    from flow_cache import FlowCache
+                    from live_fetch import FlowFetcher
+                    cache = FlowCache(FlowFetcher("stub", base_url=stub.base_url), ttl=0, stale_ttl=0)
+                    start = time.perf_counter()
+                    cache.get_many(catalog.live_points())
+                    print(f"  snapshot of all {n:,} live points: {(time.perf_counter() - start) * 1000:.0f} ms")
+                    cache.fetcher.close()
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
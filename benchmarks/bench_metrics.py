@@ -0,0 +1,94 @@
+"""
+Derived metrics over 10M readings: traffic_metrics' array functions vs the
+per-row Python they replace (the Live Data congestion branches and the
+ingestion round()/subtraction). The per-row version runs on a sample and is
+extrapolated; both are checked for identical results on that sample.
+
+Synthetic readings include zero and missing free-flow values.
+
+    python benchmarks/bench_metrics.py --rows 10000000 --loop-rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import traffic_metrics
+
+
+def readings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    free_flow = rng.integers(20, 120, n).astype(np.float64)
+    free_flow[rng.random(n) < 0.02] = 0
+    free_flow[rng.random(n) < 0.01] = np.nan
+    current = np.floor(free_flow * rng.uniform(0.1, 1.1, n))
+    free_flow_tt = rng.integers(60, 1200, n).astype(np.float64)
+    current_tt = np.floor(free_flow_tt * rng.uniform(0.8, 3.0, n))
+    return pd.DataFrame({"currentSpeed": current, "freeFlowSpeed": free_flow,
+                         "currentTravelTime": current_tt, "freeFlowTravelTime": free_flow_tt})
+
+
+def per_row(df):
+    ratios, delays, levels = [], [], []
+    for cur, free, cur_tt, free_tt in zip(df["currentSpeed"].tolist(), df["freeFlowSpeed"].tolist(),
+                                          df["currentTravelTime"].tolist(), df["freeFlowTravelTime"].tolist()):
+        valid = free == free and free > 0 and cur == cur
+        ratios.append(round(cur / free, 2) if valid else np.nan)
+        delays.append(cur_tt - free_tt)
+        if not valid:
+            levels.append(None)
+        elif cur < free * 0.5:
+            levels.append("High")
+        elif cur < free * 0.8:
+            levels.append("Moderate")
+        else:
+            levels.append("Low")
+    return np.array(ratios), np.array(delays), np.array(levels, dtype=object)
+
+
+def vectorized(df):
+    return (traffic_metrics.speed_ratio(df["currentSpeed"], df["freeFlowSpeed"]),
+            traffic_metrics.delay(df["currentTravelTime"], df["freeFlowTravelTime"]),
+            traffic_metrics.congestion_class(df["currentSpeed"], df["freeFlowSpeed"]),
+            traffic_metrics.congestion_index(df["currentSpeed"], df["freeFlowSpeed"]))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--loop-rows", type=int, default=1_000_000, help="sample size for the per-row version")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    df = readings(args.rows)
+    sample = df.iloc[:args.loop_rows]
+
+    (ratio, delay, levels), loop_s = timed(per_row, sample)
+    ratio_v, delay_v, levels_v, _ = vectorized(sample)
+    same = (np.array_equal(ratio, ratio_v, equal_nan=True) and np.array_equal(delay, delay_v, equal_nan=True)
+            and all(a == b or (a is None and pd.isna(b)) for a, b in zip(levels, levels_v.astype(object))))
+    print(f"identical on {len(sample):,} rows: {same}")
+
+    runs = [timed(vectorized, df)[1] for _ in range(args.repeats)]
+    vector_s = float(np.median(runs))
+    loop_full = loop_s * args.rows / len(sample)
+    print(f"{'version':<22} {'rows':>12} {'seconds':>9} {'rows/s':>14}")
+    print(f"{'per-row python':<22} {args.rows:>12,} {loop_full:>9.2f} {args.rows / loop_full:>14,.0f}  "
+          f"(extrapolated from {len(sample):,})")
+    print(f"{'traffic_metrics':<22} {args.rows:>12,} {vector_s:>9.2f} {args.rows / vector_s:>14,.0f}  "
+          f"({loop_full / vector_s:.0f}x; also computes the congestion index)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Prediction page clicks with and without the prediction cache.
+
+Simulated clicks pick a location (canonical name or catalog alias), today or
+tomorrow (plus a share of dates later in the month) and any minute of the day,
+the way st.date_input/st.time_input produce them. Compared per click:
+
+    uncached   encode + two forest predictions every time (the old path)
+    cold       PredictionCache without warming (hits once a row repeats)
+    warmed     PredictionCache after warm() for today and tomorrow
+
+All three must return identical results.
+
+    python benchmarks/bench_prediction_cache.py --clicks 20000
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from datetime import date, time as time_cls, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+
+from feature_encoding import FeatureEncoder
+from location_catalog import get_catalog
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, predict_rows
+
+
+def make_clicks(models, n, later_share, rng):
+    catalog = get_catalog()
+    labels = []
+    for name in models["location_ohe"].categories_[0]:
+        loc = catalog.find(name)
+        labels.extend([name] + list(loc.aliases if loc is not None else ()))
+    today = date.today()
+    days = np.where(rng.random(n) < later_share, rng.integers(2, 30, n), rng.integers(0, 2, n))
+    minutes = rng.integers(0, 24 * 60, n)
+    return [(labels[i], today + timedelta(days=int(d)), time_cls(int(m) // 60, int(m) % 60))
+            for i, d, m in zip(rng.integers(0, len(labels), n), days, minutes)]
+
+
+def run(predict, clicks):
+    start = time.perf_counter()
+    results = [predict(*click) for click in clicks]
+    return results, (time.perf_counter() - start) / len(clicks) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clicks", type=int, default=20_000)
+    parser.add_argument("--later-share", type=float, default=0.1, help="clicks on dates after tomorrow")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    models = registry.load_all()
+    version = registry.version
+    encoder = FeatureEncoder.from_models(models, location_aliases=get_catalog().aliases())
+    clicks = make_clicks(models, args.clicks, args.later_share, np.random.default_rng(0))
+
+    def uncached(location, date_value, time_value):
+        return predict_rows(models, encoder, encoder.transform_one(location, date_value, time_value))[0]
+
+    baseline, uncached_us = run(uncached, clicks[:min(len(clicks), 2000)])
+    print(f"{'path':<10} {'us/click':>10} {'hit rate':>9} {'entries':>8}  identical")
+    print(f"{'uncached':<10} {uncached_us:>10.1f} {'-':>9} {'-':>8}")
+
+    for label in ("cold", "warmed"):
+        cache = PredictionCache()
+        if label == "warmed":
+            start = time.perf_counter()
+            rows = cache.warm(models, encoder, version)
+            print(f"(warm: {rows:,} distinct rows in {(time.perf_counter() - start) * 1000:.0f} ms)")
+        results, us = run(lambda *click: cache.predict(models, encoder, version, *click), clicks)
+        stats = cache.stats()
+        same = results[:len(baseline)] == baseline
+        print(f"{label:<10} {us:>10.1f} {stats['hit_rate']:>9.1%} {stats['entries']:>8,}  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Quantile sketch accuracy against exact quantiles, merge exactness, and
+percentile latency versus history size.
+
+1. Sketch level: samples shaped like the sketched columns (integer speeds,
+   delays with negative values, speed ratios) and heavier tails (lognormal,
+   Pareto), from 10 to 1M values. The worst relative error over q in
+   0.01..0.99 plus 0.999 must stay within SKETCH_ACCURACY, and the bins used
+   within MAX_BINS. Merging the sketches of 64 shards must give exactly the
+   sketch of the whole sample.
+2. Store level: vehicle_data.csv repeated `scale` times (as in bench_rollups);
+   percentiles of the same slices from the sketches and exactly from
+   traffic_data (history_query.verify_percentiles).
+
+Exits 1 if any quantile is off by more than the bound.
+
+    python benchmarks/bench_quantile_sketch.py --scales 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+
+import quantile_sketch
+from bench_rollups import write_history
+from history_query import HistoryFilter, verify_percentiles
+from history_store import HistoryStore
+
+QS = np.concatenate([np.arange(1, 100) / 100, [0.999]])
+BOUND = quantile_sketch.SKETCH_ACCURACY * (1 + 1e-9)
+
+SAMPLES = {
+    "speed (int km/h)": lambda rng, n: rng.integers(0, 120, n).astype(float),
+    "delay (s, +/-)": lambda rng, n: np.round(rng.normal(300, 500, n)),
+    "speed ratio": lambda rng, n: np.round(rng.beta(5, 2, n) * 1.3, 2),
+    "lognormal": lambda rng, n: rng.lognormal(3, 1.5, n),
+    "pareto": lambda rng, n: rng.pareto(1.2, n) * 10,
+}
+
+SLICES = [
+    ("everything", HistoryFilter(), None),
+    ("one location", HistoryFilter(locations=["India Gate, Delhi, India"]), None),
+    ("one month", HistoryFilter("2025-06-01", "2025-06-30"), None),
+    ("location x month", HistoryFilter("2025-06-01", "2025-06-30", ["India Gate, Delhi, India"]), None),
+    ("rush hours", HistoryFilter(), [8, 9, 18, 19]),
+]
+
+
+def sketch(values):
+    bins, counts = np.unique(quantile_sketch.bins(values), return_counts=True)
+    return bins, counts
+
+
+def sketch_accuracy(rng):
+    print(f"{'sample':<18} {'values':>9} {'bins':>6} {'max rel err':>12}  ok")
+    ok = True
+    for label, draw in SAMPLES.items():
+        for n in (10, 1_000, 100_000, 1_000_000):
+            values = draw(rng, n)
+            bins, counts = sketch(values)
+            estimate = quantile_sketch.quantiles(bins, counts, QS)
+            exact = np.quantile(values, QS, method="lower")
+            error = np.max(np.abs(estimate - exact) / np.maximum(np.abs(exact), quantile_sketch.MIN_VALUE))
+            good = error <= BOUND and len(bins) <= quantile_sketch.MAX_BINS
+            ok &= good
+            print(f"{label:<18} {n:>9,} {len(bins):>6} {error:>12.4%}  {'yes' if good else 'NO'}")
+
+    # Merge: adding the shards' bin counts gives the whole sample's sketch
+    values = SAMPLES["delay (s, +/-)"](rng, 1_000_000)
+    merged = Counter()
+    for shard in np.array_split(values, 64):
+        merged.update(dict(zip(*(part.tolist() for part in sketch(shard)))))
+    whole = dict(zip(*(part.tolist() for part in sketch(values))))
+    same = dict(merged) == whole
+    ok &= same
+    print(f"merge of 64 shards equals the sketch of the whole: {same}")
+    return ok
+
+
+def store_latency(scales, repeats):
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            csv_path = os.path.join(tmp, f"history_{scale}x.csv")
+            write_history(scale, csv_path)
+            store = HistoryStore(os.path.join(tmp, f"history_{scale}x.db"))
+            start = time.perf_counter()
+            store.sync_csv(csv_path)
+            sync_s = time.perf_counter() - start
+            conn = store.connect()
+            cells = conn.execute("SELECT COUNT(*) FROM sketch_location_date_hour").fetchone()[0]
+            print(f"\n{scale}x: {store.row_count():,} readings, {cells:,} sketch bin rows, synced in {sync_s:.1f}s")
+            print(f"  {'slice':<18} {'exact ms':>9} {'sketch ms':>10} {'max rel err':>12}  ok")
+            for label, filters, hours in SLICES:
+                runs = [verify_percentiles([(filters, hours)], store)[0] for _ in range(repeats)]
+                exact_ms = np.median([r[2] for r in runs])
+                sketch_ms = np.median([r[3] for r in runs])
+                worst = max(r[4] for r in runs)
+                good = all(r[5] for r in runs)
+                ok &= good
+                print(f"  {label:<18} {exact_ms:>9.1f} {sketch_ms:>10.2f} {worst:>12.4%}  {'yes' if good else 'NO'}")
+            store.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    ok = sketch_accuracy(np.random.default_rng(0))
+    ok &= store_latency(args.scales, args.repeats)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+`vehicle queries.sql` reports: scanning traffic_data vs reading the rollup
+cubes, on stores built from vehicle_data.csv repeated `scale` times (each copy
+shifted by a day, wrapping after a year, so the cube grows like a real
+history would). Every report is also checked against its raw version, for
+all dates and for a one-month range.
+
+    python benchmarks/bench_rollups.py --scales 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from history_store import HISTORY_CSV, HistoryStore
+from rollup_queries import REPORTS, verify
+
+
+def write_history(scale, path):
+    base = pd.read_csv(HISTORY_CSV)
+    stamps = pd.to_datetime(base["timestamp"])
+    with open(path, "w") as out:
+        out.write(",".join(base.columns) + "\n")
+        for k in range(scale):
+            shifted = stamps + pd.Timedelta(days=k % 365)
+            copy = base.assign(timestamp=shifted.dt.strftime("%Y-%m-%d %H:%M:%S"),
+                               date=shifted.dt.strftime("%Y-%m-%d"))
+            copy.to_csv(out, header=False, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = os.path.join(tmp, f"history_{scale}x.csv")
+            write_history(scale, csv_path)
+            store = HistoryStore(os.path.join(tmp, f"history_{scale}x.db"))
+            start = time.perf_counter()
+            store.sync_csv(csv_path)
+            sync_s = time.perf_counter() - start
+            conn = store.connect()
+            cube_rows = conn.execute("SELECT COUNT(*) FROM rollup_location_date_hour").fetchone()[0]
+            print(f"\n{scale}x: {store.row_count():,} readings, {cube_rows:,} (location, date, hour) rows, "
+                  f"synced in {sync_s:.1f}s")
+
+            # All-time reports (per-hour cube) and one month (per-date cube)
+            for label, start, end in (("all dates", None, None), ("one month", "2025-06-01", "2025-06-30")):
+                runs = [verify(store, start=start, end=end) for _ in range(args.repeats)]
+                print(f"{label:<24} {'raw ms':>9} {'rollup ms':>10} {'speedup':>8}  match")
+                for i, name in enumerate(REPORTS):
+                    raw_ms = np.median([r[i][1] for r in runs])
+                    rollup_ms = np.median([r[i][2] for r in runs])
+                    ok = all(r[i][3] for r in runs)
+                    print(f"  {name:<22} {raw_ms:>9.2f} {rollup_ms:>10.2f} {raw_ms / rollup_ms:>7.0f}x  "
+                          f"{'yes' if ok else 'NO'}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Load test for vision_service.py: requests/s and latency as concurrent
+dashboard users go from 1 to 100.
+
+The service runs in a subprocess against the local TomTom stub. Each simulated
+user repeatedly does what a dashboard session does (single predictions, live
+snapshots, the hourly profile, the short-term outlook, a network forecast)
+with no think time; users are threads spread over a few client processes so
+the client's GIL is not the bottleneck. After each run the workers' memory is
+split into the part shared with the parent (the models) and their own.
+
+    python benchmarks/bench_service_load.py --workers 1 4 --users 1 5 10 25 50 100
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import numpy as np
+
+from tomtom_stub import start_stub
+
+# (call, weight) of one dashboard interaction
+MIX = (("predict", 0.4), ("live", 0.2), ("hourly", 0.2), ("outlook", 0.1), ("forecast", 0.1))
+
+
+def user_loop(client, locations, seconds, seed):
+    rng = random.Random(seed)
+    names, weights = zip(*MIX)
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        call = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            if call == "predict":
+                client.predict(rng.choice(locations), f"2025-05-{rng.randint(1, 28):02d}",
+                               f"{rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}")
+            elif call == "live":
+                client.live_snapshot()
+            elif call == "hourly":
+                client.hourly_profile()
+            elif call == "outlook":
+                client.outlook()
+            else:
+                client.forecast_grid(locations, "2025-05-12", 1, 60)
+            ok = True
+        except Exception:
+            ok = False
+        samples.append((call, time.perf_counter() - start, ok))
+    return samples
+
+
+def client_process(base_url, users, seconds, seed):
+    # `users` concurrent sessions (threads) in one client process
+    from vision_service import ServiceClient
+    warnings.filterwarnings("ignore")
+    client = ServiceClient(base_url)
+    locations = client.location_names()
+    results = [None] * users
+
+    def run(i):
+        results[i] = user_loop(client, locations, seconds, seed + i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [s for r in results for s in r]
+
+
+def memory_kb(pid):
+    # (rss, private) from smaps_rollup; shared = rss - private
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Rss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def start_service(workers, stub_url):
+    env = {**os.environ, "TOMTOM_BASE_URL": stub_url, "PYTHONWARNINGS": "ignore"}
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "vision_service.py"), "--port", "0",
+                             "--workers", str(workers)], env=env, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith("serving on "):
+        proc.kill()
+        sys.exit("service failed to start")
+    return proc, line.split()[2]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(c) for c in f.read().split()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100])
+    parser.add_argument("--seconds", type=float, default=5.0, help="per concurrency level")
+    parser.add_argument("--client-procs", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub TomTom latency (s)")
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency)
+    for workers in dict.fromkeys(args.workers):
+        proc, base_url = start_service(workers, stub.base_url)
+        print(f"\n{workers} worker(s) at {base_url}")
+        print(f"{'users':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        by_call = []
+        try:
+            for users in args.users:
+                procs = min(args.client_procs, users)
+                shares = [users // procs + (i < users % procs) for i in range(procs)]
+                with ProcessPoolExecutor(procs) as pool:
+                    futures = [pool.submit(client_process, base_url, n, args.seconds, 1000 * i)
+                               for i, n in enumerate(shares)]
+                    samples = [s for f in futures for s in f.result()]
+                latencies = np.array([s[1] for s in samples]) * 1000
+                errors = sum(not s[2] for s in samples)
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                print(f"{users:>6} {len(samples):>9,} {len(samples) / args.seconds:>8.1f} {p50:>8.1f} {p95:>8.1f} "
+                      f"{p99:>8.1f} {errors:>7}")
+                by_call.append((users, {name: np.median([s[1] for s in samples if s[0] == name] or [np.nan]) * 1000
+                                        for name, _ in MIX}))
+
+            print(f"\n{'users':>6} " + " ".join(f"{name + ' p50':>13}" for name, _ in MIX))
+            for users, medians in by_call:
+                print(f"{users:>6} " + " ".join(f"{medians[name]:>13.1f}" for name, _ in MIX))
+
+            pids = children(proc.pid) if workers > 1 else [proc.pid]
+            rss, private = zip(*(memory_kb(pid) for pid in pids))
+            print(f"per worker: RSS {np.mean(rss) / 1024:.0f} MB, private {np.mean(private) / 1024:.0f} MB, "
+                  f"shared with the parent {np.mean(np.subtract(rss, private)) / 1024:.0f} MB")
+        finally:
+            proc.terminate()
+            proc.wait()
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Peak RSS and throughput of the hourly/per-location summaries over large
+exports: one `pd.read_csv` of the whole file with default dtypes (the old
+Analytics path) vs history_stream's chunked, compact-dtype pipeline over the
+same rows as CSV and as JSONL.
+
+Every run is a fresh interpreter so its peak RSS is its own. First, a
+correctness case: an export with blank cells in every integer column must
+stream and sync into the history store with every row kept and the same
+hourly and per-location means as pandas' groupby().mean() over its default
+(float) read; exits 1 if not.
+
+    python benchmarks/bench_stream_ingest.py --scales 1000 10000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+SOURCE_CSV = os.path.join(ROOT, "vehicle_data.csv")
+
+RUN = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+mode, path, chunksize = sys.argv[1], sys.argv[2], int(sys.argv[3]) or None
+start = time.perf_counter()
+if mode == "read_csv":
+    df = pd.read_csv(path)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    df["hour"] = df["timestamp"].dt.hour
+    hourly = df.groupby("hour")[["currentSpeed", "currentTravelTime", "freeFlowTravelTime"]].mean()
+    location = df.groupby("location_name")[["currentSpeed", "delay_time", "speed_ratio"]].mean()
+    rows = len(df)
+else:
+    from history_stream import summarize
+    hourly, location = summarize(path, chunksize)
+    rows = int(location["readings"].sum())
+elapsed = time.perf_counter() - start
+print(json.dumps({{"rows": rows, "seconds": elapsed,
+                   "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def write_exports(scale, directory):
+    # vehicle_data.csv repeated `scale` times, as CSV and as JSONL
+    base = pd.read_csv(SOURCE_CSV)
+    csv_path = os.path.join(directory, f"vehicle_data_{scale}x.csv")
+    jsonl_path = os.path.join(directory, f"vehicle_data_{scale}x.jsonl")
+    body = base.to_csv(index=False, header=False)
+    lines = base.to_json(orient="records", lines=True)
+    if not lines.endswith("\n"):
+        lines += "\n"
+    with open(csv_path, "w") as csv_out, open(jsonl_path, "w") as jsonl_out:
+        csv_out.write(",".join(base.columns) + "\n")
+        for _ in range(scale):
+            csv_out.write(body)
+            jsonl_out.write(lines)
+    return csv_path, jsonl_path
+
+
+def missing_values_check(directory, fraction=0.05):
+    # Blank out `fraction` of the cells of every nullable integer column
+    from history_store import HistoryStore
+    from history_stream import DTYPES, summarize
+    base = pd.read_csv(SOURCE_CSV)
+    rng = np.random.default_rng(0)
+    blanks = 0
+    for column in (c for c, t in DTYPES.items() if t[0] in "IU" and c in base.columns):
+        mask = rng.random(len(base)) < fraction
+        base[column] = base[column].astype(object).where(~mask, None)
+        blanks += int(mask.sum())
+    path = os.path.join(directory, "vehicle_data_blanks.csv")
+    base.to_csv(path, index=False)
+
+    hourly_columns = ["currentSpeed", "currentTravelTime", "freeFlowTravelTime"]
+    location_columns = {"currentSpeed": "avg_speed", "delay_time": "avg_delay", "speed_ratio": "avg_speed_ratio"}
+    expected = pd.read_csv(path)
+    expected["hour"] = pd.to_datetime(expected["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce").dt.hour
+    expected_hourly = expected.groupby("hour")[hourly_columns].mean()
+    expected_location = expected.groupby("location_name")[list(location_columns)].mean().rename(
+        columns=location_columns)
+
+    def same_means(hourly, location):
+        hourly = hourly.set_index("hour")[hourly_columns]
+        location = location.set_index("location_name")[list(location_columns.values())]
+        return (hourly.index.tolist() == expected_hourly.index.tolist()
+                and location.index.tolist() == expected_location.index.tolist()
+                and np.allclose(hourly.to_numpy(float), expected_hourly.to_numpy(float), equal_nan=True)
+                and np.allclose(location.to_numpy(float), expected_location.to_numpy(float), equal_nan=True))
+
+    hourly, location = summarize(path)
+    streamed = int(location["readings"].sum())
+    store = HistoryStore(os.path.join(directory, "blanks.db"))
+    synced = store.sync_csv(path)
+    stored_ok = same_means(store.hourly_profile(), store.location_summary())
+    store.close()
+
+    ok = streamed == len(base) == synced and same_means(hourly, location) and stored_ok
+    print(f"blank cells: {blanks:,} over {len(base):,} rows; streamed {streamed:,}, synced {synced:,} rows, "
+          f"hourly/location means match pandas: {'yes' if ok else 'NO'}\n")
+    return ok
+
+
+def run(mode, path, chunksize):
+    out = subprocess.run([sys.executable, "-c", RUN.format(root=ROOT), mode, path, str(chunksize)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000],
+                        help="multiples of vehicle_data.csv")
+    parser.add_argument("--chunksize", type=int, default=0, help="rows per chunk (0: per-format default)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = missing_values_check(tmp)
+    print(f"{'scale':>6} {'path':<16} {'file MB':>8} {'rows':>11} {'seconds':>8} {'rows/s':>11} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path, jsonl_path = write_exports(scale, tmp)
+            for label, mode, path in (("read_csv", "read_csv", csv_path),
+                                      ("stream csv", "stream", csv_path),
+                                      ("stream jsonl", "stream", jsonl_path)):
+                r = run(mode, path, args.chunksize)
+                print(f"{scale:>6} {label:<16} {os.path.getsize(path) / 2**20:>8,.0f} {r['rows']:>11,} "
+                      f"{r['seconds']:>8.2f} {r['rows'] / r['seconds']:>11,.0f} {r['peak_rss_mb']:>12,.0f}")
+            os.remove(csv_path)
+            os.remove(jsonl_path)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
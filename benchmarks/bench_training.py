@@ -0,0 +1,95 @@
+"""
+Training wall time and peak memory versus row count.
+
+vehicle_data.csv is repeated `scale` times, each copy shifted by a day (as in
+bench_rollups), and train_models.py trains on it in a fresh process per run:
+
+- full retrain (hyperparameter search + final fit) with --jobs 1 and with
+  every core, so the search's process-pool sharding shows up as speedup
+- incremental: --add-trees trees grown on the newest 10% of the rows on top
+  of the full version
+
+Timings and peak RSS (main process and search workers) come from each
+version's model_manifest.json, as does the accuracy check against the
+shipped models.
+
+    python benchmarks/bench_training.py --scales 1 10 100
+    python benchmarks/bench_training.py --scales 1000 --no-search
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+import pandas as pd
+
+from bench_rollups import write_history
+from train_models import MANIFEST
+
+
+def run_training(out_dir, *args):
+    before = set(os.listdir(out_dir))
+    subprocess.run([sys.executable, os.path.join(ROOT, "train_models.py"), "--out", out_dir, "train", *args],
+                   cwd=ROOT, check=True, capture_output=True, text=True,
+                   env={**os.environ, "PYTHONWARNINGS": "ignore"})
+    version = (set(os.listdir(out_dir)) - before).pop()
+    with open(os.path.join(out_dir, version, MANIFEST)) as f:
+        return json.load(f)
+
+
+def report(label, manifest):
+    timings, rss = manifest["timings"], manifest["peak_rss_mb"]
+    fit_s = timings.get("search_s", timings.get("check_fit_s", 0)) + timings["fit_s"]
+    check = "ok" if manifest["check"]["passed"] else "FAILED"
+    print(f"  {label:<16} {manifest['data']['rows']:>10,} {manifest['jobs']:>5} {fit_s:>9.1f} "
+          f"{timings['total_s']:>9.1f} {rss['main']:>9.0f} {rss['workers']:>9.0f}  "
+          f"{manifest['metrics']['candidate']['traffic_accuracy']:.3f}  {check}")
+    return timings["total_s"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--add-trees", type=int, default=20)
+    parser.add_argument("--no-search", action="store_true", help="fit the shipped parameters only")
+    args = parser.parse_args()
+    search = ["--no-search"] if args.no_search else []
+    print(f"{os.cpu_count()} CPUs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = os.path.join(tmp, f"history_{scale}x.csv")
+            write_history(scale, csv_path)
+            out_dir = os.path.join(tmp, f"models_{scale}x")
+            os.makedirs(out_dir)
+            print(f"\n{scale}x")
+            print(f"  {'run':<16} {'rows':>10} {'jobs':>5} {'fit s':>9} {'total s':>9} {'peak MB':>9} "
+                  f"{'workers':>9}  acc   check")
+
+            serial = report("full", run_training(out_dir, "--csv", csv_path, "--jobs", "1", *search))
+            if args.jobs > 1:
+                manifest = run_training(out_dir, "--csv", csv_path, "--jobs", str(args.jobs), *search)
+                parallel = report("full", manifest)
+                print(f"  {'':<16} search sharded over {args.jobs} processes: {serial / parallel:.1f}x")
+            else:
+                manifest = None
+
+            # Grow the full version on its newest 10% of readings
+            stamps = pd.read_csv(csv_path, usecols=["timestamp"])["timestamp"].sort_values()
+            since = stamps.iloc[int(len(stamps) * 0.9)]
+            base = manifest["version"] if manifest else sorted(os.listdir(out_dir))[-1]
+            report(f"+{args.add_trees} trees", run_training(
+                out_dir, "--csv", csv_path, "--jobs", str(args.jobs), "--incremental", "--base", base,
+                "--since", since, "--add-trees", str(args.add_trees)))
+
+
+if __name__ == "__main__":
+    main()
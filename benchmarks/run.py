@@ -0,0 +1,334 @@
+"""
+Headless end-to-end benchmark suite for the dashboard's data and inference paths.
+
+Every case runs in a fresh spawned process so its peak RSS is its own. Results
+(p50/p95/p99 per metric plus peak RSS per case) are written as JSON and, when a
+baseline file exists, compared against it; the exit status is 1 if any metric
+regressed past the tolerance.
+
+    python benchmarks/run.py                            # full suite, compare to baseline
+    python benchmarks/run.py --quick                    # 1x/100x only, fewer repeats
+    python benchmarks/run.py --cases csv predict        # subset
+    python benchmarks/run.py --save-baseline            # record the current numbers
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.json")
+SOURCE_CSV = os.path.join(ROOT_DIR, "vehicle_data.csv")
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def timed(fn, repeats, *args, warmup=1):
+    for _ in range(warmup):
+        fn(*args)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def synthetic_csv(scale, directory):
+    # vehicle_data.csv with its body repeated `scale` times
+    path = os.path.join(directory, f"vehicle_data_{scale}x.csv")
+    if not os.path.exists(path):
+        with open(SOURCE_CSV, "rb") as f:
+            header = f.readline()
+            body = f.read()
+        if not body.endswith(b"\n"):
+            body += b"\n"
+        with open(path, "wb") as out:
+            out.write(header)
+            for _ in range(scale):
+                out.write(body)
+    return path
+
+
+# ---------------- CASES ----------------
+# Each case returns {metric: [seconds, ...]} and runs in its own process.
+
+def case_csv(opts):
+    import pandas as pd
+
+    path = opts["csv_path"]
+    state = {}
+
+    def load():
+        # Analytics page before the history store: full read + timestamp parse
+        df = pd.read_csv(path)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+        state["df"] = df
+
+    def hourly():
+        df = state["df"]
+        df['hour'] = df['timestamp'].dt.hour
+        stats = df.groupby('hour').agg({
+            'currentSpeed': 'mean',
+            'currentTravelTime': 'mean',
+            'freeFlowTravelTime': 'mean'
+        }).reset_index()
+        stats['avg_delay'] = stats['currentTravelTime'] - stats['freeFlowTravelTime']
+
+    suffix = f"{opts['scale']}x"
+    warmup = 1 if opts["scale"] <= 100 else 0
+    return {
+        f"csv_load.{suffix}": timed(load, opts["repeats"], warmup=warmup),
+        f"hourly_groupby.{suffix}": timed(hourly, opts["repeats"]),
+    }
+
+
+def case_store(opts):
+    from history_store import HistoryStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "bench.db"))
+        sync = timed(store.sync_csv, 1, opts["csv_path"], warmup=0)
+        profile = timed(store.hourly_profile, opts["repeats"])
+        resync = timed(store.sync_csv, opts["repeats"], opts["csv_path"])
+    suffix = f"{opts['scale']}x"
+    return {
+        f"store_initial_sync.{suffix}": sync,
+        f"store_hourly_profile.{suffix}": profile,
+        f"store_noop_sync.{suffix}": resync,
+    }
+
+
+def case_predict(opts):
+    from bench_batch_predict import make_rows, single_row_predict
+    from batch_predict import predict_batch
+    from feature_encoding import FeatureEncoder
+    from model_registry import ModelRegistry
+
+    load = timed(lambda: ModelRegistry().load_all(), 1, warmup=0)
+    models = ModelRegistry().load_all()
+    encoder = FeatureEncoder.from_models(models)
+    location = models['location_ohe'].categories_[0][0]
+
+    def encoded_single():
+        # Current Prediction page path
+        features = encoder.frame(encoder.transform_one(location, "2025-05-12", "08:30"))
+        models['traffic_le'].inverse_transform(models['traffic_model'].predict(features))
+        models['vehicle_model'].predict(features)
+
+    locations, dates, times = make_rows(models, opts["batch_rows"])
+    return {
+        "model_load": load,
+        "predict_single.legacy": timed(single_row_predict, opts["repeats"], models, location, "2025-05-12", "08:30"),
+        "predict_single.encoder": timed(encoded_single, opts["repeats"]),
+        f"predict_batch.{opts['batch_rows']}": timed(
+            lambda: predict_batch(models, locations, dates, times, encoder=encoder), max(3, opts["repeats"] // 10)),
+    }
+
+
+def case_encoders(opts):
+    import pandas as pd
+
+    from bench_batch_predict import make_rows
+    from feature_encoding import FeatureEncoder
+    from model_registry import ModelRegistry
+
+    models = ModelRegistry().load_all()
+    encoder = FeatureEncoder.from_models(models)
+    location = models['location_ohe'].categories_[0][0]
+    frame = pd.DataFrame({'location_name': [location]})
+
+    def sklearn_one():
+        models['location_ohe'].transform(frame)
+        for name, value in (('date_encoder', "12-05-2025"), ('time_encoder', "08:30:00")):
+            try:
+                models[name].transform([value])
+            except ValueError:
+                pass
+
+    locations, dates, times = make_rows(models, opts["batch_rows"])
+    return {
+        "encode_one.sklearn": timed(sklearn_one, opts["repeats"]),
+        "encode_one.lookup": timed(encoder.transform_one, opts["repeats"], location, "2025-05-12", "08:30"),
+        f"encode_batch.lookup.{opts['batch_rows']}": timed(
+            encoder.transform, max(3, opts["repeats"] // 10), locations, dates, times),
+    }
+
+
+def case_live_fetch(opts):
+    from bench_live_fetch import make_locations, serial_refresh
+    from live_fetch import FlowFetcher
+    from tomtom_stub import start_stub
+
+    stub = start_stub(latency=opts["latency"], jitter=opts["latency"] / 4)
+    fetcher = FlowFetcher("stub", base_url=stub.base_url)
+    locations = make_locations(opts["locations"])
+    try:
+        repeats = max(3, opts["repeats"] // 4)
+        return {
+            f"live_fetch.serial.{opts['locations']}": timed(serial_refresh, repeats, stub.base_url, locations),
+            f"live_fetch.concurrent.{opts['locations']}": timed(fetcher.fetch_all, repeats, locations),
+        }
+    finally:
+        fetcher.close()
+        stub.shutdown()
+
+
+CASE_GROUPS = {
+    "csv": case_csv,
+    "store": case_store,
+    "predict": case_predict,
+    "encoders": case_encoders,
+    "live_fetch": case_live_fetch,
+}
+
+
+def run_case(group, opts):
+    # Child process entry point
+    warnings.filterwarnings("ignore")
+    sys.path.insert(0, BENCH_DIR)
+    samples = CASE_GROUPS[group](opts)
+    return samples, peak_rss_mb()
+
+
+# ---------------- REPORTING ----------------
+def summarize(samples, rss_mb):
+    import numpy as np
+
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "peak_rss_mb": round(rss_mb, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    # Regressions in p50 latency or peak RSS beyond `tolerance` (0.25 = +25%)
+    regressions = []
+    print(f"\n{'metric':<36} {'p50 base':>10} {'p50 now':>10} {'change':>8} {'RSS base':>9} {'RSS now':>8}")
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>10} {now['p50_ms']:>10.2f} {'new':>8}")
+            continue
+        change = now["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        rss_change = now["peak_rss_mb"] / base["peak_rss_mb"] - 1 if base["peak_rss_mb"] else 0.0
+        flag = ""
+        if change > tolerance or rss_change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {base['p50_ms']:>10.2f} {now['p50_ms']:>10.2f} {change:>+8.0%} "
+              f"{base['peak_rss_mb']:>9.0f} {now['peak_rss_mb']:>8.0f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VisionTraffic benchmark suite")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASE_GROUPS), default=list(CASE_GROUPS))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100, 10_000],
+                        help="synthetic multiples of vehicle_data.csv")
+    parser.add_argument("--store-max-scale", type=int, default=100,
+                        help="skip the history store case above this scale")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--batch-rows", type=int, default=14_400)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--locations", type=int, default=10)
+    parser.add_argument("--quick", action="store_true", help="1x/100x scales and 5 repeats")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    if args.quick:
+        args.scales = [s for s in args.scales if s <= 100]
+        args.repeats = 5
+
+    common = {"repeats": args.repeats, "batch_rows": args.batch_rows,
+              "latency": args.latency, "locations": args.locations}
+    jobs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for group in args.cases:
+            if group in ("csv", "store"):
+                for scale in args.scales:
+                    if group == "store" and scale > args.store_max_scale:
+                        continue
+                    # One repeat is plenty once a single load takes seconds
+                    repeats = args.repeats if scale <= 100 else 3
+                    jobs.append((f"{group}.{scale}x", group, dict(common, scale=scale, repeats=repeats,
+                                                                  csv_path=synthetic_csv(scale, tmp))))
+            else:
+                jobs.append((group, group, common))
+
+        results = {}
+        context = multiprocessing.get_context("spawn")
+        print(f"{'metric':<36} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak RSS MB':>12}")
+        for label, group, opts in jobs:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                samples, rss = pool.submit(run_case, group, opts).result()
+            for name, values in samples.items():
+                results[name] = summarize(values, rss)
+                r = results[name]
+                print(f"{name:<36} {r['n']:>4} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+                      f"{r['p99_ms']:>10.2f} {r['peak_rss_mb']:>12.0f}")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved baseline {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
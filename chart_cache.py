@@ -0,0 +1,187 @@
+"""
+Cached chart rendering for the dashboard.
+
+Charts are drawn with matplotlib's object-oriented Figure API (nothing is
+registered with pyplot, so nothing accumulates in its global state), rendered
+to PNG bytes and cached by a hash of the input data. A rerun with unchanged
+data is a dictionary lookup; one Figure per chart kind is cleared and reused
+when a re-render is needed.
+"""
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from instrumentation import span
+
+# Dashboard palette
+BG = '#050b08'
+GRID = '#1a3c2f'
+MUTED = '#8fa39a'
+GREEN = '#22e38a'
+RED = '#ff3232'
+ORANGE = '#ffa500'
+
+DPI = 100
+
+
+def data_key(*parts):
+    # Stable content hash of frames/arrays/scalars
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+            digest.update(repr(list(part.columns) if isinstance(part, pd.DataFrame) else part.name).encode())
+        elif isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def _style_axes(fig, ax):
+    ax.set_facecolor(BG)
+    fig.patch.set_facecolor(BG)
+    ax.tick_params(axis='x', colors=MUTED)
+    ax.tick_params(axis='y', colors=MUTED)
+    ax.grid(color=GRID, linestyle='--', alpha=0.3)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['bottom'].set_color(GRID)
+    ax.spines['left'].set_color(GRID)
+
+
+# ---------------- CHART DRAWERS ----------------
+def draw_speed_bars(fig, df):
+    ax = fig.subplots()
+    x = range(len(df))
+    ax.bar(x, df["Current Speed (km/h)"], 0.35, label='Current Speed', color=GREEN)
+    _style_axes(fig, ax)
+    ax.set_xticks(x)
+    ax.set_xticklabels(df["Location Name"], rotation=45, ha='right', color=MUTED, fontsize=8)
+    ax.legend(facecolor=BG, edgecolor=GREEN, labelcolor='white')
+
+
+def draw_delay_bars(fig, df):
+    ax = fig.subplots()
+    x = range(len(df))
+    delay = df['Live Delay (s)']
+    colors = np.where(delay > 60, RED, np.where(delay > 0, ORANGE, GREEN))
+    ax.bar(x, delay, color=colors, alpha=0.8)
+    _style_axes(fig, ax)
+    ax.set_xticks(x)
+    ax.set_xticklabels(df["Location Name"], rotation=45, ha='right', color=MUTED, fontsize=8)
+    ax.set_ylabel("Delay (seconds)", color=MUTED)
+
+
+def draw_hourly_line(fig, hourly_stats, column, title, ylabel, color, marker, linestyle):
+    ax = fig.subplots()
+    ax.plot(hourly_stats['hour'], hourly_stats[column], marker=marker, linestyle=linestyle,
+            color=color, linewidth=2, markersize=6)
+    _style_axes(fig, ax)
+    ax.set_xlabel("Time of Day (Hour)", color=MUTED, fontsize=10)
+    ax.set_ylabel(ylabel, color=MUTED, fontsize=10)
+    ax.set_title(title, color='white', fontsize=12, pad=15)
+    ax.set_xticks(range(0, 24))
+
+
+def draw_heatmap(fig, matrix, multi_day):
+    ax = fig.subplots()
+    im = ax.imshow(matrix.values, aspect='auto', cmap='viridis', interpolation='nearest')
+    ax.set_facecolor(BG)
+    fig.patch.set_facecolor(BG)
+    ax.set_yticks(range(len(matrix.index)))
+    ax.set_yticklabels(matrix.index, color=MUTED, fontsize=8)
+    step = max(1, matrix.shape[1] // 24)
+    ax.set_xticks(range(0, matrix.shape[1], step))
+    ax.set_xticklabels([f"{d[5:]} {t}" if multi_day else t for d, t in matrix.columns[::step]],
+                       rotation=45, ha='right', color=MUTED, fontsize=7)
+    cbar = fig.colorbar(im, ax=ax)
+    cbar.set_label("Vehicle Count", color=MUTED)
+    cbar.ax.tick_params(colors=MUTED)
+
+
+# ---------------- RENDER CACHE ----------------
+class ChartCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._png = OrderedDict()   # (kind, data key) -> PNG bytes, LRU order
+        self._figures = {}          # kind -> reusable Figure
+        self._lock = threading.Lock()
+        self._figure_locks = {}
+        self.stats = {"hits": 0, "renders": 0, "render_seconds": 0.0}
+
+    def _figure(self, kind, figsize):
+        fig = self._figures.get(kind)
+        if fig is None:
+            fig = self._figures[kind] = Figure(figsize=figsize, dpi=DPI)
+        else:
+            fig.clear()
+            fig.set_size_inches(figsize)
+        return fig
+
+    def render(self, kind, key, figsize, draw, *args):
+        cache_key = (kind, key)
+        with self._lock:
+            png = self._png.get(cache_key)
+            if png is not None:
+                self._png.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                return png
+            figure_lock = self._figure_locks.setdefault(kind, threading.Lock())
+
+        with figure_lock, span("chart_render"):
+            start = time.perf_counter()
+            fig = self._figure(kind, figsize)
+            draw(fig, *args)
+            buf = io.BytesIO()
+            fig.savefig(buf, format='png', facecolor=fig.get_facecolor(), bbox_inches='tight')
+            fig.clear()
+            png = buf.getvalue()
+            elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._png[cache_key] = png
+            self._png.move_to_end(cache_key)
+            while len(self._png) > self.max_entries:
+                self._png.popitem(last=False)
+            self.stats["renders"] += 1
+            self.stats["render_seconds"] += elapsed
+        return png
+
+    # Convenience wrappers for the dashboard charts
+    def speed_bars(self, df):
+        cols = df[["Location Name", "Current Speed (km/h)"]]
+        return self.render("speed_bars", data_key(cols), (10, 5), draw_speed_bars, cols)
+
+    def delay_bars(self, df):
+        cols = df[["Location Name", "Live Delay (s)"]]
+        return self.render("delay_bars", data_key(cols), (10, 5), draw_delay_bars, cols)
+
+    def hourly_line(self, hourly_stats, column, title, ylabel, color, marker='o', linestyle='-'):
+        cols = hourly_stats[['hour', column]]
+        key = data_key(cols, title, ylabel, color, marker, linestyle)
+        return self.render(f"hourly_{column}", key, (10, 4), draw_hourly_line,
+                           cols, column, title, ylabel, color, marker, linestyle)
+
+    def heatmap(self, matrix, multi_day):
+        key = data_key(matrix, multi_day)
+        return self.render("heatmap", key, (12, 0.45 * len(matrix) + 1.5), draw_heatmap, matrix, multi_day)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ChartCache()
+    return _cache
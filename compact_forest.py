@@ -0,0 +1,411 @@
+"""
+Compact, NumPy-only format and inference engine for the Random Forest models.
+
+`export` flattens every tree of a fitted RandomForestClassifier/Regressor into
+one set of node tables (feature, threshold, children, leaf slot) plus a table
+of leaf values, written as an uncompressed .npz next to the pickle. Loading
+it needs neither sklearn nor pickle.
+
+Inference walks all trees at once: every (row, tree) pair keeps a current
+node and each step moves all of them one level down with a few vectorized
+gathers, dropping pairs that reached a leaf. Batches are first deduplicated by
+the threshold interval each feature value falls in (rows in the same
+intervals take the same path through every tree), so a day of per-minute rows
+costs about as much as the few hundred distinct interval combinations the
+forest can tell apart. Results are bit-for-bit identical to sklearn:
+- thresholds are rounded down to float32 so comparing float32 inputs gives the
+  same branch as sklearn's float32-vs-float64 comparison
+- per-tree outputs are accumulated in tree order before dividing by n_trees
+
+    python compact_forest.py export      # writes traffic_level_model.npz, vehicle_count_model.npz
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pickle -> compact file, for the forests shipped in the repo root
+FORESTS = {
+    "traffic_level_model.pkl": "traffic_level_model.npz",
+    "vehicle_count_model.pkl": "vehicle_count_model.npz",
+}
+
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_ROWS = 2048
+MAX_GROUP_ROWS = 1024        # joint bins of the features sharing one lookup table
+MAX_TABLE_BYTES = 64 << 20   # bigger bit tables fall back to plain tree traversal
+
+_Compiled = namedtuple("_Compiled", ["cuts", "groups", "radices", "tables", "word_start", "n_words", "bit_slot"])
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _float32_floor(threshold):
+    # Largest float32 <= threshold: for float32 x, x <= t exactly when x <= floor32(t)
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return t32
+
+
+def flatten_forest(model):
+    # One node table for all trees; child indices are global
+    features, thresholds, lefts, rights, leaf_slots, leaf_values, roots = [], [], [], [], [], [], []
+    offset = n_leaves = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        idx = np.arange(n)
+
+        left = np.where(is_leaf, idx, tree.children_left) + offset
+        right = np.where(is_leaf, idx, tree.children_right) + offset
+        slot = np.full(n, -1, dtype=np.int64)
+        slot[is_leaf] = np.arange(is_leaf.sum()) + n_leaves
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(left)
+        rights.append(right)
+        leaf_slots.append(slot)
+        # (n_leaves, n_classes) for classifiers, (n_leaves, 1) for regressors
+        leaf_values.append(tree.value[is_leaf, 0, :])
+        roots.append(offset)
+        offset += n
+        n_leaves += int(is_leaf.sum())
+
+    index_dtype = np.int32 if offset < 2**31 else np.int64
+    n_features = model.n_features_in_
+    feature_dtype = np.uint8 if n_features < 2**8 else np.uint16 if n_features < 2**16 else np.uint32
+    return {
+        "feature": np.concatenate(features).astype(feature_dtype),
+        "threshold": _float32_floor(np.concatenate(thresholds)),
+        "left": np.concatenate(lefts).astype(index_dtype),
+        "right": np.concatenate(rights).astype(index_dtype),
+        "leaf_slot": np.concatenate(leaf_slots).astype(index_dtype),
+        "leaf_value": np.concatenate(leaf_values).astype(np.float64),
+        "roots": np.asarray(roots, dtype=index_dtype),
+    }
+
+
+class CompactForest:
+    def __init__(self, tables, meta):
+        self.meta = meta
+        self.kind = meta["kind"]
+        self.n_features_in_ = meta["n_features"]
+        self.feature_names_in_ = np.asarray(meta["feature_names"], dtype=object) if meta.get("feature_names") else None
+        self.classes_ = np.asarray(meta["classes"]) if self.kind == "classifier" else None
+        self.max_depth = meta["max_depth"]
+        self.feature = tables["feature"]
+        self.threshold = tables["threshold"]
+        self.left = tables["left"]
+        self.right = tables["right"]
+        self.leaf_slot = tables["leaf_slot"]
+        self.leaf_value = tables["leaf_value"]
+        self.roots = tables["roots"]
+        # children[2 * node + went_left]; leaves are their own children
+        self.children = np.stack([self.right, self.left], axis=1).ravel()
+        self._compiled = None
+
+    @classmethod
+    def from_sklearn(cls, model, source=None):
+        tables = flatten_forest(model)
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "kind": "classifier" if hasattr(model, "classes_") else "regressor",
+            "n_features": int(model.n_features_in_),
+            "feature_names": [str(f) for f in getattr(model, "feature_names_in_", [])],
+            "classes": model.classes_.tolist() if hasattr(model, "classes_") else None,
+            "n_trees": len(model.estimators_),
+            "max_depth": int(max(e.tree_.max_depth for e in model.estimators_)),
+            "source": os.path.basename(source) if source else None,
+            "source_sha256": _sha256(source) if source else None,
+        }
+        return cls(tables, meta)
+
+    def save(self, path):
+        tables = {name: getattr(self, name) for name in
+                  ("feature", "threshold", "left", "right", "leaf_slot", "leaf_value", "roots")}
+        # Uncompressed: loading is a straight read of each array
+        np.savez(path, meta=np.frombuffer(json.dumps(self.meta).encode(), dtype=np.uint8), **tables)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode())
+            if meta.get("format_version") != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported compact forest format {meta.get('format_version')}")
+            tables = {name: data[name] for name in data.files if name != "meta"}
+        return cls(tables, meta)
+
+    # ---------------- INFERENCE ----------------
+    def _as_matrix(self, X):
+        if hasattr(X, "columns") and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected {self.n_features_in_} features, got shape {X.shape}")
+        return X
+
+    def _compile(self):
+        # Bit-table form of the forest (QuickScorer-style). Leaves of each tree
+        # get one bit each, in left-to-right order. A split that sends a row
+        # right rules out every leaf of its left subtree, and the leaf the row
+        # reaches is the leftmost one nobody ruled out. Which splits send a row
+        # right only depends on the threshold interval ("bin") of each feature
+        # value, so for every bin the surviving-leaf bits can be precomputed;
+        # features are packed into groups whose joint bins index one table.
+        if self._compiled is not None:
+            return self._compiled
+        n_nodes, n_features = len(self.feature), self.n_features_in_
+        internal = self.leaf_slot < 0
+        cuts = [np.unique(self.threshold[internal & (self.feature == f)]) for f in range(n_features)]
+
+        groups, radices = [], []
+        for f in range(n_features):
+            radix = len(cuts[f]) + 1
+            if groups and radices[-1] * radix <= MAX_GROUP_ROWS:
+                groups[-1].append(f)
+                radices[-1] *= radix
+            else:
+                groups.append([f])
+                radices.append(radix)
+
+        # Leaf counts bottom-up and first leaf bit top-down, one tree level at a time
+        levels = [self.roots]
+        while True:
+            inner = levels[-1][internal[levels[-1]]]
+            if not len(inner):
+                break
+            levels.append(np.concatenate([self.left[inner], self.right[inner]]))
+        n_leaves = np.ones(n_nodes, dtype=np.int64)
+        for nodes in reversed(levels):
+            inner = nodes[internal[nodes]]
+            n_leaves[inner] = n_leaves[self.left[inner]] + n_leaves[self.right[inner]]
+        tree_words = -(-n_leaves[self.roots] // 64)
+        word_start = np.concatenate([[0], np.cumsum(tree_words)[:-1]])
+        n_words = int(tree_words.sum())
+        first_bit = np.zeros(n_nodes, dtype=np.int64)
+        first_bit[self.roots] = word_start * 64
+        for nodes in levels:
+            inner = nodes[internal[nodes]]
+            first_bit[self.left[inner]] = first_bit[inner]
+            first_bit[self.right[inner]] = first_bit[inner] + n_leaves[self.left[inner]]
+        bit_slot = np.zeros(n_words * 64, dtype=self.leaf_slot.dtype)
+        bit_slot[first_bit[~internal]] = self.leaf_slot[~internal]
+
+        tables = None
+        if sum(radices) * n_words * 8 <= MAX_TABLE_BYTES:
+            tables = []
+            for group in groups:
+                table = None
+                for f in group:
+                    feature_table = self._feature_table(f, cuts[f], internal, first_bit, n_leaves, n_words)
+                    table = feature_table if table is None else \
+                        (table[:, None, :] & feature_table[None, :, :]).reshape(-1, n_words)
+                tables.append(table)
+
+        self._compiled = _Compiled(cuts, groups, radices, tables, word_start, n_words, bit_slot)
+        return self._compiled
+
+    def _feature_table(self, f, cuts, internal, first_bit, n_leaves, n_words):
+        # (len(cuts) + 1, n_words) surviving-leaf bits for every bin of feature f.
+        # A split on threshold cuts[k] sends bins > k right, so the leaves of its
+        # left subtree survive only in bins <= k.
+        nodes = np.flatnonzero(internal & (self.feature == f))
+        k = np.searchsorted(cuts, self.threshold[nodes])
+        left = self.left[nodes]
+        lo, count = first_bit[left], n_leaves[left]
+        bits = np.repeat(lo - np.cumsum(count) + count, count) + np.arange(count.sum())
+        dead_from = np.full(n_words * 64, len(cuts) + 1, dtype=np.int64)
+        np.minimum.at(dead_from, bits, np.repeat(k + 1, count))
+        alive = np.arange(len(cuts) + 1)[:, None] < dead_from[None, :]
+        return np.packbits(alive, axis=1, bitorder="little").view(np.uint64)
+
+    def _group_codes(self, X, compiled):
+        # (n_rows, n_groups) joint bin index of every feature group
+        codes = np.zeros((len(X), len(compiled.groups)), dtype=np.int64)
+        for g, group in enumerate(compiled.groups):
+            for f in group:
+                codes[:, g] *= len(compiled.cuts[f]) + 1
+                codes[:, g] += np.searchsorted(compiled.cuts[f], X[:, f], side="left")
+        return codes
+
+    def _table_slots(self, codes, compiled):
+        # (n_rows, n_trees) leaf slots: AND the group tables, then take the
+        # lowest surviving bit of every tree
+        alive = compiled.tables[0][codes[:, 0]]
+        for g in range(1, len(compiled.tables)):
+            alive &= compiled.tables[g][codes[:, g]]
+        word = np.where(alive != 0, np.arange(compiled.n_words, dtype=np.int32), compiled.n_words)
+        first = np.minimum.reduceat(word, compiled.word_start, axis=1)
+        w = np.take_along_axis(alive, first, axis=1)
+        lowest = w & (~w + np.uint64(1))
+        bit = np.frexp(lowest.astype(np.float64))[1] - 1   # exact: lowest is a power of two
+        return compiled.bit_slot[first.astype(np.int64) * 64 + bit]
+
+    def apply(self, X):
+        # (n_rows, n_trees) leaf slot reached in every tree, by plain traversal:
+        # all (row, tree) pairs step down together and pairs that reached a
+        # leaf are dropped. Used when the bit tables would be too large.
+        n_rows, n_trees = len(X), len(self.roots)
+        flat = X.ravel()
+        nodes = np.tile(self.roots, n_rows)
+        base = np.repeat(np.arange(n_rows, dtype=np.int64) * X.shape[1], n_trees)
+        pos = np.arange(n_rows * n_trees)
+        out = np.empty(n_rows * n_trees, dtype=self.roots.dtype)
+        while len(nodes):
+            go_left = flat[base + self.feature[nodes]] <= self.threshold[nodes]
+            moved = self.children[2 * nodes + go_left]
+            done = moved == nodes
+            if done.any():
+                out[pos[done]] = nodes[done]
+                keep = ~done
+                nodes, base, pos = moved[keep], base[keep], pos[keep]
+            else:
+                nodes = moved
+        return self.leaf_slot[out].reshape(n_rows, n_trees)
+
+    def _accumulate(self, slots):
+        # Sum per-tree leaf values in tree order, like sklearn's forest loop
+        out = np.zeros((len(slots), self.leaf_value.shape[1]), dtype=np.float64)
+        for t in range(slots.shape[1]):
+            out += self.leaf_value[slots[:, t]]
+        out /= slots.shape[1]
+        return out
+
+    def _evaluate(self, X, chunk_rows):
+        X = self._as_matrix(X)
+        compiled = self._compile()
+        codes = self._group_codes(X, compiled)
+        # Rows with the same bins everywhere reach the same leaves: evaluate
+        # each distinct bin combination once
+        inverse = None
+        if len(X) > 1 and np.sum(np.log2(compiled.radices)) < 62:
+            keys = np.zeros(len(X), dtype=np.int64)
+            for g, radix in enumerate(compiled.radices):
+                keys *= radix
+                keys += codes[:, g]
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            X, codes = X[first], codes[first]
+        parts = []
+        for start in range(0, len(X), chunk_rows):
+            stop = start + chunk_rows
+            if compiled.tables is not None:
+                slots = self._table_slots(codes[start:stop], compiled)
+            else:
+                slots = self.apply(X[start:stop])
+            parts.append(self._accumulate(slots))
+        out = np.concatenate(parts) if parts else np.empty((0, self.leaf_value.shape[1]))
+        return out[inverse] if inverse is not None else out
+
+    def predict_proba(self, X, chunk_rows=DEFAULT_CHUNK_ROWS):
+        if self.kind != "classifier":
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._evaluate(X, chunk_rows)
+
+    def predict(self, X, chunk_rows=DEFAULT_CHUNK_ROWS):
+        out = self._evaluate(X, chunk_rows)
+        if self.kind == "classifier":
+            return self.classes_.take(np.argmax(out, axis=1), axis=0)
+        return out[:, 0]
+
+
+def load_forest(path):
+    return CompactForest.load(path)
+
+
+def read_meta(path):
+    with np.load(path, allow_pickle=False) as data:
+        return json.loads(data["meta"].tobytes().decode())
+
+
+def is_current(path):
+    # True unless the pickle next to the compact file is no longer the one it
+    # was exported from (a missing pickle has nothing to disagree with)
+    meta = read_meta(path)
+    if meta.get("format_version") != FORMAT_VERSION:
+        return False
+    source = os.path.join(os.path.dirname(path), meta.get("source") or "")
+    return not os.path.isfile(source) or _sha256(source) == meta.get("source_sha256")
+
+
+# ---------------- EXPORT ----------------
+def validation_matrix(models, n_random=20_000, seed=0):
+    # Every location x every minute of three dates, plus random rows covering
+    # the full encoded range (including unseen-label zeros)
+    from batch_predict import build_features, time_slots
+    from feature_encoding import FeatureEncoder
+
+    encoder = FeatureEncoder.from_models(models)
+    locations = list(encoder.location_index)
+    dates = ["2025-04-03", "2025-05-12", "2026-01-01"]
+    slots = time_slots(1)
+    grid = [(loc, d, t) for loc in locations for d in dates for t in slots]
+    X_grid = build_features(models, *map(list, zip(*grid)), encoder=encoder)
+
+    rng = np.random.default_rng(seed)
+    X_random = X_grid.sample(n_random, replace=True, random_state=seed).reset_index(drop=True)
+    X_random["date"] = rng.integers(0, len(models["date_encoder"].classes_), n_random)
+    X_random["time"] = rng.integers(0, len(models["time_encoder"].classes_), n_random)
+    return X_grid, X_random
+
+
+def verify(model, compact, matrices):
+    # Raises if any prediction differs from sklearn's
+    for X in matrices:
+        expected = model.predict(X)
+        actual = compact.predict(X)
+        if not np.array_equal(expected, actual):
+            mismatched = int(np.sum(expected != actual))
+            raise AssertionError(f"compact forest differs from sklearn on {mismatched} of {len(X)} rows")
+        if compact.kind == "classifier" and not np.array_equal(model.predict_proba(X), compact.predict_proba(X)):
+            raise AssertionError("compact forest class probabilities differ from sklearn")
+    return sum(len(X) for X in matrices)
+
+
+def export(model_dir=BASE_DIR, forests=FORESTS):
+    import joblib
+    from model_registry import ModelRegistry
+
+    models = ModelRegistry(model_dir).load_all()
+    matrices = validation_matrix(models)
+    for pickle_name, compact_name in forests.items():
+        source = os.path.join(model_dir, pickle_name)
+        target = os.path.join(model_dir, compact_name)
+        model = joblib.load(source)
+        start = time.perf_counter()
+        compact = CompactForest.from_sklearn(model, source)
+        rows = verify(model, compact, matrices)
+        compact.save(target)
+        print(f"{pickle_name} -> {compact_name}: {os.path.getsize(source) / 1024:,.0f} KB -> "
+              f"{os.path.getsize(target) / 1024:,.0f} KB, {compact.meta['n_trees']} trees, "
+              f"{len(compact.feature):,} nodes, identical on {rows:,} rows ({time.perf_counter() - start:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Random Forest pickles to compact node tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("export", help="flatten, verify against sklearn and write .npz files")
+    cmd.add_argument("--model-dir", default=BASE_DIR)
+    args = parser.parse_args()
+
+    import warnings
+    warnings.filterwarnings("ignore")
+    export(args.model_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Precompiled feature encoding for the prediction models.
+
+Built once from the pickled encoders: plain dict/array lookups replace
+LabelEncoder.transform and OneHotEncoder.transform on the hot path, and labels
+the encoders never saw are resolved by an explicit policy instead of silently
+becoming 0. For known labels the features are identical to the sklearn path.
+"""
+from datetime import date as date_cls, datetime, time as time_cls
+
+import numpy as np
+import pandas as pd
+
+# Training data used DD-MM-YYYY dates and HH:MM:SS times; the UI produces
+# YYYY-MM-DD and HH:MM. Both are accepted when resolving unseen labels.
+DATE_FORMATS = ("%d-%m-%Y", "%Y-%m-%d")
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+# zero:    legacy behaviour, unseen label -> code 0
+# nearest: closest known date / time of day
+# weekday: closest known date falling on the same day of the week
+DATE_POLICIES = ("zero", "nearest", "weekday")
+TIME_POLICIES = ("zero", "nearest")
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def _parse(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class FeatureEncoder:
+    def __init__(self, location_ohe, date_encoder, time_encoder, unseen_date="weekday", unseen_time="nearest",
+                 location_aliases=None):
+        if unseen_date not in DATE_POLICIES:
+            raise ValueError(f"unseen_date must be one of {DATE_POLICIES}, got {unseen_date!r}")
+        if unseen_time not in TIME_POLICIES:
+            raise ValueError(f"unseen_time must be one of {TIME_POLICIES}, got {unseen_time!r}")
+        self.unseen_date = unseen_date
+        self.unseen_time = unseen_time
+
+        # Location: category -> one-hot column. Unknown categories encode to an
+        # all-zero block, as OneHotEncoder(handle_unknown='ignore') does.
+        categories = list(location_ohe.categories_[0])
+        self.location_names = list(location_ohe.get_feature_names_out(['location_name']))
+        self.location_index = {name: i for i, name in enumerate(categories)}
+        # Catalog ids and aliases (location_catalog) share their canonical
+        # name's column
+        for alias, name in (location_aliases or {}).items():
+            if name in self.location_index:
+                self.location_index.setdefault(alias, self.location_index[name])
+        self.feature_names = self.location_names + ['date', 'time']
+        self.n_features = len(self.feature_names)
+
+        # Date: label -> code, plus the parsed calendar date of every class
+        self.date_codes = {label: i for i, label in enumerate(date_encoder.classes_)}
+        parsed = [_parse(str(label), DATE_FORMATS) for label in date_encoder.classes_]
+        self._date_ordinals = np.array([p.toordinal() if p else -1 for p in parsed])
+        self._date_weekdays = np.array([p.weekday() if p else -1 for p in parsed])
+        self._resolved_dates = {}
+
+        # Time: label -> code, plus a 1440-entry minute-of-day table holding the
+        # code of the nearest known slot, so any "HH:MM" resolves by indexing
+        self.time_codes = {label: i for i, label in enumerate(time_encoder.classes_)}
+        parsed = [_parse(str(label), TIME_FORMATS) for label in time_encoder.classes_]
+        seconds = np.array([p.hour * 3600 + p.minute * 60 + p.second if p else -1 for p in parsed])
+        valid = np.flatnonzero(seconds >= 0)
+        self._time_seconds = seconds
+        if len(valid):
+            minute_seconds = np.arange(24 * 60)[:, None] * 60
+            gap = np.abs(minute_seconds - seconds[valid][None, :])
+            gap = np.minimum(gap, SECONDS_PER_DAY - gap)  # 23:59 is next to 00:00
+            self.minute_table = valid[np.argmin(gap, axis=1)]
+        else:
+            self.minute_table = np.zeros(24 * 60, dtype=np.int64)
+
+        # Every "HH:MM" the UI can produce, resolved up front under the policy
+        self._time_lookup = {
+            f"{m // 60:02d}:{m % 60:02d}": int(self.minute_table[m]) if unseen_time == "nearest" else 0
+            for m in range(24 * 60)
+        }
+        self._time_lookup.update(self.time_codes)
+
+    @classmethod
+    def from_models(cls, models, **policy):
+        return cls(models['location_ohe'], models['date_encoder'], models['time_encoder'], **policy)
+
+    # ---------------- SCALAR LOOKUPS ----------------
+    def encode_date(self, value):
+        if isinstance(value, (date_cls, datetime)):
+            value = value.strftime("%Y-%m-%d")
+        code = self.date_codes.get(value)
+        if code is not None:
+            return code
+        code = self._resolved_dates.get(value)
+        if code is None:
+            code = self._resolve_date(value)
+            self._resolved_dates[value] = code
+        return code
+
+    def _resolve_date(self, value):
+        parsed = _parse(value, DATE_FORMATS)
+        if self.unseen_date == "zero" or parsed is None or not (self._date_ordinals >= 0).any():
+            return 0
+        distance = np.abs(self._date_ordinals - parsed.toordinal()).astype(np.float64)
+        distance[self._date_ordinals < 0] = np.inf
+        if self.unseen_date == "weekday":
+            same_day = self._date_weekdays == parsed.weekday()
+            if same_day.any():
+                distance[~same_day] = np.inf
+        return int(np.argmin(distance))
+
+    def encode_time(self, value):
+        if isinstance(value, (time_cls, datetime)):
+            value = value.strftime("%H:%M")
+        code = self._time_lookup.get(value)
+        if code is not None:
+            return code
+        if self.unseen_time == "zero":
+            return 0
+        parsed = _parse(value, TIME_FORMATS)
+        if parsed is None:
+            return 0
+        return int(self.minute_table[parsed.hour * 60 + parsed.minute])
+
+    # ---------------- FEATURE ROWS ----------------
+    def transform_one(self, location, date_value, time_value):
+        row = np.zeros((1, self.n_features), dtype=np.float64)
+        col = self.location_index.get(location)
+        if col is not None:
+            row[0, col] = 1.0
+        row[0, -2] = self.encode_date(date_value)
+        row[0, -1] = self.encode_time(time_value)
+        return row
+
+    def _encode_column(self, values, encode):
+        # Encode each distinct label once, then broadcast back to all rows
+        inverse, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+        return np.fromiter((encode(v) for v in uniques), dtype=np.float64, count=len(uniques))[inverse]
+
+    def transform(self, locations, dates, times):
+        n = len(locations)
+        matrix = np.zeros((n, self.n_features), dtype=np.float64)
+        cols = pd.Series(locations, dtype=object).map(self.location_index).to_numpy(dtype=np.float64, na_value=-1)
+        known = cols >= 0
+        matrix[np.flatnonzero(known), cols[known].astype(np.int64)] = 1.0
+        matrix[:, -2] = self._encode_column(dates, self.encode_date)
+        matrix[:, -1] = self._encode_column(times, self.encode_time)
+        return matrix
+
+    def frame(self, matrix):
+        # sklearn models were fitted on named columns; keep them to avoid warnings
+        return pd.DataFrame(matrix, columns=self.feature_names, copy=False)
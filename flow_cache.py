@@ -0,0 +1,91 @@
+"""
+Server-side TTL cache for live flow readings, shared by every dashboard session.
+
+Entries are keyed by (lat, lon, zoom). Within `ttl` a reading is served as-is;
+between `ttl` and `ttl + stale_ttl` it is still served immediately while one
+background refresh runs (stale-while-revalidate); after that callers wait for
+a fresh fetch. Concurrent requests for the same point share a single upstream
+call (single-flight).
+"""
+import os
+import threading
+import time
+
+FLOW_TTL = float(os.environ.get("VISION_FLOW_TTL", 60))
+FLOW_STALE_TTL = float(os.environ.get("VISION_FLOW_STALE_TTL", 300))
+
+
+class FlowCache:
+    def __init__(self, fetcher, ttl=FLOW_TTL, stale_ttl=FLOW_STALE_TTL):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}      # key -> FlowResult of the last successful fetch
+        self._inflight = {}     # key -> Future of the running fetch
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                         "upstream_calls": 0, "upstream_errors": 0}
+
+    def key(self, lat, lon):
+        return (round(lat, 5), round(lon, 5), self.fetcher.zoom)
+
+    def _refresh(self, key, location):
+        result = self.fetcher.fetch_location(location)
+        with self._lock:
+            self.counters["upstream_calls"] += 1
+            if result.error is None:
+                self._entries[key] = result
+            else:
+                self.counters["upstream_errors"] += 1
+            self._inflight.pop(key, None)
+        return result
+
+    def _start_refresh(self, key, location):
+        # Caller holds self._lock
+        future = self._inflight.get(key)
+        if future is None:
+            future = self.fetcher.submit(self._refresh, key, location)
+            self._inflight[key] = future
+        return future
+
+    def get_many(self, locations):
+        # Results in the same order as `locations`; only missing/expired points
+        # go upstream, and those are fetched concurrently
+        now = time.time()
+        results = [None] * len(locations)
+        waiting = []
+        with self._lock:
+            for i, location in enumerate(locations):
+                lat, lon, name = location
+                key = self.key(lat, lon)
+                entry = self._entries.get(key)
+                age = now - entry.fetched_at if entry is not None else None
+
+                if entry is not None and age < self.ttl:
+                    self.counters["hits"] += 1
+                    results[i] = entry._replace(name=name)
+                elif entry is not None and age < self.ttl + self.stale_ttl:
+                    self.counters["stale_hits"] += 1
+                    results[i] = entry._replace(name=name)
+                    self._start_refresh(key, location)
+                else:
+                    self.counters["coalesced" if key in self._inflight else "misses"] += 1
+                    waiting.append((i, name, self._start_refresh(key, location)))
+
+        for i, name, future in waiting:
+            results[i] = future.result()._replace(name=name)
+        return results
+
+    def peek_many(self, locations):
+        # Whatever is cached, however old, without going upstream
+        with self._lock:
+            return [self._entries[self.key(lat, lon)]._replace(name=name)
+                    for lat, lon, name in locations if self.key(lat, lon) in self._entries]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters["entries"] = len(self._entries)
+        served = counters["hits"] + counters["stale_hits"] + counters["misses"] + counters["coalesced"]
+        counters["hit_rate"] = (counters["hits"] + counters["stale_hits"]) / served if served else 0.0
+        return counters
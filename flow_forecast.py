@@ -0,0 +1,314 @@
+"""
+Short-horizon traffic forecasting from recent observations.
+
+The shipped models only see location plus label-encoded date/time, so they
+cannot use what a road is doing right now and cannot extrapolate to days
+they never saw. This engine forecasts currentSpeed, speed_ratio and
+delay_time 15/30/60 minutes ahead for every location from:
+
+- the last N readings of each signal per location (lags) and their rolling mean
+- hour-of-day (three harmonics, enough for morning/evening peaks) and
+  day-of-week as sin/cos pairs
+
+One ridge model per horizon is fitted on the history store. It predicts the
+change from the latest reading, so regularization shrinks towards
+persistence rather than towards the mean. The coefficients are stacked, so
+a forecast for all locations and horizons is a single matrix product.
+LagWindows keeps per-location ring buffers with running sums and is caught
+up from the store by row id, so new readings cost O(new rows) instead of
+recomputing windows from history.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+SIGNALS = ("currentSpeed", "speed_ratio", "delay_time")
+HORIZONS = (15, 30, 60)
+N_LAGS = 6
+HOUR_HARMONICS = 3
+MIN_TRAIN_ROWS = 30     # per horizon, and at least two per feature
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def cyclic_features(timestamps):
+    ts = pd.DatetimeIndex(timestamps)
+    hour = (ts.hour + ts.minute / 60).to_numpy(dtype=np.float64)
+    dow = ts.dayofweek.to_numpy(dtype=np.float64) + hour / 24
+    columns = []
+    for k in range(1, HOUR_HARMONICS + 1):
+        columns += [np.sin(2 * np.pi * k * hour / 24), np.cos(2 * np.pi * k * hour / 24)]
+    columns += [np.sin(2 * np.pi * dow / 7), np.cos(2 * np.pi * dow / 7)]
+    out = np.column_stack(columns)
+    # Locations with no readings yet have NaT timestamps
+    return np.nan_to_num(out)
+
+
+def cyclic_names():
+    names = []
+    for k in range(1, HOUR_HARMONICS + 1):
+        names += [f"hour_sin{k}", f"hour_cos{k}"]
+    return names + ["dow_sin", "dow_cos"]
+
+
+def feature_names(n_lags=N_LAGS, signals=SIGNALS):
+    return ([f"{s}_lag{k}" for s in signals for k in range(1, n_lags + 1)]
+            + [f"{s}_mean" for s in signals]
+            + cyclic_names())
+
+
+# ---------------- INCREMENTAL WINDOWS ----------------
+class LagWindows:
+    def __init__(self, n_lags=N_LAGS, signals=SIGNALS, capacity=64):
+        self.n_lags = n_lags
+        self.signals = tuple(signals)
+        self.names = []
+        self.index = {}
+        self.last_id = -1           # last store row folded in
+        # Shared between dashboard sessions
+        self._lock = threading.RLock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        n_signals = len(self.signals)
+        old = getattr(self, "_buf", None)
+        buf = np.full((capacity, n_signals, self.n_lags), np.nan)
+        sums = np.zeros((capacity, n_signals))
+        count = np.zeros(capacity, dtype=np.int64)
+        last_ts = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[s]")
+        if old is not None:
+            n = len(old)
+            buf[:n], sums[:n], count[:n], last_ts[:n] = self._buf, self._sums, self._count, self._last_ts
+        self._buf, self._sums, self._count, self._last_ts = buf, sums, count, last_ts
+
+    def _rows_for(self, locations):
+        for name in pd.unique(locations):
+            if name not in self.index:
+                self.index[name] = len(self.names)
+                self.names.append(name)
+        if len(self.names) > len(self._count):
+            self._allocate(max(len(self.names), 2 * len(self._count)))
+        return pd.Series(locations).map(self.index).to_numpy(dtype=np.int64)
+
+    def update(self, locations, timestamps, values):
+        # Fold readings in; out-of-order or incomplete readings are skipped
+        with self._lock:
+            self._update(locations, timestamps, values)
+
+    def _update(self, locations, timestamps, values):
+        values = np.asarray(values, dtype=np.float64).reshape(len(locations), len(self.signals))
+        ts = pd.to_datetime(pd.Series(timestamps), format=TIMESTAMP_FORMAT, errors="coerce").to_numpy("datetime64[s]")
+        order = np.argsort(ts, kind="stable")
+        rows = self._rows_for(np.asarray(locations, dtype=object)[order])
+        ts, values = ts[order], values[order]
+
+        keep = np.isfinite(values).all(axis=1) & ~np.isnat(ts)
+        rows, ts, values = rows[keep], ts[keep], values[keep]
+        # Each pass writes at most one reading per location, in time order
+        while len(rows):
+            _, first = np.unique(rows, return_index=True)
+            take = np.zeros(len(rows), dtype=bool)
+            take[first] = True
+            r, t, v = rows[take], ts[take], values[take]
+            fresh = np.isnat(self._last_ts[r]) | (t >= self._last_ts[r])
+            r, t, v = r[fresh], t[fresh], v[fresh]
+
+            slot = self._count[r] % self.n_lags
+            evicted = np.where((self._count[r] >= self.n_lags)[:, None], self._buf[r, :, slot], 0.0)
+            self._sums[r] += v - evicted
+            self._buf[r, :, slot] = v
+            self._count[r] += 1
+            self._last_ts[r] = t
+            rows, ts, values = rows[~take], ts[~take], values[~take]
+
+    def catch_up(self, store, chunk_rows=200_000):
+        # Fold in every store row appended since the last call
+        columns = ["timestamp", "location_name", *self.signals]
+        added = 0
+        with self._lock:
+            while True:
+                df = store.readings_since(self.last_id, columns, limit=chunk_rows)
+                if df.empty:
+                    return added
+                self._update(df["location_name"].to_numpy(dtype=object), df["timestamp"],
+                             df[list(self.signals)].to_numpy(dtype=np.float64))
+                self.last_id = int(df["id"].iloc[-1])
+                added += len(df)
+
+    def features(self):
+        # (n_locations, n_features) matrix and a mask of locations with data
+        with self._lock:
+            return self._features()
+
+    def _features(self):
+        n = len(self.names)
+        count = self._count[:n]
+        filled = np.minimum(count, self.n_lags)
+        mean = self._sums[:n] / np.maximum(filled, 1)[:, None]
+
+        k = np.arange(1, self.n_lags + 1)
+        slots = (count[:, None] - k[None, :]) % self.n_lags
+        lags = np.take_along_axis(self._buf[:n], np.broadcast_to(slots[:, None, :], (n, len(self.signals), self.n_lags)),
+                                  axis=2)
+        # Fewer than n_lags readings so far: pad with the window mean
+        missing = k[None, :] > count[:, None]
+        lags = np.where(missing[:, None, :], mean[:, :, None], lags)
+
+        X = np.concatenate([lags.reshape(n, -1), mean, cyclic_features(self._last_ts[:n])], axis=1)
+        return X, count > 0
+
+    def as_of(self):
+        return pd.to_datetime(self._last_ts[:len(self.names)])
+
+
+# ---------------- TRAINING ----------------
+def training_frame(history, n_lags=N_LAGS, signals=SIGNALS, horizons=HORIZONS):
+    # Same features LagWindows produces, computed in bulk, plus a target per
+    # horizon: the reading nearest to t + h (within h/3, at least 5 minutes)
+    signals = list(signals)
+    df = history[["timestamp", "location_name", *signals]].dropna().copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+    df = df.dropna(subset=["timestamp"]).sort_values(["location_name", "timestamp"], kind="stable")
+    df = df.reset_index(drop=True)
+    grouped = df.groupby("location_name", sort=False)
+
+    columns = {}
+    means = {}
+    for s in signals:
+        means[s] = grouped[s].rolling(n_lags, min_periods=1).mean().reset_index(level=0, drop=True).sort_index()
+        for k in range(1, n_lags + 1):
+            columns[f"{s}_lag{k}"] = grouped[s].shift(k - 1).fillna(means[s])
+    for s in signals:
+        columns[f"{s}_mean"] = means[s]
+    features = pd.DataFrame(columns, index=df.index)
+    cyc = cyclic_features(df["timestamp"])
+    for i, name in enumerate(cyclic_names()):
+        features[name] = cyc[:, i]
+
+    targets = {}
+    right = df[["timestamp", "location_name", *signals]].sort_values("timestamp", kind="stable")
+    for h in horizons:
+        left = pd.DataFrame({"target_time": df["timestamp"] + pd.Timedelta(minutes=h),
+                             "location_name": df["location_name"], "row": df.index})
+        matched = pd.merge_asof(
+            left.sort_values("target_time", kind="stable"), right,
+            left_on="target_time", right_on="timestamp", by="location_name",
+            direction="nearest", tolerance=pd.Timedelta(minutes=max(5, h / 3)),
+        ).set_index("row").sort_index()
+        targets[h] = matched[signals]
+    return df, features, targets
+
+
+class FlowForecaster:
+    def __init__(self, n_lags=N_LAGS, signals=SIGNALS, horizons=HORIZONS, alpha=10.0):
+        self.n_lags = n_lags
+        self.signals = tuple(signals)
+        self.horizons = tuple(horizons)
+        self.alpha = alpha
+        self.feature_names = feature_names(n_lags, signals)
+        self.train_stats = []
+        self._W = None      # (n_features, n_horizons * n_signals)
+        self._b = None
+
+    def _persistence(self):
+        # Forecast = latest reading; used for horizons without enough history
+        coef = np.zeros((len(self.signals), len(self.feature_names)))
+        for i, s in enumerate(self.signals):
+            coef[i, self.feature_names.index(f"{s}_lag1")] = 1.0
+        return coef, np.zeros(len(self.signals))
+
+    def fit(self, history, holdout=0.2):
+        # sklearn is only needed to fit (about 2s to import); loading a saved
+        # forecaster or predicting does not touch it
+        from sklearn.linear_model import Ridge
+
+        df, features, targets = training_frame(history, self.n_lags, self.signals, self.horizons)
+        X = features.to_numpy(dtype=np.float64)
+        lag1 = features[[f"{s}_lag1" for s in self.signals]].to_numpy()
+        # Time-based split for the reported errors; the final fit uses every row
+        cutoff = df["timestamp"].quantile(1 - holdout) if len(df) else None
+
+        min_rows = max(MIN_TRAIN_ROWS, 2 * len(self.feature_names))
+        coefs, intercepts, self.train_stats = [], [], []
+        for h in self.horizons:
+            y = targets[h].to_numpy(dtype=np.float64)
+            valid = np.isfinite(y).all(axis=1)
+            stats = {"horizon_min": h, "rows": int(valid.sum())}
+            if valid.sum() < min_rows:
+                coef, intercept = self._persistence()
+                stats["model"] = "persistence"
+            else:
+                mu, sigma = X[valid].mean(axis=0), X[valid].std(axis=0)
+                sigma[sigma == 0] = 1.0
+
+                test = valid & (df["timestamp"] > cutoff).to_numpy()
+                train = valid & ~test
+                relative_error = None
+                if train.sum() >= min_rows and test.any():
+                    probe = Ridge(alpha=self.alpha).fit((X[train] - mu) / sigma, y[train] - lag1[train])
+                    pred = probe.predict((X[test] - mu) / sigma) + lag1[test]
+                    ratios = []
+                    for i, s in enumerate(self.signals):
+                        stats[f"{s}_mae"] = float(np.abs(pred[:, i] - y[test, i]).mean())
+                        stats[f"{s}_mae_persistence"] = float(np.abs(lag1[test, i] - y[test, i]).mean())
+                        if stats[f"{s}_mae_persistence"] > 0:
+                            ratios.append(stats[f"{s}_mae"] / stats[f"{s}_mae_persistence"])
+                    relative_error = np.mean(ratios) if ratios else None
+
+                if relative_error is not None and relative_error >= 1.0:
+                    # No better than carrying the latest reading forward on the holdout
+                    coef, intercept = self._persistence()
+                    stats["model"] = "persistence"
+                else:
+                    model = Ridge(alpha=self.alpha).fit((X[valid] - mu) / sigma, y[valid] - lag1[valid])
+                    # Fold the standardization and the lag1 offset into the coefficients
+                    persistence, _ = self._persistence()
+                    coef = model.coef_ / sigma
+                    intercept = model.intercept_ - coef @ mu
+                    coef = coef + persistence
+                    stats["model"] = "ridge"
+            coefs.append(coef)
+            intercepts.append(intercept)
+            self.train_stats.append(stats)
+
+        self._W = np.concatenate(coefs, axis=0).T
+        self._b = np.concatenate(intercepts)
+        return self
+
+    def predict(self, X):
+        # (n, n_horizons, n_signals) for an (n, n_features) matrix
+        return (X @ self._W + self._b).reshape(len(X), len(self.horizons), len(self.signals))
+
+    def forecast(self, windows):
+        # Tidy frame: one row per (location, horizon) with data
+        X, ready = windows.features()
+        names = np.asarray(windows.names, dtype=object)[ready]
+        as_of = windows.as_of()[ready]
+        pred = self.predict(X[ready])
+
+        n, n_h = len(names), len(self.horizons)
+        horizons = np.tile(np.asarray(self.horizons), n)
+        out = pd.DataFrame({
+            "location_name": np.repeat(names, n_h),
+            "as_of": np.repeat(as_of, n_h),
+            "horizon_min": horizons,
+        })
+        out["target_time"] = out["as_of"] + pd.to_timedelta(horizons, unit="min")
+        for i, s in enumerate(self.signals):
+            out[s] = pred[:, :, i].reshape(-1)
+        out["currentSpeed"] = out["currentSpeed"].clip(lower=0)
+        out["speed_ratio"] = out["speed_ratio"].clip(lower=0)
+        return out.round({"currentSpeed": 1, "speed_ratio": 2, "delay_time": 0})
+
+    @classmethod
+    def train_from_store(cls, store, max_rows=500_000, **kwargs):
+        # Fits on the most recent `max_rows` store rows and returns the model
+        # together with windows already caught up to the end of the store
+        history = store.readings_since(max(-1, store.last_id() - max_rows),
+                                       ["timestamp", "location_name", *kwargs.get("signals", SIGNALS)])
+        forecaster = cls(**kwargs).fit(history)
+        windows = LagWindows(forecaster.n_lags, forecaster.signals)
+        windows.update(history["location_name"].to_numpy(dtype=object), history["timestamp"],
+                       history[list(forecaster.signals)].to_numpy(dtype=np.float64))
+        windows.last_id = int(history["id"].iloc[-1]) if len(history) else -1
+        return forecaster, windows
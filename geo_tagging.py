@@ -0,0 +1,133 @@
+"""
+Vectorized geo-tagging: assigns `location_name` to raw coordinates by nearest
+landmark, replacing the lat/lon BETWEEN ... CASE mapping in
+`vehicle queries.sql`.
+
+Landmarks are the located entries of the location catalog (locations.json,
+see location_catalog.py). Points are projected onto the unit sphere and
+looked up in a KD-tree, so tagging is one vectorized query over NumPy arrays
+regardless of how many landmarks are configured. A point takes the nearest
+landmark whose radius covers it, so a small landmark next to a city does not
+hide the city's wider radius; anything covered by none goes to an explicit
+unknown bucket instead of a made-up city.
+
+    python geo_tagging.py retag                # re-tag the history store in place
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from location_catalog import LOCATIONS_FILE, LocationCatalog
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _to_xyz(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def _km_to_chord(km):
+    return 2.0 * np.sin(np.asarray(km, dtype=np.float64) / (2.0 * EARTH_RADIUS_KM))
+
+
+def _chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+class GeoTagger:
+    def __init__(self, landmarks, max_distance_km=1.5, unknown="Unknown"):
+        self.names = np.array([lm["name"] for lm in landmarks], dtype=object)
+        self.latitudes = np.array([lm["latitude"] for lm in landmarks], dtype=np.float64)
+        self.longitudes = np.array([lm["longitude"] for lm in landmarks], dtype=np.float64)
+        # Optional per-landmark radius, e.g. a wide one for a whole city
+        self.radius_km = np.array([lm.get("radius_km", max_distance_km) for lm in landmarks], dtype=np.float64)
+        self.max_distance_km = max_distance_km
+        self.unknown = unknown
+        self._tree = cKDTree(_to_xyz(self.latitudes, self.longitudes))
+        self._labels = np.append(self.names, unknown)
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        landmarks = [{"name": loc.name, "latitude": loc.latitude, "longitude": loc.longitude,
+                      "radius_km": catalog.max_distance_km if loc.radius_km is None else loc.radius_km}
+                     for loc in catalog.located]
+        return cls(landmarks, catalog.max_distance_km, catalog.unknown)
+
+    @classmethod
+    def from_config(cls, path=LOCATIONS_FILE):
+        return cls.from_catalog(LocationCatalog.from_config(path))
+
+    def nearest(self, lat, lon):
+        # Index of the nearest landmark whose radius covers the point
+        # (len(names) if none) and the great-circle distance to it in km (inf
+        # if none). Candidates come nearest first, k at a time; a point whose
+        # k candidates are all within the widest radius but none covers it is
+        # queried again with twice as many
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        index = np.full(lat.shape, len(self.names), dtype=np.int64)
+        distance_km = np.full(lat.shape, np.inf)
+
+        points = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        xyz = _to_xyz(lat[points], lon[points])
+        bound = _km_to_chord(self.radius_km.max())
+        pending, k = np.arange(len(points)), 1
+        while pending.size:
+            chord, idx = self._tree.query(xyz[pending], k=k, distance_upper_bound=bound)
+            chord, idx = chord.reshape(len(pending), k), idx.reshape(len(pending), k)
+            found = idx < len(self.names)
+            km = np.full(chord.shape, np.inf)
+            km[found] = _chord_to_km(chord[found])
+            covers = found & (km <= self.radius_km[np.minimum(idx, len(self.names) - 1)])
+            hit = covers.any(axis=1)
+            first = covers.argmax(axis=1)[hit]
+            index[points[pending[hit]]] = idx[hit, first]
+            distance_km[points[pending[hit]]] = km[hit, first]
+            if k == len(self.names):
+                break
+            pending, k = pending[~hit & found[:, -1]], min(2 * k, len(self.names))
+        return index, distance_km
+
+    def within(self, lat, lon, radius_km):
+        # Indices of the landmarks within radius_km of one point and their
+        # distances in km, nearest first
+        xyz = _to_xyz(lat, lon)
+        index = np.asarray(self._tree.query_ball_point(xyz[0], _km_to_chord(radius_km)), dtype=np.int64)
+        km = _chord_to_km(np.linalg.norm(self._tree.data[index] - xyz, axis=1))
+        order = np.argsort(km, kind="stable")
+        return index[order], km[order]
+
+    def tag(self, lat, lon):
+        index, _ = self.nearest(lat, lon)
+        return self._labels[index]
+
+
+def retag_store(store, tagger):
+    # Re-tag every stored row; the store rebuilds its aggregates afterwards
+    return store.relabel_locations(tagger.tag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geo-tag traffic readings by nearest landmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    retag = sub.add_parser("retag", help="re-tag all rows in the history store")
+    retag.add_argument("--db", default=None, help="history store path (defaults to VISION_HISTORY_DB)")
+    retag.add_argument("--locations", default=LOCATIONS_FILE, help="location catalog")
+    args = parser.parse_args()
+
+    from history_store import HistoryStore, get_store
+    store = HistoryStore(args.db) if args.db else get_store()
+    tagger = GeoTagger.from_config(args.locations)
+
+    start = time.perf_counter()
+    changed = retag_store(store, tagger)
+    print(f"re-tagged {store.row_count():,} rows ({changed:,} changed) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
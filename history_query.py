@@ -0,0 +1,299 @@
+"""
+Filtered historical queries: the Analytics page's hourly profile for a date
+range, a set of locations and FRC (functional road class) classes.
+
+The history store keeps the readings partitioned by date and location in
+rollup_date_location_frc_hour (clustered on date, location, FRC, hour), so a
+filter is pushed down into the primary key: a date range is one range scan,
+each selected location within it another, and only the partitions in the
+slice are read. A query costs the same however many days of history lie
+outside the slice. The `raw` path reads traffic_data instead, with the same
+predicates on its timestamp/location indexes and only the columns the
+profile needs.
+
+Percentiles (p50/p90/p99 of speed, delay and speed ratio) come from the
+store's quantile sketches: bin counts per (location, date, hour), also kept
+per (location, date) and per (location, hour), merged for the slice by SQL
+and read off within quantile_sketch.SKETCH_ACCURACY relative error. A merged
+sketch has at most quantile_sketch.MAX_BINS bins per metric however long the
+slice. Sketches have no FRC dimension.
+
+    python history_query.py --start 2025-04-03 --end 2025-04-07 --location "India Gate, Delhi, India"
+    python history_query.py --frc FRC1 FRC2 --raw
+    python history_query.py verify             # partitions vs raw, exit 1 on mismatch
+    python history_query.py percentiles --hour 8 9 18 19 [--exact]
+    python history_query.py verify-percentiles # sketches vs exact quantiles, exit 1 past the error bound
+"""
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import quantile_sketch
+import traffic_metrics
+from history_store import SKETCH_METRICS, get_store
+
+# start/end: "YYYY-MM-DD", inclusive; locations/frcs: names to keep. None (or
+# an empty list) leaves that dimension unrestricted
+HistoryFilter = namedtuple("HistoryFilter", ["start", "end", "locations", "frcs"], defaults=(None, None, None, None))
+
+# All the hourly profile reads from a reading
+PROFILE_COLUMNS = ["timestamp", "currentSpeed", "currentTravelTime", "freeFlowTravelTime"]
+PROFILE_FIELDS = ["hour", "readings", "currentSpeed", "currentTravelTime", "freeFlowTravelTime", "avg_delay"]
+
+PARTITIONS = "rollup_date_location_frc_hour"
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def is_filtered(filters):
+    return filters is not None and any(filters)
+
+
+def _where(filters, raw):
+    # SQL predicates and parameters for `filters`; on traffic_data the date
+    # range becomes a timestamp range so it stays on idx_traffic_timestamp
+    clauses, params = [], []
+    if filters.start:
+        clauses.append("timestamp >= ?" if raw else "date >= ?")
+        params.append(f"{filters.start} 00:00:00" if raw else str(filters.start))
+    if filters.end:
+        clauses.append("timestamp <= ?" if raw else "date <= ?")
+        params.append(f"{filters.end} 23:59:59" if raw else str(filters.end))
+    for column, values in (("location_name", filters.locations), ("frc", filters.frcs)):
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _finish(df):
+    df["avg_delay"] = traffic_metrics.delay(df["currentTravelTime"], df["freeFlowTravelTime"])
+    return df[PROFILE_FIELDS]
+
+
+def hourly_profile(filters=None, store=None):
+    # Same frame as HistoryStore.hourly_profile, for the readings in the slice
+    store = store or get_store()
+    where, params = _where(filters or HistoryFilter(), raw=False)
+    df = pd.read_sql_query(
+        "SELECT hour, SUM(n) AS readings, SUM(sum_speed) / SUM(n_speed) AS currentSpeed, "
+        "SUM(sum_travel_time) / SUM(n_travel_time) AS currentTravelTime, "
+        "SUM(sum_free_flow_travel_time) / SUM(n_free_flow_travel_time) AS freeFlowTravelTime "
+        f"FROM {PARTITIONS}{where} GROUP BY hour ORDER BY hour",
+        store.connect(), params=params
+    )
+    return _finish(df)
+
+
+def readings(filters=None, columns=PROFILE_COLUMNS, store=None):
+    # The matching rows of traffic_data, projected to `columns`
+    store = store or get_store()
+    where, params = _where(filters or HistoryFilter(), raw=True)
+    return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM traffic_data{where}", store.connect(), params=params)
+
+
+def raw_hourly_profile(filters=None, store=None):
+    df = readings(filters, store=store)
+    df["hour"] = pd.to_datetime(df["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce").dt.hour
+    df = df.dropna(subset=["hour"]).groupby("hour", as_index=False).agg(
+        readings=("currentSpeed", "size"),
+        currentSpeed=("currentSpeed", "mean"),
+        currentTravelTime=("currentTravelTime", "mean"),
+        freeFlowTravelTime=("freeFlowTravelTime", "mean"),
+    )
+    df["hour"] = df["hour"].astype(int)
+    return _finish(df)
+
+
+def filter_options(store=None):
+    # {start, end, locations, frcs} the filters can choose from. Date bounds
+    # come off the ends of the primary key and FRC classes are skip-scanned
+    # on their index, so this costs the same for any history size
+    store = store or get_store()
+    conn = store.connect()
+    start = conn.execute(f"SELECT MIN(date) FROM {PARTITIONS}").fetchone()[0]
+    end = conn.execute(f"SELECT MAX(date) FROM {PARTITIONS}").fetchone()[0]
+    frcs = [frc for (frc,) in conn.execute(
+        f"WITH RECURSIVE classes(frc) AS (SELECT MIN(frc) FROM {PARTITIONS} "
+        f"UNION ALL SELECT (SELECT MIN(frc) FROM {PARTITIONS} WHERE frc > classes.frc) "
+        "FROM classes WHERE classes.frc IS NOT NULL) SELECT frc FROM classes WHERE frc IS NOT NULL"
+    ) if frc]
+    return {"start": start, "end": end, "locations": store.location_names(), "frcs": frcs}
+
+
+def _percentile_fields(qs):
+    return ["metric", "readings"] + [f"p{q * 100:g}" for q in qs]
+
+
+def percentiles(filters=None, hours=None, qs=PERCENTILES, metrics=SKETCH_METRICS, store=None):
+    # One row per metric: readings in the slice and its quantiles qs, merged
+    # from the sketches of the slice's (location, date, hour) cells.
+    # `hours` (0-23) narrows the slice to those hours of the day
+    store = store or get_store()
+    filters = filters or HistoryFilter()
+    if filters.frcs:
+        raise ValueError("quantile sketches are kept per location, date and hour, not per FRC class")
+    clauses = [f"metric IN ({', '.join('?' * len(metrics))})"]
+    params = [SKETCH_METRICS.index(metric) for metric in metrics]
+    if filters.start or filters.end:
+        table = "sketch_location_date_hour" if hours else "sketch_location_date"
+        clauses.append("date BETWEEN ? AND ?")
+        params += [str(filters.start or "0000-00-00"), str(filters.end or "9999-99-99")]
+    else:
+        table = "sketch_location_hour"
+    # No locations selected means every location, including readings without one
+    if filters.locations:
+        clauses.append(f"location_name IN ({', '.join('?' * len(filters.locations))})")
+        params += list(filters.locations)
+    if hours:
+        clauses.append(f"hour IN ({', '.join('?' * len(hours))})")
+        params += [int(hour) for hour in hours]
+    merged = pd.read_sql_query(
+        f"SELECT metric, bin, SUM(n) AS n FROM {table} WHERE {' AND '.join(clauses)} GROUP BY metric, bin",
+        store.connect(), params=params
+    )
+    rows = []
+    for metric in metrics:
+        sketch = merged[merged["metric"] == SKETCH_METRICS.index(metric)]
+        rows.append([metric, int(sketch["n"].sum())] +
+                    quantile_sketch.quantiles(sketch["bin"].to_numpy(), sketch["n"].to_numpy(), qs).tolist())
+    return pd.DataFrame(rows, columns=_percentile_fields(qs))
+
+
+def exact_percentiles(filters=None, hours=None, qs=PERCENTILES, metrics=SKETCH_METRICS, store=None):
+    # The same frame from the matching readings themselves
+    df = readings(filters, ["timestamp"] + list(metrics), store)
+    if hours:
+        df = df[pd.to_numeric(df["timestamp"].str[11:13], errors="coerce").isin([int(hour) for hour in hours])]
+    rows = []
+    for metric in metrics:
+        values = df[metric].dropna().to_numpy(dtype=np.float64)
+        exact = np.quantile(values, qs, method="lower") if len(values) else np.full(len(qs), np.nan)
+        rows.append([metric, len(values)] + exact.tolist())
+    return pd.DataFrame(rows, columns=_percentile_fields(qs))
+
+
+def percentile_errors(expected, actual):
+    # Relative error of each sketch quantile against the exact one; values
+    # within MIN_VALUE of 0 are compared absolutely
+    columns = [c for c in expected.columns if c.startswith("p")]
+    exact, estimate = expected[columns].to_numpy(), actual[columns].to_numpy()
+    scale = np.maximum(np.abs(exact), quantile_sketch.MIN_VALUE)
+    return pd.DataFrame(np.abs(estimate - exact) / scale, columns=columns, index=expected["metric"])
+
+
+def verify_percentiles(slices, store=None):
+    # [(filters, hours, exact ms, sketch ms, max relative error, within the bound)]
+    store = store or get_store()
+    bound = quantile_sketch.SKETCH_ACCURACY * (1 + 1e-9)
+    results = []
+    for filters, hours in slices:
+        began = time.perf_counter()
+        expected = exact_percentiles(filters, hours, store=store)
+        exact_ms = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        actual = percentiles(filters, hours, store=store)
+        sketch_ms = (time.perf_counter() - began) * 1000
+        same_counts = (expected["readings"].to_numpy() == actual["readings"].to_numpy()).all()
+        worst = float(np.nan_to_num(percentile_errors(expected, actual).to_numpy()).max())
+        results.append((filters, hours, exact_ms, sketch_ms, worst, bool(same_counts and worst <= bound)))
+    return results
+
+
+def sample_slices(options):
+    # Unfiltered, one location, each bound, rush hours, and all at once
+    locations = options["locations"][:1]
+    rush = [8, 9, 18, 19]
+    return [
+        (HistoryFilter(), None),
+        (HistoryFilter(locations=locations), None),
+        (HistoryFilter(start=options["end"]), None),
+        (HistoryFilter(end=options["start"]), None),
+        (HistoryFilter(), rush),
+        (HistoryFilter(options["start"], options["end"], locations), rush),
+    ]
+
+
+def verify(filters_list, store=None):
+    # [(filters, raw ms, partitions ms, matches)] for each filter
+    from rollup_queries import _same
+
+    store = store or get_store()
+    results = []
+    for filters in filters_list:
+        began = time.perf_counter()
+        expected = raw_hourly_profile(filters, store)
+        raw_ms = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        actual = hourly_profile(filters, store)
+        partitions_ms = (time.perf_counter() - began) * 1000
+        results.append((filters, raw_ms, partitions_ms, _same(expected, actual)))
+    return results
+
+
+def sample_filters(options):
+    # Unfiltered, each bound, one location, one FRC class, and all of them at once
+    locations, frcs = options["locations"][:1], options["frcs"][:1]
+    return [
+        HistoryFilter(),
+        HistoryFilter(start=options["end"]),
+        HistoryFilter(end=options["start"]),
+        HistoryFilter(locations=locations),
+        HistoryFilter(frcs=frcs),
+        HistoryFilter(options["start"], options["end"], locations, frcs),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hourly traffic profile of a slice of the history")
+    parser.add_argument("command", nargs="?", choices=["verify", "percentiles", "verify-percentiles"],
+                        help="check the partitions against traffic_data, or percentiles from the sketches")
+    parser.add_argument("--start", help="first date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date (YYYY-MM-DD)")
+    parser.add_argument("--location", nargs="+", help="location names to keep")
+    parser.add_argument("--frc", nargs="+", help="FRC classes to keep, e.g. FRC1")
+    parser.add_argument("--hour", type=int, nargs="+", help="hours of the day (percentiles only)")
+    parser.add_argument("--raw", action="store_true", help="scan traffic_data instead of the partitions")
+    parser.add_argument("--exact", action="store_true", help="exact percentiles from traffic_data")
+    parser.add_argument("--sync", action="store_true", help="sync vehicle_data.csv into the store first")
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.sync:
+        store.sync_csv()
+    filters = HistoryFilter(args.start, args.end, args.location, args.frc)
+
+    if args.command == "verify":
+        results = verify([filters] if is_filtered(filters) else sample_filters(filter_options(store)), store)
+        print(f"{'raw ms':>9} {'partitions ms':>14}  match  filters")
+        for used, raw_ms, partitions_ms, ok in results:
+            shown = ", ".join(f"{k}={v}" for k, v in used._asdict().items() if v) or "none"
+            print(f"{raw_ms:>9.2f} {partitions_ms:>14.2f}  {'yes' if ok else 'NO':<5}  {shown}")
+        sys.exit(0 if all(ok for *_, ok in results) else 1)
+
+    if args.command == "verify-percentiles":
+        slices = ([(filters, args.hour)] if is_filtered(filters) or args.hour
+                  else sample_slices(filter_options(store)))
+        results = verify_percentiles(slices, store)
+        print(f"{'exact ms':>9} {'sketch ms':>10} {'max rel err':>12}  ok   slice")
+        for used, hours, exact_ms, sketch_ms, worst, ok in results:
+            shown = [f"{k}={v}" for k, v in used._asdict().items() if v] + ([f"hours={hours}"] if hours else [])
+            print(f"{exact_ms:>9.2f} {sketch_ms:>10.2f} {worst:>12.4%}  {'yes' if ok else 'NO':<4} "
+                  f"{', '.join(shown) or 'none'}")
+        sys.exit(0 if all(ok for *_, ok in results) else 1)
+
+    if args.command == "percentiles":
+        print((exact_percentiles if args.exact else percentiles)(filters, args.hour, store=store)
+              .to_string(index=False))
+        return
+
+    profile = (raw_hourly_profile if args.raw else hourly_profile)(filters, store)
+    print(profile.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
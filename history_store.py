@@ -0,0 +1,591 @@
+"""
+Local SQLite analytics store for historical traffic readings.
+
+Mirrors the `traffic_data` schema from `vehicle queries.sql` with typed
+columns and a timestamp index. New rows are ingested incrementally (only the
+bytes appended to vehicle_data.csv since the last sync are parsed) and the
+hourly / per-location aggregates the dashboard charts need are kept
+materialized in the same transaction, so page renders read a few dozen
+precomputed rows no matter how large the history grows. Rows record their
+origin (`source`), so re-syncing a replaced CSV never drops rows written by
+ingestion.
+"""
+import io
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+import quantile_sketch
+import traffic_metrics
+from history_stream import last_line_end, read_csv_range
+from instrumentation import span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_DB = os.environ.get("VISION_HISTORY_DB", os.path.join(BASE_DIR, "vision_history.db"))
+HISTORY_CSV = os.path.join(BASE_DIR, "vehicle_data.csv")
+
+# Compact reader dtypes, but stored coordinates and ratios keep full precision
+STORE_DTYPES = {"latitude": "float64", "longitude": "float64", "speed_ratio": "float64"}
+
+# Materialized tables derived from traffic_data
+AGGREGATE_TABLES = ("hourly_agg", "location_agg", "rollup_location_date_hour", "rollup_location_hour",
+                    "rollup_date_location_frc_hour", "sketch_location_date_hour", "sketch_location_date",
+                    "sketch_location_hour")
+ROLLUP_VERSION = "3"
+
+# Columns with quantile sketches; the sketch tables' `metric` is the index here
+SKETCH_METRICS = ("currentSpeed", "delay_time", "speed_ratio")
+
+COLUMNS = [
+    "id", "timestamp", "latitude", "longitude", "location_name", "frc",
+    "currentSpeed", "freeFlowSpeed", "currentTravelTime", "freeFlowTravelTime",
+    "speed_ratio", "delay_time", "date", "time",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS traffic_data (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT,              -- 'YYYY-MM-DD HH:MM:SS', sorts chronologically
+    latitude REAL,
+    longitude REAL,
+    location_name TEXT,
+    frc TEXT,
+    currentSpeed INTEGER,
+    freeFlowSpeed INTEGER,
+    currentTravelTime INTEGER,
+    freeFlowTravelTime INTEGER,
+    speed_ratio REAL,
+    delay_time INTEGER,
+    date TEXT,
+    time TEXT,
+    source TEXT                  -- 'csv' (sync_csv) or 'ingest' (ingest_frame)
+);
+CREATE INDEX IF NOT EXISTS idx_traffic_timestamp ON traffic_data (timestamp);
+CREATE INDEX IF NOT EXISTS idx_traffic_location ON traffic_data (location_name, timestamp);
+
+-- Materialized aggregates, updated on every ingest. `n` counts readings and
+-- each n_<metric> the readings with a value in sum_<metric>, so averages
+-- leave missing values out just like AVG() and pandas' mean()
+CREATE TABLE IF NOT EXISTS hourly_agg (
+    hour INTEGER PRIMARY KEY,
+    n INTEGER NOT NULL,
+    n_speed INTEGER NOT NULL,
+    sum_speed REAL NOT NULL,
+    n_travel_time INTEGER NOT NULL,
+    sum_travel_time REAL NOT NULL,
+    n_free_flow_travel_time INTEGER NOT NULL,
+    sum_free_flow_travel_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS location_agg (
+    location_name TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    n_speed INTEGER NOT NULL,
+    sum_speed REAL NOT NULL,
+    n_delay INTEGER NOT NULL,
+    sum_delay REAL NOT NULL,
+    n_speed_ratio INTEGER NOT NULL,
+    sum_speed_ratio REAL NOT NULL
+);
+
+-- Rollup cubes behind rollup_queries.py, so the `vehicle queries.sql` reports
+-- never scan traffic_data: one row per (location, date, hour of the `time`
+-- column), and the same rolled up over all dates
+CREATE TABLE IF NOT EXISTS rollup_location_date_hour (
+    location_name TEXT,
+    date TEXT,
+    hour INTEGER,
+    n INTEGER NOT NULL,
+    n_speed INTEGER NOT NULL,
+    sum_speed REAL NOT NULL,
+    min_speed INTEGER,
+    max_speed INTEGER,
+    n_delay INTEGER NOT NULL,
+    sum_delay REAL NOT NULL,
+    n_speed_ratio INTEGER NOT NULL,
+    sum_speed_ratio REAL NOT NULL,
+    n_below_free_flow INTEGER NOT NULL,
+    PRIMARY KEY (location_name, date, hour)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_date ON rollup_location_date_hour (date);
+CREATE TABLE IF NOT EXISTS rollup_location_hour (
+    location_name TEXT,
+    hour INTEGER,
+    n INTEGER NOT NULL,
+    n_speed INTEGER NOT NULL,
+    sum_speed REAL NOT NULL,
+    min_speed INTEGER,
+    max_speed INTEGER,
+    n_delay INTEGER NOT NULL,
+    sum_delay REAL NOT NULL,
+    n_speed_ratio INTEGER NOT NULL,
+    sum_speed_ratio REAL NOT NULL,
+    n_below_free_flow INTEGER NOT NULL,
+    PRIMARY KEY (location_name, hour)
+);
+
+-- Partitions behind history_query.py's filtered profiles: one row per
+-- (date, location, FRC, hour of the timestamp), clustered by date, with
+-- (location, date) and (FRC, date...) indexes (the key columns follow the
+-- FRC), so date, location and FRC filters read only the rows in their slice
+CREATE TABLE IF NOT EXISTS rollup_date_location_frc_hour (
+    date TEXT NOT NULL,
+    location_name TEXT NOT NULL,
+    frc TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    n_speed INTEGER NOT NULL,
+    sum_speed REAL NOT NULL,
+    n_travel_time INTEGER NOT NULL,
+    sum_travel_time REAL NOT NULL,
+    n_free_flow_travel_time INTEGER NOT NULL,
+    sum_free_flow_travel_time REAL NOT NULL,
+    PRIMARY KEY (date, location_name, frc, hour)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_partition_location ON rollup_date_location_frc_hour (location_name, date);
+CREATE INDEX IF NOT EXISTS idx_partition_frc ON rollup_date_location_frc_hour (frc);
+
+-- Quantile sketches (quantile_sketch.py) of SKETCH_METRICS per (location,
+-- date, hour of the timestamp), rolled up over hours and over dates: one row
+-- per non-empty bin, so ingest adds counts and a slice merges with SUM(n)
+CREATE TABLE IF NOT EXISTS sketch_location_date_hour (
+    metric INTEGER NOT NULL,
+    location_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (metric, location_name, date, hour, bin)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sketch_location_date (
+    metric INTEGER NOT NULL,
+    location_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    bin INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (metric, location_name, date, bin)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sketch_location_hour (
+    metric INTEGER NOT NULL,
+    location_name TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (metric, location_name, hour, bin)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _add(*columns):
+    # Upsert clause adding the incoming counts/sums to the stored ones
+    return ", ".join(f"{column} = {column} + excluded.{column}" for column in columns)
+
+
+def _key_column(values):
+    # Missing -> '' for primary key columns; through object, since the CSV
+    # reader's categoricals cannot take a new value in place
+    return values.astype(object).fillna("")
+
+
+def _sql_value(value, cast=None):
+    # NaN/NaT -> NULL, numpy scalars -> Python scalars
+    if pd.isna(value):
+        return None
+    return cast(value) if cast else value
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._local = threading.local()
+        # SQLite allows one writer at a time; serialize ingests in-process
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            conn = self.connect()
+            conn.executescript(SCHEMA)
+            if self._get_meta("rollup_version") != ROLLUP_VERSION:
+                # Store created before the rollup cube (or with an older layout)
+                with conn:
+                    self._rebuild_aggregates(conn)
+                    self._set_meta(conn, "rollup_version", ROLLUP_VERSION)
+            with conn:
+                self._analyze(conn)
+
+    def connect(self):
+        # One connection per thread (Streamlit runs each session in its own thread)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        # Closes this thread's connection, e.g. before forking worker processes
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------------- META ----------------
+    def _get_meta(self, key, default=None):
+        row = self.connect().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key, value):
+        conn.execute(
+            "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    # ---------------- INGEST ----------------
+    def _update_aggregates(self, conn, df):
+        with span("to_datetime"):
+            stamps = pd.to_datetime(df["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+            hours = stamps.dt.hour
+        with span("groupby"):
+            hourly = df.assign(hour=hours).dropna(subset=["hour"]).groupby("hour").agg(
+                n=("currentSpeed", "size"),
+                n_speed=("currentSpeed", "count"),
+                sum_speed=("currentSpeed", "sum"),
+                n_travel_time=("currentTravelTime", "count"),
+                sum_travel_time=("currentTravelTime", "sum"),
+                n_free_flow_travel_time=("freeFlowTravelTime", "count"),
+                sum_free_flow_travel_time=("freeFlowTravelTime", "sum"),
+            )
+        conn.executemany(
+            "INSERT INTO hourly_agg VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(hour) DO UPDATE SET "
+            + _add("n", "n_speed", "sum_speed", "n_travel_time", "sum_travel_time",
+                   "n_free_flow_travel_time", "sum_free_flow_travel_time"),
+            [(int(h), int(r.n), int(r.n_speed), float(r.sum_speed), int(r.n_travel_time), float(r.sum_travel_time),
+              int(r.n_free_flow_travel_time), float(r.sum_free_flow_travel_time))
+             for h, r in hourly.iterrows()]
+        )
+
+        with span("groupby"):
+            per_location = df.groupby("location_name").agg(
+                n=("currentSpeed", "size"),
+                n_speed=("currentSpeed", "count"),
+                sum_speed=("currentSpeed", "sum"),
+                n_delay=("delay_time", "count"),
+                sum_delay=("delay_time", "sum"),
+                n_speed_ratio=("speed_ratio", "count"),
+                sum_speed_ratio=("speed_ratio", "sum"),
+            )
+        conn.executemany(
+            "INSERT INTO location_agg VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(location_name) DO UPDATE SET "
+            + _add("n", "n_speed", "sum_speed", "n_delay", "sum_delay", "n_speed_ratio", "sum_speed_ratio"),
+            [(name, int(r.n), int(r.n_speed), float(r.sum_speed), int(r.n_delay), float(r.sum_delay),
+              int(r.n_speed_ratio), float(r.sum_speed_ratio))
+             for name, r in per_location.iterrows()]
+        )
+        self._update_rollup(conn, df)
+        self._update_partitions(conn, df, stamps)
+        self._update_sketches(conn, df, stamps)
+
+    def _update_rollup(self, conn, df):
+        # HOUR(time) as in the SQL reports; readings without a parseable time
+        # land in a NULL hour, just like they do in GROUP BY HOUR(time)
+        with span("groupby"):
+            hour = pd.to_numeric(df["time"].astype(str).str[:2], errors="coerce")
+            rollup = pd.DataFrame({
+                "location_name": df["location_name"],
+                "date": df["date"],
+                "hour": hour,
+                "speed": df["currentSpeed"],
+                "delay": df["delay_time"],
+                "speed_ratio": df["speed_ratio"],
+                "below": traffic_metrics.below_free_flow(df["currentSpeed"], df["freeFlowSpeed"]),
+            }).groupby(["location_name", "date", "hour"], dropna=False).agg(
+                n=("speed", "size"),
+                n_speed=("speed", "count"),
+                sum_speed=("speed", "sum"),
+                min_speed=("speed", "min"),
+                max_speed=("speed", "max"),
+                n_delay=("delay", "count"),
+                sum_delay=("delay", "sum"),
+                n_speed_ratio=("speed_ratio", "count"),
+                sum_speed_ratio=("speed_ratio", "sum"),
+                n_below_free_flow=("below", "sum"),
+            )
+        rows = [(_sql_value(name), _sql_value(date), _sql_value(hour, int), int(r.n), int(r.n_speed),
+                 float(r.sum_speed), _sql_value(r.min_speed, int), _sql_value(r.max_speed, int),
+                 int(r.n_delay), float(r.sum_delay), int(r.n_speed_ratio), float(r.sum_speed_ratio),
+                 int(r.n_below_free_flow))
+                for (name, date, hour), r in rollup.iterrows()]
+        merge = (_add("n", "n_speed", "sum_speed", "n_delay", "sum_delay", "n_speed_ratio", "sum_speed_ratio",
+                      "n_below_free_flow")
+                 + ", min_speed = MIN(min_speed, excluded.min_speed), max_speed = MAX(max_speed, excluded.max_speed)")
+        conn.executemany(
+            "INSERT INTO rollup_location_date_hour VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            f"ON CONFLICT(location_name, date, hour) DO UPDATE SET {merge}",
+            rows
+        )
+        # Upserts of one location/hour across several dates merge in turn
+        conn.executemany(
+            "INSERT INTO rollup_location_hour VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            f"ON CONFLICT(location_name, hour) DO UPDATE SET {merge}",
+            [row[:1] + row[2:] for row in rows]
+        )
+
+    def _update_partitions(self, conn, df, stamps):
+        # Date and hour of the timestamp, as hourly_agg; missing names/FRCs
+        # are stored as '' (primary key columns cannot be NULL)
+        with span("groupby"):
+            partitions = pd.DataFrame({
+                "date": stamps.dt.strftime("%Y-%m-%d"),
+                "location_name": _key_column(df["location_name"]),
+                "frc": _key_column(df["frc"]) if "frc" in df else "",
+                "hour": stamps.dt.hour,
+                "speed": df["currentSpeed"],
+                "travel_time": df["currentTravelTime"],
+                "free_flow_travel_time": df["freeFlowTravelTime"],
+            }).dropna(subset=["hour"]).groupby(["date", "location_name", "frc", "hour"]).agg(
+                n=("speed", "size"),
+                n_speed=("speed", "count"),
+                sum_speed=("speed", "sum"),
+                n_travel_time=("travel_time", "count"),
+                sum_travel_time=("travel_time", "sum"),
+                n_free_flow_travel_time=("free_flow_travel_time", "count"),
+                sum_free_flow_travel_time=("free_flow_travel_time", "sum"),
+            ).reset_index()
+            partitions["hour"] = partitions["hour"].astype("int64")
+        conn.executemany(
+            "INSERT INTO rollup_date_location_frc_hour VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(date, location_name, frc, hour) DO UPDATE SET "
+            + _add("n", "n_speed", "sum_speed", "n_travel_time", "sum_travel_time",
+                   "n_free_flow_travel_time", "sum_free_flow_travel_time"),
+            # Column-wise: iterrows costs more than the upserts themselves
+            zip(*(partitions[c].tolist() for c in partitions.columns))
+        )
+
+    def _update_sketches(self, conn, df, stamps):
+        # Bin counts per (metric, location, date, hour), (metric, location,
+        # date) and (metric, location, hour); keys as in _update_partitions
+        names = _key_column(df["location_name"])
+        dates = stamps.dt.strftime("%Y-%m-%d")
+        for metric, column in enumerate(SKETCH_METRICS):
+            if column not in df:
+                continue
+            keep = (stamps.notna() & df[column].notna()).to_numpy()
+            with span("groupby"):
+                counts = pd.DataFrame({
+                    "location_name": names[keep],
+                    "date": dates[keep],
+                    "hour": stamps.dt.hour[keep].astype("int64"),
+                    "bin": quantile_sketch.bins(df[column].to_numpy(dtype="float64")[keep]),
+                }).groupby(["location_name", "date", "hour", "bin"]).size().reset_index(name="n")
+                all_hours = counts.groupby(["location_name", "date", "bin"])["n"].sum().reset_index()
+                all_dates = counts.groupby(["location_name", "hour", "bin"])["n"].sum().reset_index()
+            for table, rows in (("sketch_location_date_hour", counts), ("sketch_location_date", all_hours),
+                                ("sketch_location_hour", all_dates)):
+                key = ", ".join(["metric"] + list(rows.columns[:-1]))
+                conn.executemany(
+                    f"INSERT INTO {table} VALUES (?, {', '.join('?' * len(rows.columns))}) "
+                    f"ON CONFLICT({key}) DO UPDATE SET n = n + excluded.n",
+                    zip([metric] * len(rows), *(rows[c].tolist() for c in rows.columns))
+                )
+
+    def _insert(self, conn, df, source):
+        df = df.reindex(columns=COLUMNS)
+        # NaN -> NULL, numpy scalars -> Python scalars for sqlite3
+        records = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        conn.executemany(
+            f"INSERT INTO traffic_data ({', '.join(COLUMNS)}, source) VALUES ({', '.join('?' * len(COLUMNS))}, ?)",
+            (record + (source,) for record in records)
+        )
+        self._update_aggregates(conn, df)
+
+    def _drop_existing(self, conn, df):
+        # Deduplicate on (location_name, timestamp), within the batch and
+        # against rows already stored; the lookup is bounded by the batch's
+        # timestamp range so it stays on idx_traffic_location
+        df = df.drop_duplicates(subset=["location_name", "timestamp"])
+        existing = pd.read_sql_query(
+            "SELECT location_name, timestamp FROM traffic_data WHERE timestamp BETWEEN ? AND ?",
+            conn, params=(df["timestamp"].min(), df["timestamp"].max())
+        )
+        if existing.empty:
+            return df
+        keys = pd.MultiIndex.from_frame(existing)
+        return df[~pd.MultiIndex.from_frame(df[["location_name", "timestamp"]]).isin(keys)]
+
+    def ingest_frame(self, df, dedupe=False, live=False):
+        if df.empty:
+            return 0
+        with self._write_lock:
+            conn = self.connect()
+            with conn:
+                if dedupe:
+                    df = self._drop_existing(conn, df)
+                if not df.empty:
+                    self._insert(conn, df, "ingest")
+                    if live:
+                        self._set_meta(conn, "live_timestamp", df["timestamp"].max())
+                    self._analyze(conn)
+        return len(df)
+
+    def sync_csv(self, csv_path=HISTORY_CSV, chunksize=100_000):
+        # Cheap no-op unless the file grew; only the appended tail is parsed
+        stat = os.stat(csv_path)
+        offset = int(self._get_meta("csv_offset", 0))
+        if self._get_meta("csv_path") == csv_path and stat.st_size == offset:
+            return 0
+
+        with self._write_lock:
+            conn = self.connect()
+            inserted = 0
+            with open(csv_path, "rb") as f, conn:
+                # Take the write lock before reading the offset: another process
+                # syncing the same CSV waits here and then sees our offset
+                conn.execute("BEGIN IMMEDIATE")
+                offset = int(self._get_meta("csv_offset", 0))
+                synced_path = self._get_meta("csv_path")
+                if synced_path is not None and (synced_path != csv_path or stat.st_size < offset):
+                    # A previously synced CSV was replaced or truncated: drop only the
+                    # rows it contributed, keep what ingestion wrote, and re-derive
+                    # the aggregates from what is left
+                    conn.execute("DELETE FROM traffic_data WHERE source = 'csv'")
+                    self._rebuild_aggregates(conn)
+                    offset = 0
+
+                header = f.readline()
+                columns = pd.read_csv(io.BytesIO(header)).columns.tolist()
+                start = max(offset, len(header))
+                # Never ingest a partially written last line
+                end = last_line_end(f, start, stat.st_size)
+                if end > start:
+                    # Streamed chunk by chunk: memory stays bounded however much was appended
+                    reader = read_csv_range(f, start, end, columns, chunksize, dtype=STORE_DTYPES)
+                    while True:
+                        with span("read_csv"):
+                            chunk = next(reader, None)
+                        if chunk is None:
+                            break
+                        # Row ids are assigned by the store (AUTO_INCREMENT), so CSV
+                        # rows can never collide with rows written by ingestion
+                        self._insert(conn, chunk.drop(columns="id", errors="ignore"), "csv")
+                        inserted += len(chunk)
+                self._set_meta(conn, "csv_path", csv_path)
+                self._set_meta(conn, "csv_offset", end)
+                self._analyze(conn)
+            return inserted
+
+    def _analyze(self, conn):
+        # Planner statistics for the date-sliced sketch tables, refreshed each
+        # time the history doubles. With them SQLite skip-scans the location
+        # column of their keys, so a date range over all locations stays a seek
+        last_id = conn.execute("SELECT MAX(id) FROM traffic_data").fetchone()[0] or 0
+        if last_id > 2 * int(self._get_meta("analyzed_id", 0)):
+            for table in ("sketch_location_date_hour", "sketch_location_date"):
+                conn.execute(f"ANALYZE {table}")
+            self._set_meta(conn, "analyzed_id", last_id)
+
+    def _rebuild_aggregates(self, conn, chunk_rows=500_000):
+        for table in AGGREGATE_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        query = ("SELECT timestamp, location_name, frc, currentSpeed, freeFlowSpeed, currentTravelTime, "
+                 "freeFlowTravelTime, delay_time, speed_ratio, date, time FROM traffic_data")
+        for chunk in pd.read_sql_query(query, conn, chunksize=chunk_rows):
+            self._update_aggregates(conn, chunk)
+
+    def relabel_locations(self, tag_fn, chunk_rows=500_000):
+        # Rewrite location_name from coordinates with a vectorized
+        # tag_fn(latitudes, longitudes), then rebuild the aggregates
+        changed = 0
+        with self._write_lock:
+            conn = self.connect()
+            with conn:
+                last_id = -1
+                while True:
+                    chunk = pd.read_sql_query(
+                        "SELECT id, latitude, longitude, location_name FROM traffic_data "
+                        "WHERE id > ? ORDER BY id LIMIT ?",
+                        conn, params=(last_id, chunk_rows)
+                    )
+                    if chunk.empty:
+                        break
+                    tags = tag_fn(chunk["latitude"].to_numpy(dtype=float), chunk["longitude"].to_numpy(dtype=float))
+                    moved = chunk["location_name"].to_numpy() != tags
+                    conn.executemany(
+                        "UPDATE traffic_data SET location_name = ? WHERE id = ?",
+                        zip(tags[moved].tolist(), chunk["id"][moved].tolist())
+                    )
+                    changed += int(moved.sum())
+                    last_id = int(chunk["id"].iloc[-1])
+                self._rebuild_aggregates(conn)
+        return changed
+
+    # ---------------- READS ----------------
+    def row_count(self):
+        return self.connect().execute("SELECT COUNT(*) FROM traffic_data").fetchone()[0]
+
+    def hourly_profile(self):
+        # Same shape as the old groupby('hour') means, read from hourly_agg
+        df = pd.read_sql_query(
+            "SELECT hour, n AS readings, sum_speed * 1.0 / n_speed AS currentSpeed, "
+            "sum_travel_time * 1.0 / n_travel_time AS currentTravelTime, "
+            "sum_free_flow_travel_time * 1.0 / n_free_flow_travel_time AS freeFlowTravelTime "
+            "FROM hourly_agg ORDER BY hour",
+            self.connect()
+        )
+        df["avg_delay"] = traffic_metrics.delay(df["currentTravelTime"], df["freeFlowTravelTime"])
+        return df
+
+    def location_summary(self):
+        return pd.read_sql_query(
+            "SELECT location_name, n AS readings, sum_speed * 1.0 / n_speed AS avg_speed, "
+            "sum_delay * 1.0 / n_delay AS avg_delay, sum_speed_ratio * 1.0 / n_speed_ratio AS avg_speed_ratio "
+            "FROM location_agg ORDER BY location_name",
+            self.connect()
+        )
+
+    def latest_live_readings(self):
+        # The most recent batch written by the ingestion service, if any
+        live_timestamp = self._get_meta("live_timestamp")
+        if not live_timestamp:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.read_sql_query(
+            f"SELECT {', '.join(COLUMNS)} FROM traffic_data WHERE timestamp = ? ORDER BY location_name",
+            self.connect(), params=(live_timestamp,)
+        )
+
+    def last_id(self):
+        row = self.connect().execute("SELECT MAX(id) FROM traffic_data").fetchone()
+        return row[0] if row[0] is not None else -1
+
+    def readings_since(self, last_id=-1, columns=None, limit=None):
+        # Rows appended after `last_id` in insertion order, for consumers that
+        # keep their own state up to date incrementally
+        columns = ["id"] + [c for c in (columns or COLUMNS) if c != "id"]
+        query = f"SELECT {', '.join(columns)} FROM traffic_data WHERE id > ? ORDER BY id"
+        params = (last_id,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        return pd.read_sql_query(query, self.connect(), params=params)
+
+    def location_names(self):
+        rows = self.connect().execute("SELECT location_name FROM location_agg ORDER BY location_name")
+        return [name for (name,) in rows if name is not None]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore()
+    return _store
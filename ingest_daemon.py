@@ -0,0 +1,178 @@
+"""
+Background ingestion service: polls TomTom for the configured locations on a
+schedule and appends the readings to the history store.
+
+Runs separately from the Streamlit app, which only reads what this writes.
+The anomaly detector reads each flushed micro-batch back from the store
+(AnomalyDetector.observe_store), so it sees these readings too.
+
+    python ingest_daemon.py --interval 300
+    python ingest_daemon.py --stub --interval 5        # local stub, no API quota
+"""
+import argparse
+import logging
+import queue
+import signal
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import traffic_metrics
+from geo_tagging import GeoTagger
+from history_store import get_store, HistoryStore
+from live_fetch import FlowFetcher, TOMTOM_API_KEY
+from location_catalog import LOCATIONS_FILE, LocationCatalog
+
+log = logging.getLogger("ingest")
+
+def readings_to_rows(results, polled_at, tagger):
+    # traffic_data rows as in `vehicle queries.sql`; location_name comes from
+    # the geo-tagger, like the SQL CASE mapping did, and speed_ratio/delay_time
+    # are derived for the whole micro-batch when it is written
+    timestamp = polled_at.strftime("%Y-%m-%d %H:%M:%S")
+    results = [res for res in results if res.error is None]
+    names = tagger.tag([res.lat for res in results], [res.lon for res in results]) if results else []
+    rows = []
+    for res, location_name in zip(results, names):
+        flow = res.flow
+        rows.append({
+            "timestamp": timestamp,
+            "latitude": res.lat,
+            "longitude": res.lon,
+            "location_name": location_name,
+            "frc": flow.get("frc"),
+            "currentSpeed": flow.get("currentSpeed"),
+            "freeFlowSpeed": flow.get("freeFlowSpeed"),
+            "currentTravelTime": flow.get("currentTravelTime"),
+            "freeFlowTravelTime": flow.get("freeFlowTravelTime"),
+            "date": polled_at.strftime("%Y-%m-%d"),
+            "time": polled_at.strftime("%H:%M:%S"),
+        })
+    return rows
+
+
+class IngestDaemon:
+    def __init__(self, fetcher, store, locations, tagger, interval=300.0, queue_size=8,
+                 batch_rows=5000, flush_interval=10.0):
+        self.fetcher = fetcher
+        self.store = store
+        self.tagger = tagger
+        self.locations = locations
+        self.interval = interval
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        # Bounded hand-off between poller and writer: when the writer falls
+        # behind, the poller blocks instead of piling readings up in memory
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self.stats = {"polls": 0, "fetched": 0, "failed": 0, "written": 0, "duplicates": 0, "dropped_polls": 0}
+
+    def poll_once(self):
+        polled_at = datetime.now().replace(microsecond=0)
+        results = self.fetcher.fetch_all(self.locations)
+        rows = readings_to_rows(results, polled_at, self.tagger)
+        self.stats["polls"] += 1
+        self.stats["fetched"] += len(rows)
+        self.stats["failed"] += len(results) - len(rows)
+        return rows
+
+    def _poller(self):
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            rows = self.poll_once()
+            if rows:
+                try:
+                    # Wait at most one interval for the writer before giving up on this poll
+                    self._queue.put(rows, timeout=self.interval)
+                except queue.Full:
+                    self.stats["dropped_polls"] += 1
+                    log.warning("writer is behind; dropped a poll of %d readings", len(rows))
+            next_poll += self.interval
+            self._stop.wait(max(0.0, next_poll - time.monotonic()))
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        written = self.store.ingest_frame(traffic_metrics.derive(pd.DataFrame(pending)), dedupe=True, live=True)
+        self.stats["written"] += written
+        self.stats["duplicates"] += len(pending) - written
+        log.info("wrote %d rows (%d duplicates skipped)", written, len(pending) - written)
+
+    def _writer(self):
+        # Micro-batches: flush when enough rows are pending or flush_interval elapsed
+        pending = []
+        last_flush = time.monotonic()
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                pending.extend(self._queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            if pending and (len(pending) >= self.batch_rows or time.monotonic() - last_flush >= self.flush_interval):
+                self._flush(pending)
+                pending = []
+                last_flush = time.monotonic()
+        self._flush(pending)
+
+    def run(self):
+        writer = threading.Thread(target=self._writer, name="ingest-writer")
+        writer.start()
+        try:
+            self._poller()
+        finally:
+            self._stop.set()
+            writer.join()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll TomTom and append readings to the history store")
+    parser.add_argument("--interval", type=float, default=300.0, help="seconds between polls")
+    parser.add_argument("--base-url", default=None, help="TomTom API base URL (defaults to TOMTOM_BASE_URL)")
+    parser.add_argument("--stub", action="store_true", help="poll a local TomTom stub instead of the real API")
+    parser.add_argument("--db", default=None, help="history store path (defaults to VISION_HISTORY_DB)")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent API requests")
+    parser.add_argument("--flush-interval", type=float, default=10.0, help="max seconds rows wait before a write")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="rows per bulk insert")
+    parser.add_argument("--locations", default=LOCATIONS_FILE, help="location catalog (polled points and geo-tagging)")
+    parser.add_argument("--once", action="store_true", help="poll and write a single time, then exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    base_url = args.base_url
+    stub = None
+    if args.stub:
+        from tomtom_stub import start_stub
+        stub = start_stub()
+        base_url = stub.base_url
+        log.info("using local TomTom stub at %s", base_url)
+
+    fetcher = FlowFetcher(TOMTOM_API_KEY, base_url=base_url, max_workers=args.workers)
+    store = HistoryStore(args.db) if args.db else get_store()
+    catalog = LocationCatalog.from_config(args.locations)
+    locations = catalog.live_points()
+    daemon = IngestDaemon(fetcher, store, locations, GeoTagger.from_catalog(catalog), interval=args.interval,
+                          batch_rows=args.batch_rows, flush_interval=args.flush_interval)
+
+    try:
+        if args.once:
+            daemon._flush(daemon.poll_once())
+        else:
+            signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+            log.info("polling %d locations every %.0fs", len(locations), args.interval)
+            daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
+    finally:
+        log.info("stats: %s", daemon.stats)
+        fetcher.close()
+        if stub is not None:
+            stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Lightweight span timing for the dashboard's hot paths.
+
+    with span("predict"):
+        ...
+
+Spans (stage, wall time, RSS delta) go into an in-process ring buffer. They can
+be exported as JSONL (appended once per rerun) and as Prometheus text on a
+local /metrics endpoint. The optional Performance page in app.py summarizes
+them per stage. Each span carries the run and page of the rerun that
+recorded it (a context variable, so concurrent sessions keep their own
+attribution). RSS deltas are process-wide, so spans that overlap in other
+threads/sessions show up in each other's deltas.
+
+Off unless VISION_PERF=1. When off, span() returns a shared no-op context
+manager and does nothing else.
+
+    VISION_PERF=1                     enable recording
+    VISION_PERF_BUFFER=4096           ring buffer size (spans)
+    VISION_PERF_JSONL=spans.jsonl     append spans to this file after each rerun
+    VISION_PERF_PORT=9108             serve /metrics and /spans.jsonl on localhost
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# numpy/pandas are imported by the methods that build frames, so recording
+# spans costs the dashboard nothing at import time
+
+ENABLED = os.environ.get("VISION_PERF", "").lower() in ("1", "true", "yes", "on")
+PERF_BUFFER = int(os.environ.get("VISION_PERF_BUFFER", 4096))
+PERF_JSONL = os.environ.get("VISION_PERF_JSONL") or None
+PERF_PORT = int(os.environ["VISION_PERF_PORT"]) if os.environ.get("VISION_PERF_PORT") else None
+
+Span = namedtuple("Span", ["run", "page", "stage", "started_at", "ms", "rss_delta_kb", "thread"])
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+_NOOP = contextlib.nullcontext()
+
+# (run, page) of the rerun executing in this thread/context; each Streamlit
+# session reruns in its own thread, so sessions never see each other's
+_current_run = contextvars.ContextVar("vision_perf_run", default=None)
+
+
+_statm = {"pid": None, "fd": None}
+
+
+def _rss_kb():
+    # One descriptor per process, re-opened after a fork; pread is thread-safe
+    try:
+        if _statm["pid"] != os.getpid():
+            _statm["fd"] = os.open("/proc/self/statm", os.O_RDONLY)
+            _statm["pid"] = os.getpid()
+        return int(os.pread(_statm["fd"], 64, 0).split()[1]) * _PAGE_KB
+    except OSError:
+        return None
+
+
+class SpanRecorder:
+    def __init__(self, capacity=PERF_BUFFER, jsonl_path=PERF_JSONL):
+        self._spans = deque(maxlen=capacity)
+        self._unwritten = []
+        self._lock = threading.Lock()
+        self.jsonl_path = jsonl_path
+        self.run = 0
+        self.server = None
+
+    def begin_run(self, page):
+        # Called at the top of every rerun; the previous run's spans are flushed
+        self.flush_jsonl()
+        with self._lock:
+            self.run += 1
+            run = self.run
+        _current_run.set((run, page))
+
+    def record(self, stage, started_at, ms, rss_delta_kb):
+        # Spans outside any rerun (e.g. in the service) belong to the latest run, no page
+        run, page = _current_run.get() or (self.run, None)
+        item = Span(run, page, stage, started_at, round(ms, 3), rss_delta_kb,
+                    threading.current_thread().name)
+        with self._lock:
+            self._spans.append(item)
+            if self.jsonl_path:
+                self._unwritten.append(item)
+
+    def flush_jsonl(self):
+        with self._lock:
+            pending, self._unwritten = self._unwritten, []
+        if pending and self.jsonl_path:
+            with open(self.jsonl_path, "a") as f:
+                for item in pending:
+                    f.write(json.dumps(item._asdict()) + "\n")
+
+    def spans(self, last_runs=None):
+        with self._lock:
+            items = list(self._spans)
+            run = self.run
+        if last_runs is not None:
+            items = [s for s in items if s.run > run - last_runs]
+        return items
+
+    def frame(self, last_runs=None):
+        import pandas as pd
+        return pd.DataFrame(self.spans(last_runs), columns=Span._fields)
+
+    def summary(self, last_runs=20):
+        # Per-stage latency percentiles over the last N reruns
+        import pandas as pd
+        df = self.frame(last_runs)
+        if df.empty:
+            return pd.DataFrame(columns=["stage", "calls", "p50_ms", "p95_ms", "max_ms", "total_ms", "avg_rss_delta_kb"])
+        grouped = df.groupby("stage")
+        summary = pd.DataFrame({
+            "calls": grouped["ms"].size(),
+            "p50_ms": grouped["ms"].quantile(0.5),
+            "p95_ms": grouped["ms"].quantile(0.95),
+            "max_ms": grouped["ms"].max(),
+            "total_ms": grouped["ms"].sum(),
+            "avg_rss_delta_kb": grouped["rss_delta_kb"].mean(),
+        }).round(2)
+        return summary.sort_values("total_ms", ascending=False).reset_index()
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP vision_stage_seconds Dashboard stage latency over the span buffer",
+            "# TYPE vision_stage_seconds summary",
+        ]
+        import numpy as np
+        df = self.frame()
+        for stage, group in df.groupby("stage"):
+            seconds = group["ms"].to_numpy() / 1000
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'vision_stage_seconds{{stage="{stage}",quantile="{q}"}} {np.quantile(seconds, q):.6f}')
+            lines.append(f'vision_stage_seconds_sum{{stage="{stage}"}} {seconds.sum():.6f}')
+            lines.append(f'vision_stage_seconds_count{{stage="{stage}"}} {len(seconds)}')
+        lines.append(f"vision_reruns_total {self.run}")
+        return "\n".join(lines) + "\n"
+
+
+class _Span:
+    __slots__ = ("recorder", "stage", "started_at", "start", "rss")
+
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.rss = _rss_kb()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.start) * 1000
+        rss = _rss_kb()
+        delta = rss - self.rss if rss is not None and self.rss is not None else None
+        self.recorder.record(self.stage, self.started_at, ms, delta)
+        return False
+
+
+def span(stage):
+    if not ENABLED:
+        return _NOOP
+    return _Span(get_recorder(), stage)
+
+
+def begin_run(page):
+    if ENABLED:
+        get_recorder().begin_run(page)
+
+
+# ---------------- EXPORT ENDPOINT ----------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    recorder = None
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = self.recorder.prometheus_text(), "text/plain; version=0.0.4"
+        elif self.path == "/spans.jsonl":
+            body = "".join(json.dumps(s._asdict()) + "\n" for s in self.recorder.spans())
+            content_type = "application/x-ndjson"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(recorder, port, host="127.0.0.1"):
+    handler = type("MetricsHandler", (_MetricsHandler,), {"recorder": recorder})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="perf-metrics", daemon=True).start()
+    return server
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                recorder = SpanRecorder()
+                if PERF_PORT:
+                    try:
+                        recorder.server = serve_metrics(recorder, PERF_PORT)
+                    except OSError:
+                        # Port taken (e.g. a second server process): keep recording without it
+                        recorder.server = None
+                _recorder = recorder
+    return _recorder
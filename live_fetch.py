@@ -0,0 +1,109 @@
+"""
+Concurrent fetcher for TomTom flowSegmentData.
+
+All locations are requested at once through a bounded thread pool that shares
+a single pooled requests.Session, so a refresh costs roughly the latency of the
+slowest location instead of the sum of all of them.
+"""
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import span
+
+# Point this at a local stub (see tomtom_stub.py) for benchmarking
+TOMTOM_BASE_URL = os.environ.get("TOMTOM_BASE_URL", "https://api.tomtom.com")
+FLOW_PATH = "/traffic/services/4/flowSegmentData/absolute/{zoom}/json"
+
+TOMTOM_API_KEY = os.environ.get("TOMTOM_API_KEY", "VK1Ay21GpKGvAMvUrmpZUlyGOeRZI8pb")
+
+# Locations are (latitude, longitude, name) tuples; the monitored set comes
+# from the location catalog (location_catalog.get_catalog().live_points())
+
+# Rate limiting and transient server errors are worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FlowResult = namedtuple("FlowResult", ["lat", "lon", "name", "flow", "error", "elapsed", "fetched_at"])
+
+
+class FlowFetchError(Exception):
+    pass
+
+
+class FlowFetcher:
+    def __init__(self, api_key, base_url=None, max_workers=8, timeout=(3.05, 10),
+                 retries=3, backoff=0.5, max_backoff=8.0, zoom=10):
+        self.api_key = api_key
+        self.base_url = (base_url or TOMTOM_BASE_URL).rstrip("/")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.zoom = zoom
+
+        # One keep-alive pool sized to the concurrency cap
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # The pool size doubles as the cap on in-flight API calls
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tomtom")
+
+    def flow_url(self):
+        return self.base_url + FLOW_PATH.format(zoom=self.zoom)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        # Honour Retry-After on 429 when the server provides it in seconds
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = min(self.max_backoff, float(retry_after))
+        time.sleep(delay * (0.5 + random.random() / 2))
+
+    def fetch_one(self, lat, lon):
+        params = {"key": self.api_key, "point": f"{lat},{lon}"}
+        last_error = None
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with span("tomtom_request"):
+                    response = self.session.get(self.flow_url(), params=params, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response.json().get("flowSegmentData", {})
+                if response.status_code not in RETRY_STATUSES:
+                    raise FlowFetchError(f"HTTP {response.status_code}")
+                last_error = FlowFetchError(f"HTTP {response.status_code}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            if attempt < self.retries:
+                self._sleep_before_retry(attempt, response)
+        raise FlowFetchError(f"gave up after {self.retries + 1} attempts: {last_error}")
+
+    def fetch_location(self, location):
+        lat, lon, name = location
+        start = time.perf_counter()
+        try:
+            flow = self.fetch_one(lat, lon)
+            return FlowResult(lat, lon, name, flow, None, time.perf_counter() - start, time.time())
+        except Exception as e:
+            return FlowResult(lat, lon, name, None, e, time.perf_counter() - start, time.time())
+
+    def submit(self, fn, *args):
+        # Run work on the fetcher's bounded pool (used by the shared flow cache)
+        return self._executor.submit(fn, *args)
+
+    def fetch_all(self, locations):
+        # Results come back in the same order as `locations`
+        return list(self._executor.map(self.fetch_location, locations))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
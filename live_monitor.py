@@ -0,0 +1,163 @@
+"""
+Live monitoring: table rows from flow readings, a rolling window of recent
+readings per location for the trend sparklines, and per-viewer delta updates.
+
+The Live Data page's auto-refresh reruns only its own fragment every
+VISION_LIVE_REFRESH seconds. Each tick reads the shared flow cache, so only
+points whose reading is older than the cache TTL go upstream. LiveTables
+(one per dashboard process) rebuilds only the rows whose reading changed and
+builds each distinct snapshot's table once for every viewer showing it; an
+unchanged table is the same Arrow payload, which Streamlit sends as a
+reference to the copy the browser already holds.
+
+The LiveWindow lives in the backend (one per process, or in vision_service),
+so every viewer's sparklines come from one bounded buffer per location.
+
+    VISION_LIVE_REFRESH=15            seconds between auto-refresh ticks
+    VISION_LIVE_WINDOW=60             readings kept per location for trends
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+
+LIVE_REFRESH = float(os.environ.get("VISION_LIVE_REFRESH", 15))
+LIVE_WINDOW = int(os.environ.get("VISION_LIVE_WINDOW", 60))
+LIVE_TABLES = 32        # distinct snapshots (pages) whose tables are kept
+
+LIVE_FLOW_FIELDS = ["currentSpeed", "freeFlowSpeed", "currentTravelTime", "freeFlowTravelTime", "confidence"]
+TREND_COLUMN = "Speed Trend (km/h)"
+
+
+# ---------------- TABLE ROWS ----------------
+def live_table(readings):
+    # Live Data table from fetched or stored readings (location_name, latitude,
+    # longitude and the TomTom flow columns); metrics are computed column-wise
+    import pandas as pd
+    import traffic_metrics
+
+    table = pd.DataFrame({
+        "Location Name": readings["location_name"],
+        "Coordinates": [f"{lat:.4f}, {lon:.4f}" for lat, lon in zip(readings["latitude"], readings["longitude"])],
+        "Current Speed (km/h)": readings["currentSpeed"],
+        "Free Flow Speed (km/h)": readings["freeFlowSpeed"],
+        "Current Travel Time (s)": readings["currentTravelTime"],
+        "Free Flow Travel Time (s)": readings["freeFlowTravelTime"],
+        "Congestion Level": traffic_metrics.congestion_class(readings["currentSpeed"], readings["freeFlowSpeed"]),
+    })
+    if "confidence" in readings:
+        table["Confidence"] = [f"{confidence * 100:.0f}%" for confidence in readings["confidence"]]
+    return table
+
+
+def live_flow_frame(flow_results):
+    # Live Data table rows from fetched/cached flow readings; failures returned separately
+    import pandas as pd
+
+    fetched = [res for res in flow_results if res.error is None]
+    errors = [(res.name, res.error) for res in flow_results if res.error is not None]
+    readings = pd.DataFrame([res.flow for res in fetched], columns=LIVE_FLOW_FIELDS).fillna(0)
+    readings.insert(0, "location_name", [res.name for res in fetched])
+    readings.insert(1, "latitude", [res.lat for res in fetched])
+    readings.insert(2, "longitude", [res.lon for res in fetched])
+    return live_table(readings), errors
+
+
+# ---------------- ROLLING WINDOW ----------------
+class LiveWindow:
+    def __init__(self, size=LIVE_WINDOW):
+        self.size = size
+        self._series = {}       # location name -> deque of (fetched_at, current speed)
+        self._lock = threading.Lock()
+        self.counters = {"readings": 0, "repeats": 0}
+
+    def add(self, results):
+        # Record each successful reading once, however many viewers saw it
+        with self._lock:
+            for res in results:
+                if res.error is None and res.flow is not None and res.flow.get("currentSpeed") is not None:
+                    series = self._series.get(res.name)
+                    if series is None:
+                        series = self._series[res.name] = deque(maxlen=self.size)
+                    if series and series[-1][0] >= res.fetched_at:
+                        self.counters["repeats"] += 1
+                        continue
+                    series.append((res.fetched_at, res.flow.get("currentSpeed")))
+                    self.counters["readings"] += 1
+
+    def trends(self, names):
+        # {name: [current speed, oldest first]} for the names with readings
+        with self._lock:
+            return {name: [speed for _, speed in self._series[name]] for name in names if name in self._series}
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters["locations"] = len(self._series)
+            counters["points"] = sum(len(series) for series in self._series.values())
+        return counters
+
+
+# ---------------- SHARED TABLES ----------------
+class LiveTables:
+    def __init__(self, max_tables=LIVE_TABLES):
+        self.max_tables = max_tables
+        self._rows = {}                 # location name -> (fetched_at, table row)
+        self._tables = OrderedDict()    # snapshot key -> (frame, arrow table), LRU order
+        self._lock = threading.Lock()
+        self.counters = {"rows_built": 0, "tables_built": 0, "tables_shared": 0}
+
+    def table(self, results, trends):
+        # (frame, Arrow table) of the successful readings in `results`. Rows
+        # are rebuilt only for readings not seen before, and viewers showing
+        # the same snapshot get the same objects; `trends(names)` returns the
+        # sparkline series of the rebuilt rows
+        fetched = [res for res in results if res.error is None]
+        key = tuple((res.name, res.fetched_at) for res in fetched)
+        with self._lock:
+            cached = self._tables.get(key)
+            if cached is not None:
+                self._tables.move_to_end(key)
+                self.counters["tables_shared"] += 1
+                return cached
+            self._tables[key] = cached = self._build(fetched, trends)
+            self.counters["tables_built"] += 1
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+            return cached
+
+    def _build(self, fetched, trends):
+        # Caller holds self._lock
+        import numpy as np
+        import pandas as pd
+        import pyarrow as pa
+
+        stale = [res for res in fetched if self._rows.get(res.name, (None,))[0] != res.fetched_at]
+        if stale:
+            table, _ = live_flow_frame(stale)
+            series = trends([res.name for res in stale])
+            # int16 series keep the sparklines a quarter of the bytes of int64 lists
+            table[TREND_COLUMN] = [np.asarray(series.get(res.name, ()), dtype=np.int16) for res in stale]
+            for res, row in zip(stale, table.to_dict("records")):
+                self._rows[res.name] = (res.fetched_at, row)
+            self.counters["rows_built"] += len(stale)
+        frame = pd.DataFrame([self._rows[res.name][1] for res in fetched])
+        # Converted once here instead of by st.dataframe on every tick
+        return frame, pa.Table.from_pandas(frame, preserve_index=False)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters["tables"] = len(self._tables)
+        return counters
+
+
+class LiveView:
+    # What one viewer last drew, to tell which rows a tick changed
+    def __init__(self):
+        self._seen = {}         # location name -> fetched_at of the drawn reading
+
+    def changed(self, results):
+        fetched = [res for res in results if res.error is None]
+        changed = [res.name for res in fetched if self._seen.get(res.name) != res.fetched_at]
+        self._seen = {res.name: res.fetched_at for res in fetched}
+        return changed
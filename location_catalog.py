@@ -0,0 +1,241 @@
+"""
+Catalog of monitored locations, shared by the live fetcher, the geo-tagger,
+the encoders and the dashboard so every path names a point the same way.
+
+Each entry in locations.json (VISION_LOCATIONS) has a stable id, the
+canonical name used in traffic_data and by the model encoders, aliases (the
+old Live Data labels such as "Taj Mahal, Agra"), coordinates and its city and
+region. Lookups by id, name or alias are one dict hit; proximity queries go
+through a KD-tree over the coordinates built on first use, so a catalog of
+thousands of points costs the same per lookup as ten. Entries without
+coordinates (area labels the models know) resolve by name but are never
+fetched or tagged.
+
+    python location_catalog.py check           # store/encoder names that do not resolve
+    python location_catalog.py list --city Agra --page 1
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCATIONS_FILE = os.environ.get("VISION_LOCATIONS", os.path.join(BASE_DIR, "locations.json"))
+
+# Selectboxes, tables and charts show at most this many locations at a time
+PAGE_SIZE = int(os.environ.get("VISION_LOCATION_PAGE_SIZE", 100))
+OTHER_CITY = "Other"
+
+Location = namedtuple("Location", ["id", "name", "aliases", "latitude", "longitude", "city", "region",
+                                   "live", "radius_km"])
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def _key(label):
+    # Lookups ignore case and repeated whitespace
+    return " ".join(str(label).split()).casefold()
+
+
+def paginate(items, page, page_size=PAGE_SIZE):
+    # (items on the 1-based page, number of pages); out-of-range pages clamp
+    pages = max(1, math.ceil(len(items) / page_size))
+    page = min(max(int(page), 1), pages)
+    return items[(page - 1) * page_size:page * page_size], pages
+
+
+def _location(raw):
+    lat, lon = raw.get("latitude"), raw.get("longitude")
+    located = lat is not None and lon is not None
+    return Location(
+        id=str(raw["id"]),
+        name=raw["name"],
+        aliases=tuple(raw.get("aliases", ())),
+        latitude=float(lat) if located else None,
+        longitude=float(lon) if located else None,
+        city=raw.get("city") or OTHER_CITY,
+        region=raw.get("region") or OTHER_CITY,
+        # Only points with coordinates can be polled
+        live=located and bool(raw.get("live", True)),
+        radius_km=raw.get("radius_km"),
+    )
+
+
+class LocationCatalog:
+    def __init__(self, locations, max_distance_km=1.5, unknown="Unknown"):
+        self.max_distance_km = max_distance_km
+        self.unknown = unknown
+        self.locations = tuple(_location(raw) for raw in locations)
+        self._by_id = {}
+        self._by_key = {}
+        for loc in self.locations:
+            if loc.id in self._by_id:
+                raise CatalogError(f"duplicate location id {loc.id!r}")
+            self._by_id[loc.id] = loc
+            for label in (loc.id, loc.name) + loc.aliases:
+                owner = self._by_key.setdefault(_key(label), loc)
+                if owner is not loc:
+                    raise CatalogError(f"{label!r} names both {owner.id!r} and {loc.id!r}")
+        # Proximity queries index these, in this order
+        self.located = tuple(loc for loc in self.locations if loc.latitude is not None)
+        self.live = tuple(loc for loc in self.locations if loc.live)
+        self._tagger = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path=LOCATIONS_FILE):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config["locations"], config.get("max_distance_km", 1.5), config.get("unknown", "Unknown"))
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    # ---------------- LOOKUPS ----------------
+    def get(self, location_id):
+        return self._by_id[location_id]
+
+    def find(self, label):
+        # Location for an id, canonical name or alias; None if unknown
+        return self._by_key.get(_key(label))
+
+    def canonical(self, label):
+        loc = self.find(label)
+        return loc.name if loc is not None else label
+
+    @property
+    def names(self):
+        return [loc.name for loc in self.locations]
+
+    def aliases(self):
+        # id/alias -> canonical name, for lookups keyed by name (the encoders)
+        return {label: loc.name for loc in self.locations for label in (loc.id,) + loc.aliases}
+
+    def city_of(self, label):
+        loc = self.find(label)
+        return loc.city if loc is not None else OTHER_CITY
+
+    def cities(self, labels=None):
+        # Sorted cities of the given names (default: the whole catalog)
+        if labels is None:
+            return sorted({loc.city for loc in self.locations})
+        return sorted({self.city_of(label) for label in labels})
+
+    def filter_names(self, names, city=None, query=None, region=None):
+        # `names` in their order, restricted to a city/region and/or to those
+        # whose name, id or an alias contains `query` (case-insensitive)
+        query = _key(query) if query else None
+        matches = []
+        for name in names:
+            loc = self.find(name)
+            if city is not None and (loc.city if loc is not None else OTHER_CITY) != city:
+                continue
+            if region is not None and (loc.region if loc is not None else OTHER_CITY) != region:
+                continue
+            if query is not None:
+                labels = (loc.id, loc.name) + loc.aliases if loc is not None else (name,)
+                if not any(query in _key(label) for label in labels):
+                    continue
+            matches.append(name)
+        return matches
+
+    def live_points(self, ids=None):
+        # (latitude, longitude, name) as FlowFetcher/FlowCache take them: every
+        # live location, or the given ids/names in order
+        locations = self.live if ids is None else [self.find(i) for i in ids]
+        return [(loc.latitude, loc.longitude, loc.name) for loc in locations
+                if loc is not None and loc.latitude is not None]
+
+    # ---------------- PROXIMITY ----------------
+    @property
+    def tagger(self):
+        # geo_tagging.GeoTagger over the located entries, built on first use
+        if self._tagger is None:
+            with self._lock:
+                if self._tagger is None:
+                    from geo_tagging import GeoTagger
+                    self._tagger = GeoTagger.from_catalog(self)
+        return self._tagger
+
+    def nearest(self, lat, lon):
+        # Location whose radius covers the point, or None
+        index, _ = self.tagger.nearest(lat, lon)
+        return self.located[index[0]] if index[0] < len(self.located) else None
+
+    def within(self, lat, lon, radius_km):
+        # [(Location, km)] within radius_km of the point, nearest first
+        index, km = self.tagger.within(lat, lon, radius_km)
+        return [(self.located[i], float(d)) for i, d in zip(index, km)]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = LocationCatalog.from_config()
+    return _catalog
+
+
+def check(catalog, store=None, registry=None):
+    # {source: [names that do not resolve]} for the history store and the
+    # location encoder; the geo-tagger's unknown bucket counts as resolved
+    sources = {}
+    if store is not None:
+        sources["history store"] = store.location_names()
+    if registry is not None:
+        sources["location encoder"] = list(registry.load_all()["location_ohe"].categories_[0])
+    return {source: [name for name in names if name != catalog.unknown and catalog.find(name) is None]
+            for source, names in sources.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitored location catalog")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check_cmd = sub.add_parser("check", help="names in the history store or encoders missing from the catalog")
+    check_cmd.add_argument("--sync", action="store_true", help="sync vehicle_data.csv into the store first")
+    list_cmd = sub.add_parser("list", help="one page of catalog entries")
+    list_cmd.add_argument("--city")
+    list_cmd.add_argument("--region")
+    list_cmd.add_argument("--query")
+    list_cmd.add_argument("--page", type=int, default=1)
+    parser.add_argument("--locations", default=LOCATIONS_FILE)
+    args = parser.parse_args()
+
+    catalog = LocationCatalog.from_config(args.locations)
+    if args.command == "list":
+        names = catalog.filter_names(catalog.names, args.city, args.query, args.region)
+        shown, pages = paginate(names, args.page)
+        for name in shown:
+            loc = catalog.find(name)
+            where = f"{loc.latitude:.4f}, {loc.longitude:.4f}" if loc.latitude is not None else "-"
+            print(f"{loc.id:<24} {loc.name:<32} {loc.city:<14} {where:<20} {'live' if loc.live else ''}")
+        print(f"{len(names):,} matching, page {min(max(args.page, 1), pages)} of {pages}")
+        return
+
+    from history_store import get_store
+    from model_registry import get_registry
+    store = get_store()
+    if args.sync:
+        store.sync_csv()
+    print(f"{len(catalog):,} locations ({len(catalog.live):,} live) in {len(catalog.cities())} cities")
+    missing = check(catalog, store, get_registry())
+    for source, names in missing.items():
+        print(f"{source}: {len(names)} unresolved" + (f" ({', '.join(names)})" if names else ""))
+    sys.exit(1 if any(missing.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Process-wide registry for the prediction models and encoders.
+
+Artifacts are loaded once per process and handed out from memory on every
+Streamlit rerun. A file is only reloaded when its mtime/size changes *and*
+its content hash differs, so touching or re-copying an identical pickle is free.
+
+When the model directory holds CURRENT_FILE (written by `train_models.py
+promote`), it points at a trained version directory instead: the registry
+serves that version's artifacts as one set, keyed by the version name. A new
+pointer is noticed on the next lookup; the whole new set is loaded before it
+replaces the old one, so a caller never sees artifacts of two versions.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from compact_forest import is_current, load_forest
+from instrumentation import span
+
+# Registry name -> pickle file, as shipped in the repo root
+ARTIFACTS = {
+    "traffic_model": "traffic_level_model.pkl",
+    "vehicle_model": "vehicle_count_model.pkl",
+    "location_ohe": "location_ohe.pkl",
+    "date_encoder": "date_encoder.pkl",
+    "time_encoder": "time_encoder.pkl",
+    "traffic_le": "traffic_label_encoder.pkl",
+}
+
+# NumPy node tables written by `python compact_forest.py export`; they replace
+# the forest pickles when present and exported from the current pickle
+COMPACT_ARTIFACTS = {
+    "traffic_model": "traffic_level_model.npz",
+    "vehicle_model": "vehicle_count_model.npz",
+}
+
+# {"version": ..., "directory": ...} of the promoted version, relative to the model directory
+CURRENT_FILE = "current_model.json"
+
+MODEL_DIR = os.environ.get("VISION_MODEL_DIR", os.path.dirname(os.path.abspath(__file__)))
+USE_COMPACT = os.environ.get("VISION_COMPACT_MODELS", "1").lower() not in ("0", "false", "no", "off")
+
+
+def default_artifacts(model_dir=MODEL_DIR, use_compact=USE_COMPACT):
+    artifacts = dict(ARTIFACTS)
+    if use_compact:
+        for name, fname in COMPACT_ARTIFACTS.items():
+            path = os.path.join(model_dir, fname)
+            if os.path.exists(path) and is_current(path):
+                artifacts[name] = fname
+    return artifacts
+
+
+def read_current(model_dir=MODEL_DIR):
+    # The promoted version's pointer, or None when the directory holds the artifacts itself
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def artifact_dir(model_dir=MODEL_DIR):
+    # Directory the artifacts are served from: the promoted version's, if any
+    current = read_current(model_dir)
+    return model_dir if current is None else os.path.join(model_dir, current["directory"])
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _deep_nbytes(obj, seen=None):
+    # Returns (resident, mapped) bytes reachable from obj. Memory-mapped arrays
+    # are counted separately since their pages are shared between processes.
+    if seen is None:
+        seen = {}
+    if id(obj) in seen:
+        return 0, 0
+    # Keep a reference so temporary __getstate__ results can't have their id reused
+    seen[id(obj)] = obj
+
+    if isinstance(obj, np.memmap):
+        return 0, obj.nbytes
+    if isinstance(obj, np.ndarray):
+        resident, mapped = obj.nbytes, 0
+        children = obj.ravel() if obj.dtype == object else ()
+    elif isinstance(obj, dict):
+        resident, mapped = sys.getsizeof(obj), 0
+        children = list(obj.keys()) + list(obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        resident, mapped = sys.getsizeof(obj), 0
+        children = obj
+    else:
+        resident, mapped = sys.getsizeof(obj), 0
+        # sklearn's Cython Tree has no __dict__ but exposes its node arrays via __getstate__
+        state = getattr(obj, "__dict__", None)
+        if state is None and type(obj).__module__.startswith("sklearn"):
+            state = obj.__getstate__()
+        children = (state,) if state else ()
+
+    for child in children:
+        r, m = _deep_nbytes(child, seen)
+        resident += r
+        mapped += m
+    return resident, mapped
+
+
+class _Entry:
+    __slots__ = ("obj", "path", "mtime_ns", "size", "sha256", "load_time", "resident_bytes", "mapped_bytes", "loads")
+
+    def __init__(self, path):
+        self.obj = None
+        self.path = path
+        self.mtime_ns = None
+        self.size = None
+        self.sha256 = None
+        self.load_time = None
+        self.resident_bytes = None
+        self.mapped_bytes = None
+        self.loads = 0
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=MODEL_DIR, artifacts=None, mmap_mode="r"):
+        self.model_dir = model_dir
+        self._artifacts = artifacts
+        # mmap_mode lets joblib map large numpy arrays read-only from the page
+        # cache, so worker processes on one host share those pages
+        self.mmap_mode = mmap_mode
+        self._derived = {}
+        self._lock = threading.Lock()
+        # (promoted version or None, entries) is replaced as a whole; the
+        # pointer's (mtime_ns, size) says when to look at it again
+        self._set = (None, self._make_entries(model_dir))
+        self._current_stamp = None
+
+    def _make_entries(self, directory):
+        artifacts = self._artifacts if self._artifacts is not None else default_artifacts(directory)
+        return {name: _Entry(os.path.join(directory, fname)) for name, fname in artifacts.items()}
+
+    def _current_set(self):
+        try:
+            stat = os.stat(os.path.join(self.model_dir, CURRENT_FILE))
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._current_stamp:
+            return self._set
+
+        with self._lock:
+            if stamp != self._current_stamp:
+                current = read_current(self.model_dir) if stamp is not None else None
+                version = current["version"] if current else None
+                if version != self._set[0]:
+                    entries = self._make_entries(artifact_dir(self.model_dir) if current else self.model_dir)
+                    if current:
+                        # Version directories are immutable: load all of it before switching
+                        for entry in entries.values():
+                            self._load(entry, os.stat(entry.path), _file_hash(entry.path))
+                    self._set = (version, entries)
+                self._current_stamp = stamp
+            return self._set
+
+    def _load(self, entry, stat, sha256):
+        start = time.perf_counter()
+        if entry.path.endswith(".npz"):
+            with span("compact_load"):
+                entry.obj = load_forest(entry.path)
+        else:
+            with span("joblib_load"):
+                entry.obj = joblib.load(entry.path, mmap_mode=self.mmap_mode)
+        entry.load_time = time.perf_counter() - start
+        entry.resident_bytes, entry.mapped_bytes = _deep_nbytes(entry.obj)
+        entry.mtime_ns, entry.size, entry.sha256 = stat.st_mtime_ns, stat.st_size, sha256
+        entry.loads += 1
+
+    def get(self, name):
+        return self._get(self._current_set()[1][name])
+
+    def _get(self, entry):
+        stat = os.stat(entry.path)
+        if entry.obj is not None and (stat.st_mtime_ns, stat.st_size) == (entry.mtime_ns, entry.size):
+            return entry.obj
+
+        with self._lock:
+            stat = os.stat(entry.path)
+            if entry.obj is not None and (stat.st_mtime_ns, stat.st_size) == (entry.mtime_ns, entry.size):
+                return entry.obj
+            sha256 = _file_hash(entry.path)
+            if entry.obj is not None and sha256 == entry.sha256:
+                # Touched or copied over with identical content: keep the loaded object
+                entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+            else:
+                self._load(entry, stat, sha256)
+            return entry.obj
+
+    def load_all(self):
+        return self.snapshot()[1]
+
+    def snapshot(self):
+        # (version, {name: artifact}) of one consistent set
+        version, entries = self._current_set()
+        models = {name: self._get(entry) for name, entry in entries.items()}
+        return version or self._content_version(entries), models
+
+    def derived(self, key, factory, snapshot=None):
+        # Objects built from the artifacts (lookup tables, compiled models...)
+        # are cached per registry version and rebuilt after a reload; pass the
+        # caller's snapshot() to build from exactly the set it holds
+        version, models = snapshot or self.snapshot()
+        cached = self._derived.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = factory(models)
+        with self._lock:
+            self._derived[key] = (version, value)
+        return value
+
+    @property
+    def version(self):
+        # The promoted version's name, else changes whenever any artifact is
+        # reloaded with different content
+        version, entries = self._set
+        return version or self._content_version(entries)
+
+    @staticmethod
+    def _content_version(entries):
+        digest = hashlib.sha256()
+        for name in sorted(entries):
+            digest.update((entries[name].sha256 or "").encode())
+        return digest.hexdigest()[:12]
+
+    def stats(self):
+        rows = []
+        for name, entry in self._set[1].items():
+            rows.append({
+                "artifact": name,
+                "file": os.path.basename(entry.path),
+                "size_kb": round(entry.size / 1024, 1) if entry.size is not None else None,
+                "sha256": entry.sha256[:12] if entry.sha256 else None,
+                "load_ms": round(entry.load_time * 1000, 1) if entry.load_time is not None else None,
+                "resident_kb": round(entry.resident_bytes / 1024, 1) if entry.resident_bytes is not None else None,
+                "mapped_kb": round(entry.mapped_bytes / 1024, 1) if entry.mapped_bytes is not None else None,
+                "loads": entry.loads,
+            })
+        return rows
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,127 @@
+"""
+Memoized single predictions for the Prediction page.
+
+Many inputs encode to the same feature row: times snap to the nearest trained
+slot, unseen dates to the nearest date on the same weekday, and catalog
+aliases to their location's column. Results are cached by the encoded row
+plus the model registry version in an LRU (optionally with a TTL), so a
+repeated prediction is a dictionary lookup instead of two forest predictions.
+A new registry version clears the cache, so a model reload never serves old
+results.
+
+warm() predicts every location x every minute of today and tomorrow in one
+batch (only the distinct feature rows, about 1.5k for the shipped encoders),
+so the typical click is already cached.
+
+    VISION_PREDICTION_CACHE=50000     max cached feature rows (0 disables)
+    VISION_PREDICTION_TTL=0           seconds an entry stays valid (0: until evicted)
+    VISION_PREDICTION_WARM=1          warm today/tomorrow when the models load
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_cls
+
+import numpy as np
+
+from instrumentation import span
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("VISION_PREDICTION_CACHE", 50_000))
+PREDICTION_TTL = float(os.environ.get("VISION_PREDICTION_TTL", 0))
+PREDICTION_WARM = os.environ.get("VISION_PREDICTION_WARM", "1").lower() not in ("0", "false", "no", "off")
+
+
+def predict_rows(models, encoder, matrix):
+    # [(traffic level, vehicle count)] for encoded feature rows, as the single
+    # prediction path returns them (count not truncated)
+    features = encoder.frame(matrix)
+    levels = models["traffic_le"].inverse_transform(models["traffic_model"].predict(features))
+    counts = models["vehicle_model"].predict(features)
+    return [(str(level), float(count)) for level, count in zip(levels, counts)]
+
+
+class PredictionCache:
+    def __init__(self, max_entries=PREDICTION_CACHE_SIZE, ttl=PREDICTION_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None         # registry version the entries belong to
+        self.warmed = None          # (version, first day) of the last warm()
+        self._entries = OrderedDict()   # row bytes -> (result, stored_at), LRU order
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "warmed": 0}
+
+    def _use_version(self, version):
+        # Caller holds self._lock
+        if version != self.version:
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._entries.clear()
+            self.version = version
+            self.warmed = None
+
+    def get(self, version, key):
+        with self._lock:
+            self._use_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry[1] >= self.ttl:
+                del self._entries[key]
+                self.counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def put_many(self, version, keys, results):
+        now = time.time()
+        with self._lock:
+            self._use_version(version)
+            for key, result in zip(keys, results):
+                self._entries[key] = (result, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def predict(self, models, encoder, version, location, date_value, time_value):
+        # (traffic level, vehicle count) for one input, from the cache if the
+        # same feature row was predicted under this model version
+        row = encoder.transform_one(location, date_value, time_value)
+        if self.max_entries <= 0:
+            return predict_rows(models, encoder, row)[0]
+        key = row.tobytes()
+        result = self.get(version, key)
+        if result is None:
+            result = predict_rows(models, encoder, row)[0]
+            self.put_many(version, [key], [result])
+        return result
+
+    def warm(self, models, encoder, version, start_date=None, days=2, freq_minutes=1):
+        # Predict every known location x time slot from start_date (default
+        # today) in one batch; returns the number of distinct rows cached
+        from batch_predict import grid_rows
+
+        start_date = start_date or date_cls.today()
+        if self.max_entries <= 0:
+            return 0
+        with span("prediction_warm"):
+            locations = list(models["location_ohe"].categories_[0])
+            matrix = np.unique(encoder.transform(*grid_rows(locations, start_date, days, freq_minutes)), axis=0)
+            matrix = matrix[:self.max_entries]
+            results = predict_rows(models, encoder, matrix)
+            self.put_many(version, [row.tobytes() for row in matrix], results)
+        with self._lock:
+            self.warmed = (version, start_date)
+            self.counters["warmed"] += len(matrix)
+        return len(matrix)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters["entries"] = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        return counters
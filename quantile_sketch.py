@@ -0,0 +1,59 @@
+"""
+Mergeable quantile sketches (DDSketch-style log buckets).
+
+A value x maps to a signed bin: 0 when |x| <= MIN_VALUE, otherwise
+sign(x) * (ceil(log_gamma |x|) + BIN_OFFSET), with gamma = (1 + a) / (1 - a).
+Every value in a bin lies within a factor gamma of the others, so reporting
+the bin's midpoint is within relative error a (SKETCH_ACCURACY) of any of
+them. Bins order like the values they hold, a sketch is just {bin: count},
+and merging sketches adds their counts: the history store keeps one per
+(metric, location, date, hour) as rows of counts and merges any slice with
+SUM(n) GROUP BY bin. A sketch never has more than MAX_BINS bins, however
+many values it summarizes.
+
+Quantiles follow the lower-rank definition, i.e. the value at rank
+floor(q * (n - 1)) of the sorted values, as np.quantile(method="lower").
+
+Changing SKETCH_ACCURACY (or MIN_VALUE) invalidates stored sketches; bump
+history_store.ROLLUP_VERSION with it so they are rebuilt.
+"""
+import numpy as np
+
+SKETCH_ACCURACY = 0.01
+MIN_VALUE = 1e-3            # |x| at or below this is counted as 0
+MAX_VALUE = 1e9
+
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+LOG_GAMMA = np.log(GAMMA)
+# Smallest |x| above MIN_VALUE lands in bin 1
+BIN_OFFSET = 1 - int(np.ceil(np.log(MIN_VALUE) / LOG_GAMMA))
+MAX_BINS = 2 * (int(np.ceil(np.log(MAX_VALUE) / LOG_GAMMA)) + BIN_OFFSET) + 1
+
+
+def bins(values):
+    # Signed bin of each value (NaN must be dropped first)
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.clip(np.abs(values), MIN_VALUE, MAX_VALUE)
+    index = np.ceil(np.log(magnitude) / LOG_GAMMA).astype(np.int64) + BIN_OFFSET
+    index = np.maximum(index, 1)
+    return np.where(np.abs(values) <= MIN_VALUE, 0, np.sign(values).astype(np.int64) * index)
+
+
+def bin_values(bin_ids):
+    # Representative (midpoint) value of each bin
+    bin_ids = np.asarray(bin_ids, dtype=np.int64)
+    upper = np.power(GAMMA, np.abs(bin_ids) - BIN_OFFSET)
+    return np.where(bin_ids == 0, 0.0, np.sign(bin_ids) * 2 * upper / (GAMMA + 1))
+
+
+def quantiles(bin_ids, counts, qs):
+    # Quantiles qs of the sketch {bin_ids: counts}; NaN when it is empty
+    order = np.argsort(bin_ids)
+    bin_ids, counts = np.asarray(bin_ids)[order], np.asarray(counts, dtype=np.int64)[order]
+    total = counts.sum()
+    if total == 0:
+        return np.full(len(qs), np.nan)
+    ranks = np.floor(np.asarray(qs, dtype=np.float64) * (total - 1))
+    # First bin whose cumulative count passes the rank
+    position = np.searchsorted(np.cumsum(counts), ranks, side="right")
+    return bin_values(bin_ids[position])
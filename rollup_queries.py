@@ -0,0 +1,200 @@
+"""
+The `vehicle queries.sql` reports, answered from the rollup cubes.
+
+Each report has two SQLite versions: `raw` scans traffic_data like the
+original MySQL query (HOUR(time) becomes the first two characters of `time`)
+and `rollup` reads the cubes the history store updates on every ingest:
+rollup_location_hour (one row per location and hour) for all-time reports,
+rollup_location_date_hour when a date range is given. Rollup answers cost
+the same however many readings are stored. Ties in ORDER BY ... LIMIT are
+broken by name/hour in both versions so they pick the same rows.
+
+    python rollup_queries.py                   # every report, from the rollups
+    python rollup_queries.py verify            # rollup vs raw, exit 1 on mismatch
+    python rollup_queries.py top_locations --raw --start 2025-04-05 --end 2025-04-30
+"""
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from history_store import get_store
+
+Report = namedtuple("Report", ["title", "raw", "rollup"])
+
+RAW_HOUR = "CAST(substr(time, 1, 2) AS INTEGER)"
+RAW_RANGE = "(SELECT * FROM traffic_data WHERE date BETWEEN :start AND :end)"
+CUBE_RANGE = "(SELECT * FROM rollup_location_date_hour WHERE date BETWEEN :start AND :end)"
+
+
+def _per_location(raw_expr, rollup_expr, alias, order, limit=None):
+    tail = f" ORDER BY {alias} {order}, location_name" + (f" LIMIT {limit}" if limit else "")
+    return (
+        f"SELECT location_name, {raw_expr} AS {alias} FROM {{raw}} GROUP BY location_name{tail}",
+        f"SELECT location_name, {rollup_expr} AS {alias} FROM {{cube}} GROUP BY location_name{tail}",
+    )
+
+
+def _per_hour(raw_expr, rollup_expr, alias, order_by, limit=None):
+    tail = f" ORDER BY {order_by}" + (f" LIMIT {limit}" if limit else "")
+    return (
+        f"SELECT {RAW_HOUR} AS hour_of_day, {raw_expr} AS {alias} FROM {{raw}} GROUP BY hour_of_day{tail}",
+        f"SELECT hour AS hour_of_day, {rollup_expr} AS {alias} FROM {{cube}} GROUP BY hour{tail}",
+    )
+
+
+REPORTS = {
+    "total_records": Report(
+        "Total records count",
+        "SELECT COUNT(*) AS total_records FROM {raw}",
+        "SELECT COALESCE(SUM(n), 0) AS total_records FROM {cube}",
+    ),
+    "unique_locations": Report(
+        "Count of unique locations",
+        "SELECT COUNT(DISTINCT location_name) AS unique_locations FROM {raw}",
+        "SELECT COUNT(DISTINCT location_name) AS unique_locations FROM {cube}",
+    ),
+    "avg_speed": Report(
+        "Average speed of vehicles",
+        "SELECT AVG(currentSpeed) AS avg_speed FROM {raw}",
+        "SELECT SUM(sum_speed) / SUM(n_speed) AS avg_speed FROM {cube}",
+    ),
+    "speed_range": Report(
+        "Maximum and minimum speeds recorded",
+        "SELECT MAX(currentSpeed) AS max_speed, MIN(currentSpeed) AS min_speed FROM {raw}",
+        "SELECT MAX(max_speed) AS max_speed, MIN(min_speed) AS min_speed FROM {cube}",
+    ),
+    "total_delay": Report(
+        "Total sum of delay time",
+        "SELECT SUM(delay_time) AS total_delay FROM {raw}",
+        "SELECT CAST(SUM(sum_delay) AS INTEGER) AS total_delay FROM {cube}",
+    ),
+    "top_locations": Report(
+        "Top 5 locations with the highest vehicle count",
+        *_per_location("COUNT(*)", "SUM(n)", "vehicle_count", "DESC", limit=5),
+    ),
+    "location_speed": Report(
+        "Average speed at each location",
+        *_per_location("AVG(currentSpeed)", "SUM(sum_speed) / SUM(n_speed)", "avg_speed", "DESC"),
+    ),
+    "highest_delay_location": Report(
+        "Highest delay location",
+        *_per_location("AVG(delay_time)", "SUM(sum_delay) / SUM(n_delay)", "avg_delay", "DESC", limit=1),
+    ),
+    "lowest_delay_location": Report(
+        "Lowest delay location",
+        *_per_location("AVG(delay_time)", "SUM(sum_delay) / SUM(n_delay)", "avg_delay", "ASC", limit=1),
+    ),
+    "hourly_counts": Report(
+        "Total number of vehicles recorded per hour",
+        *_per_hour("COUNT(*)", "SUM(n)", "vehicle_count", "hour_of_day"),
+    ),
+    "peak_hours": Report(
+        "Peak traffic hours (top 3 busiest hours)",
+        *_per_hour("COUNT(*)", "SUM(n)", "vehicle_count", "vehicle_count DESC, hour_of_day", limit=3),
+    ),
+    "hourly_speed": Report(
+        "Average speed per hour",
+        *_per_hour("AVG(currentSpeed)", "SUM(sum_speed) / SUM(n_speed)", "avg_speed", "hour_of_day"),
+    ),
+    "location_speed_ratio": Report(
+        "Speed ratio trends (average per location)",
+        *_per_location("AVG(speed_ratio)", "SUM(sum_speed_ratio) / SUM(n_speed_ratio)", "avg_speed_ratio", "DESC"),
+    ),
+    "below_free_flow": Report(
+        "Percentage of vehicles moving below free flow speed",
+        "SELECT (COUNT(*) * 100.0 / (SELECT COUNT(*) FROM {raw})) AS percentage_below_free_flow "
+        "FROM {raw} WHERE currentSpeed < freeFlowSpeed",
+        "SELECT SUM(n_below_free_flow) * 100.0 / SUM(n) AS percentage_below_free_flow FROM {cube}",
+    ),
+    "fastest_location": Report(
+        "Fastest location",
+        *_per_location("AVG(currentSpeed)", "SUM(sum_speed) / SUM(n_speed)", "avg_speed", "DESC", limit=1),
+    ),
+    "slowest_location": Report(
+        "Slowest location",
+        *_per_location("AVG(currentSpeed)", "SUM(sum_speed) / SUM(n_speed)", "avg_speed", "ASC", limit=1),
+    ),
+    "congestion_index": Report(
+        "Vehicle congestion index (average delay per location)",
+        *_per_location("AVG(delay_time)", "SUM(sum_delay) / SUM(n_delay)", "avg_delay", "DESC"),
+    ),
+}
+
+
+def run_report(name, store=None, raw=False, start=None, end=None):
+    # start/end ("YYYY-MM-DD", inclusive) restrict the report to a date range,
+    # answered from the per-date cube
+    store = store or get_store()
+    report = REPORTS[name]
+    params = {}
+    if start or end:
+        params = {"start": start or "0000-00-00", "end": end or "9999-99-99"}
+        sources = {"raw": RAW_RANGE, "cube": CUBE_RANGE}
+    else:
+        sources = {"raw": "traffic_data", "cube": "rollup_location_hour"}
+    sql = (report.raw if raw else report.rollup).format(**sources)
+    return pd.read_sql_query(sql, store.connect(), params=params)
+
+
+def _same(a, b):
+    # Same rows in the same order; floating columns may differ in the last
+    # bits because the cube adds partial sums in a different order
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    for column in a.columns:
+        x, y = a[column].to_numpy(), b[column].to_numpy()
+        if np.issubdtype(x.dtype, np.number) and np.issubdtype(y.dtype, np.number):
+            if not np.allclose(x.astype(float), y.astype(float), rtol=1e-9, atol=1e-9, equal_nan=True):
+                return False
+        elif not (pd.isna(x) & pd.isna(y) | (x == y)).all():
+            return False
+    return True
+
+
+def verify(store=None, names=None, start=None, end=None):
+    # [(name, raw ms, rollup ms, matches)] for every report
+    store = store or get_store()
+    results = []
+    for name in names or REPORTS:
+        began = time.perf_counter()
+        expected = run_report(name, store, True, start, end)
+        raw_ms = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        actual = run_report(name, store, False, start, end)
+        rollup_ms = (time.perf_counter() - began) * 1000
+        results.append((name, raw_ms, rollup_ms, _same(expected, actual)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vehicle queries.sql reports from the rollup cubes")
+    parser.add_argument("names", nargs="*", help=f"'verify' or report names: {', '.join(REPORTS)}")
+    parser.add_argument("--raw", action="store_true", help="scan traffic_data instead of the rollups")
+    parser.add_argument("--start", help="first date (YYYY-MM-DD) of a date-range report")
+    parser.add_argument("--end", help="last date (YYYY-MM-DD) of a date-range report")
+    parser.add_argument("--sync", action="store_true", help="sync vehicle_data.csv into the store first")
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.sync:
+        store.sync_csv()
+
+    if args.names[:1] == ["verify"]:
+        results = verify(store, args.names[1:] or None, args.start, args.end)
+        print(f"{'report':<24} {'raw ms':>9} {'rollup ms':>10}  match")
+        for name, raw_ms, rollup_ms, ok in results:
+            print(f"{name:<24} {raw_ms:>9.2f} {rollup_ms:>10.2f}  {'yes' if ok else 'NO'}")
+        sys.exit(0 if all(ok for *_, ok in results) else 1)
+
+    for name in args.names or REPORTS:
+        print(f"-- {REPORTS[name].title}")
+        print(run_report(name, store, args.raw, args.start, args.end).to_string(index=False))
+        print()
+
+
+if __name__ == "__main__":
+    main()
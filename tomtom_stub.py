@@ -0,0 +1,105 @@
+"""
+Local stand-in for the TomTom flowSegmentData endpoint.
+
+Serves deterministic synthetic readings with configurable latency and error
+injection so the fetcher can be benchmarked without spending API quota.
+
+    python tomtom_stub.py --port 8765 --latency 0.2
+    TOMTOM_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def synthetic_flow(lat, lon, now=None):
+    # Stable per point, slowly drifting with time so repeated polls differ
+    now = time.time() if now is None else now
+    seed = zlib.crc32(f"{lat:.4f},{lon:.4f}".encode())
+    rng = random.Random(seed + int(now // 60))
+    free_flow_speed = 30 + seed % 40
+    current_speed = max(3, int(free_flow_speed * rng.uniform(0.3, 1.05)))
+    free_flow_travel_time = 200 + seed % 800
+    current_travel_time = int(free_flow_travel_time * free_flow_speed / current_speed)
+    return {
+        "frc": f"FRC{1 + seed % 4}",
+        "currentSpeed": current_speed,
+        "freeFlowSpeed": free_flow_speed,
+        "currentTravelTime": current_travel_time,
+        "freeFlowTravelTime": free_flow_travel_time,
+        "confidence": round(rng.uniform(0.7, 1.0), 2),
+        "roadClosure": False,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if "/flowSegmentData/" not in url.path:
+            return self._send(404, {"error": "not found"})
+
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.error_rate and random.random() < server.error_rate:
+            return self._send(server.error_status, {"error": "injected"})
+
+        try:
+            lat, lon = (float(v) for v in parse_qs(url.query)["point"][0].split(","))
+        except (KeyError, ValueError):
+            return self._send(400, {"error": "invalid point"})
+
+        with server.lock:
+            server.request_count += 1
+        return self._send(200, {"flowSegmentData": synthetic_flow(lat, lon)})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503):
+    # Runs in a daemon thread; returns the server so callers can read
+    # server.base_url and call server.shutdown() when done
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.request_count = 0
+    server.lock = threading.Lock()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local TomTom flowSegmentData stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses that fail")
+    args = parser.parse_args()
+
+    stub = start_stub(args.port, args.latency, args.jitter, args.error_rate)
+    print(f"TomTom stub listening on {stub.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.shutdown()
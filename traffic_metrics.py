@@ -0,0 +1,141 @@
+"""
+Derived traffic metrics over whole arrays, shared by the live table, the
+historical profiles, ingestion and the SQL reports so every path computes them
+the same way.
+
+    speed_ratio       currentSpeed / freeFlowSpeed, rounded to 2 decimals
+                      exactly like the traffic_data column
+    delay             currentTravelTime - freeFlowTravelTime, in seconds
+    congestion class  High below 50% of free-flow speed, Moderate below 80%,
+                      Low otherwise (VISION_CONGESTION_HIGH/_MODERATE)
+    congestion index  share of free-flow speed lost: 0 flowing freely, 1 standstill
+    below free flow   currentSpeed < freeFlowSpeed, as in the SQL reports
+
+Inputs may be lists, arrays or Series with None/NaN; a zero or missing
+free-flow value gives NaN (no class) instead of a division error.
+
+    python traffic_metrics.py check        # stored speed_ratio/delay_time vs recomputed
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+HIGH_THRESHOLD = float(os.environ.get("VISION_CONGESTION_HIGH", 0.5))
+MODERATE_THRESHOLD = float(os.environ.get("VISION_CONGESTION_MODERATE", 0.8))
+CONGESTION_LEVELS = ("Low", "Moderate", "High")
+RATIO_DECIMALS = 2
+
+# np.round scales in double precision, so values whose exact x * 10**d sits
+# next to a .5 tie (19 / 40 = 0.47499999...) can round the other way than
+# Python's round(). Those few are redone in x87 extended precision, where the
+# product is exact for d <= 4; where long double is plain double they are left
+# as np.round has them
+_EXACT_SCALE = np.finfo(np.longdouble).nmant >= 63
+
+
+def _float(values):
+    if isinstance(values, (pd.Series, pd.Index)):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+def round_decimals(values, decimals=RATIO_DECIMALS):
+    # Vectorized round(x, decimals), NaN-preserving
+    values = _float(values)
+    scale = 10 ** decimals
+    scaled = values * scale
+    rounded = np.rint(scaled)
+    if _EXACT_SCALE and decimals <= 4:
+        # Candidates: within 1e-9 of a tie, i.e. more than the double rounding
+        # error for |scaled| < 2**21 (NaN/inf compare false)
+        with np.errstate(invalid="ignore"):
+            distance = np.abs(np.subtract(scaled, rounded, out=scaled), out=scaled)
+            near_tie = distance >= 0.5 - 1e-9
+        if near_tie.any():
+            rounded[near_tie] = np.rint(values[near_tie].astype(np.longdouble) * scale)
+    rounded /= scale
+    return rounded
+
+
+def speed_ratio(current_speed, free_flow_speed, decimals=RATIO_DECIMALS):
+    current, free = _float(current_speed), _float(free_flow_speed)
+    ratio = np.divide(current, free, out=np.full(len(current), np.nan), where=free > 0)
+    return ratio if decimals is None else round_decimals(ratio, decimals)
+
+
+def delay(current_travel_time, free_flow_travel_time):
+    return _float(current_travel_time) - _float(free_flow_travel_time)
+
+
+def congestion_codes(current_speed, free_flow_speed, high=HIGH_THRESHOLD, moderate=MODERATE_THRESHOLD):
+    # int8 index into CONGESTION_LEVELS, -1 where either speed is missing or
+    # free flow is not positive; expects high <= moderate
+    current, free = _float(current_speed), _float(free_flow_speed)
+    codes = (current < free * moderate).view(np.int8) + (current < free * high).view(np.int8)
+    codes[~(free > 0) | np.isnan(current)] = -1
+    return codes
+
+
+def congestion_class(current_speed, free_flow_speed, high=HIGH_THRESHOLD, moderate=MODERATE_THRESHOLD):
+    # Categorical of CONGESTION_LEVELS (missing where the class is unknown)
+    codes = congestion_codes(current_speed, free_flow_speed, high, moderate)
+    return pd.Categorical.from_codes(codes, CONGESTION_LEVELS, ordered=True)
+
+
+def congestion_index(current_speed, free_flow_speed):
+    index = speed_ratio(current_speed, free_flow_speed, decimals=None)
+    np.subtract(1.0, index, out=index)
+    return np.clip(index, 0.0, 1.0, out=index)
+
+
+def below_free_flow(current_speed, free_flow_speed):
+    # NULL comparisons are false, like WHERE currentSpeed < freeFlowSpeed
+    return _float(current_speed) < _float(free_flow_speed)
+
+
+def derive(df):
+    # traffic_data rows with speed_ratio and delay_time filled in from the raw readings
+    return df.assign(
+        speed_ratio=speed_ratio(df["currentSpeed"], df["freeFlowSpeed"]),
+        delay_time=delay(df["currentTravelTime"], df["freeFlowTravelTime"]),
+    )
+
+
+def check_store(store, chunk_rows=500_000):
+    # (rows, speed_ratio mismatches, delay_time mismatches) of the stored
+    # derived columns against recomputed ones
+    query = ("SELECT currentSpeed, freeFlowSpeed, currentTravelTime, freeFlowTravelTime, speed_ratio, delay_time "
+             "FROM traffic_data")
+    rows = ratio_bad = delay_bad = 0
+    for chunk in pd.read_sql_query(query, store.connect(), chunksize=chunk_rows):
+        expected = derive(chunk)
+        ratio, stored_ratio = expected["speed_ratio"].to_numpy(), _float(chunk["speed_ratio"])
+        # REAL columns round-trip the double exactly, but MySQL FLOAT exports
+        # are single precision
+        ratio_bad += int((~np.isclose(ratio, stored_ratio, rtol=0, atol=1e-6, equal_nan=True)).sum())
+        delay_bad += int((~np.isclose(expected["delay_time"].to_numpy(), _float(chunk["delay_time"]),
+                                      rtol=0, atol=0, equal_nan=True)).sum())
+        rows += len(chunk)
+    return rows, ratio_bad, delay_bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derived traffic metrics")
+    parser.add_argument("command", choices=["check"])
+    parser.add_argument("--sync", action="store_true", help="sync vehicle_data.csv into the store first")
+    args = parser.parse_args()
+
+    from history_store import get_store
+    store = get_store()
+    if args.sync:
+        store.sync_csv()
+    rows, ratio_bad, delay_bad = check_store(store)
+    print(f"{rows:,} rows: {ratio_bad:,} speed_ratio and {delay_bad:,} delay_time values differ from recomputed")
+    sys.exit(1 if ratio_bad or delay_bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+"""
+Training pipeline for the traffic level and vehicle count Random Forests.
+
+Reads readings from the history store (or a CSV with the same columns),
+builds features with the encoders the app predicts with (FeatureEncoder over
+location_ohe / date_encoder / time_encoder) and trains both forests:
+
+- full retrain: new encoders are fitted on the data, the hyperparameter grid
+  is scored on a time-based holdout (the newest rows) with one candidate per
+  worker process (n_jobs=1 each), and the winners are refitted on every row
+  with n_jobs=--jobs
+- incremental (--incremental): --add-trees trees per forest are grown with
+  warm_start on the rows newer than the base models, keeping the base
+  encoders so the existing trees stay valid (dates the encoders have not seen
+  resolve to the nearest same-weekday date, as in the app)
+
+Labels come from `traffic_level` / `vehicle_count` columns when the data has
+them. The notebook labels are not part of the repo, so otherwise they are
+rebuilt from speed_ratio (see LABEL_* below).
+
+Every run writes models/<version>/ with the six pickles under the app's file
+names, their compact .npz exports and model_manifest.json (data window,
+parameters, holdout metrics, wall time and peak memory). Before that, the
+candidate is scored against a reference on the same holdout rows: the
+served (or base) models on the rows from dates their encoder was not fitted
+on, i.e. rows they never trained on, or, when the holdout has none, the
+shipped parameters refitted on the same training split. If accuracy drops by
+more than --tolerance (or count MAE grows by more than that fraction) the
+run is marked failed and cannot be promoted. Versions stay in their own
+directories: `promote` only rewrites the model directory's pointer
+(model_registry.CURRENT_FILE) with one atomic os.replace, and the registry
+switches to that version's whole set, so promoting an older version is a
+rollback. VISION_MODEL_DIR=models/<version> serves a version directly.
+
+    python train_models.py train --jobs 4
+    python train_models.py train --incremental --add-trees 20
+    python train_models.py promote 20251019-101500
+    python train_models.py list
+"""
+import argparse
+import copy
+import json
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from model_registry import ARTIFACTS, CURRENT_FILE, MODEL_DIR, artifact_dir, read_current
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAINING_DIR = os.environ.get("VISION_TRAINING_DIR", os.path.join(BASE_DIR, "models"))
+MANIFEST = "model_manifest.json"
+
+TRAINING_COLUMNS = ["timestamp", "location_name", "speed_ratio"]
+LABEL_COLUMNS = ["traffic_level", "vehicle_count"]
+TRAFFIC_LEVELS = ["High", "Low", "Medium"]
+
+# Rebuilt labels. Traffic level: speed ratio below LABEL_HIGH_RATIO is High,
+# below LABEL_MEDIUM_RATIO Medium, else Low (agrees with the shipped
+# classifier on 85% of vehicle_data.csv). Vehicle count: a linear density
+# estimate falling from VEHICLES_AT_STANDSTILL by VEHICLES_PER_RATIO per unit
+# of speed ratio (least-squares fit of the shipped regressor on the same rows).
+LABEL_HIGH_RATIO = 0.6
+LABEL_MEDIUM_RATIO = 0.9
+VEHICLES_AT_STANDSTILL = 229.1
+VEHICLES_PER_RATIO = 94.0
+
+SEED = 42
+N_ESTIMATORS = 100
+HOLDOUT_FRACTION = 0.2
+
+# Searched per forest; the first entry is what the shipped models use
+SEARCH_SPACE = {
+    "traffic_model": [{"max_depth": d, "min_samples_leaf": leaf, "max_features": f}
+                      for f in ("sqrt", 0.5) for d in (None, 12, 24) for leaf in (1, 2, 4)],
+    "vehicle_model": [{"max_depth": d, "min_samples_leaf": leaf, "max_features": f}
+                      for f in (1.0, 0.5) for d in (None, 12, 24) for leaf in (1, 2, 4)],
+}
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# ---------------- DATA ----------------
+def load_history(csv_path=None, since=None, unknown="Unknown"):
+    # Readings with a location and a speed ratio, oldest first
+    if csv_path:
+        df = pd.read_csv(csv_path, usecols=lambda c: c in TRAINING_COLUMNS or c in LABEL_COLUMNS)
+    else:
+        from history_store import get_store
+        query = f"SELECT {', '.join(TRAINING_COLUMNS)} FROM traffic_data WHERE speed_ratio IS NOT NULL"
+        params = ()
+        if since:
+            query += " AND timestamp > ?"
+            params = (since,)
+        df = pd.read_sql_query(query, get_store().connect(), params=params)
+    df = df[df["location_name"].notna() & (df["location_name"] != unknown) & df["speed_ratio"].notna()]
+    if since and csv_path:
+        df = df[df["timestamp"] > since]
+    return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def add_labels(df):
+    ratio = df["speed_ratio"].to_numpy(dtype=np.float64)
+    if "traffic_level" not in df:
+        df["traffic_level"] = np.where(ratio < LABEL_HIGH_RATIO, "High",
+                                       np.where(ratio < LABEL_MEDIUM_RATIO, "Medium", "Low"))
+    if "vehicle_count" not in df:
+        df["vehicle_count"] = np.maximum(VEHICLES_AT_STANDSTILL - VEHICLES_PER_RATIO * ratio, 0).round(2)
+    stamps = pd.to_datetime(df["timestamp"])
+    # The encoders' label formats (date_encoder.pkl: DD-MM-YYYY, time_encoder.pkl: HH:MM:SS)
+    df["date_label"] = stamps.dt.strftime("%d-%m-%Y")
+    df["time_label"] = stamps.dt.strftime("%H:%M:%S")
+    return df
+
+
+def fit_encoders(df):
+    from sklearn.preprocessing import LabelEncoder, OneHotEncoder
+
+    return {
+        "location_ohe": OneHotEncoder(handle_unknown="ignore", sparse_output=False).fit(df[["location_name"]]),
+        "date_encoder": LabelEncoder().fit(df["date_label"]),
+        "time_encoder": LabelEncoder().fit(df["time_label"]),
+        "traffic_le": LabelEncoder().fit(TRAFFIC_LEVELS),
+    }
+
+
+def build_matrix(encoders, df):
+    # (X, {forest: y}) with the app's feature columns and label codes
+    from feature_encoding import FeatureEncoder
+
+    encoder = FeatureEncoder.from_models(encoders)
+    X = encoder.frame(encoder.transform(df["location_name"].tolist(), df["date_label"].tolist(),
+                                        df["time_label"].tolist()))
+    unknown = set(df["traffic_level"]) - set(encoders["traffic_le"].classes_)
+    if unknown:
+        raise ValueError(f"traffic levels {sorted(unknown)} are not in the label encoder")
+    y = {"traffic_model": encoders["traffic_le"].transform(df["traffic_level"]),
+         "vehicle_model": df["vehicle_count"].to_numpy(dtype=np.float64)}
+    return X, y
+
+
+def split_holdout(n, fraction=HOLDOUT_FRACTION):
+    # Rows are oldest first: train on the past, score on the newest rows
+    cut = min(max(int(round(n * (1 - fraction))), 1), n - 1) if n > 1 else n
+    return slice(0, cut), slice(cut, n)
+
+
+# ---------------- FORESTS ----------------
+def make_forest(name, params, n_jobs=1, n_estimators=N_ESTIMATORS):
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    forest = RandomForestClassifier if name == "traffic_model" else RandomForestRegressor
+    return forest(n_estimators=n_estimators, random_state=SEED, n_jobs=n_jobs, **params)
+
+
+def score(name, model, X, y):
+    # Holdout accuracy for the classifier, mean absolute error for the regressor
+    predicted = model.predict(X)
+    if name == "traffic_model":
+        return float(np.mean(predicted == y))
+    return float(np.mean(np.abs(predicted - y)))
+
+
+def finish(model):
+    # Served models predict single-threaded and never grow in place, as shipped
+    model.n_jobs = None
+    model.warm_start = False
+    return model
+
+
+def grow(model, X, y, add_trees, n_jobs=1):
+    # Copy of a fitted forest with add_trees more trees fitted on (X, y)
+    if hasattr(model, "classes_") and set(np.unique(y)) != set(model.classes_):
+        raise ValueError(f"the new window has classes {sorted(np.unique(y))}, the base model "
+                         f"{sorted(model.classes_)}; run a full retrain instead")
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + add_trees, n_jobs=n_jobs)
+    return finish(model.fit(X, y))
+
+
+# ---------------- SEARCH ----------------
+# Worker processes get the matrices once through the pool initializer
+_search_data = {}
+
+
+def _init_search(X_train, y_train, X_holdout, y_holdout, n_estimators):
+    _search_data.update(X_train=X_train, y_train=y_train, X_holdout=X_holdout, y_holdout=y_holdout,
+                        n_estimators=n_estimators)
+
+
+def _score_candidate(task):
+    name, params = task
+    data = _search_data
+    start = time.perf_counter()
+    model = make_forest(name, params, n_jobs=1, n_estimators=data["n_estimators"])
+    model.fit(data["X_train"], data["y_train"][name])
+    return name, params, score(name, model, data["X_holdout"], data["y_holdout"][name]), \
+        time.perf_counter() - start
+
+
+def search(X_train, y_train, X_holdout, y_holdout, space=SEARCH_SPACE, jobs=1, n_estimators=N_ESTIMATORS):
+    # {forest: [(params, holdout score, fit seconds)] best first}, candidates
+    # spread over `jobs` processes
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(name, params) for name, grid in space.items() for params in grid]
+    init = (X_train, y_train, X_holdout, y_holdout, n_estimators)
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), initializer=_init_search,
+                                 initargs=init) as pool:
+            results = list(pool.map(_score_candidate, tasks))
+    else:
+        _init_search(*init)
+        results = [_score_candidate(task) for task in tasks]
+        _search_data.clear()
+
+    ranked = {}
+    for name, params, value, seconds in results:
+        ranked.setdefault(name, []).append((params, value, seconds))
+    for name, rows in ranked.items():
+        # Stable sort: ties keep grid order, so the shipped parameters win them
+        rows.sort(key=lambda row: -row[1] if name == "traffic_model" else row[1])
+    return ranked
+
+
+def shipped_score(ranked, name):
+    # Holdout score of the shipped parameters (each grid's first entry)
+    return next(value for params, value, _ in ranked[name] if params == SEARCH_SPACE[name][0])
+
+
+# ---------------- ACCURACY CHECK ----------------
+def evaluate(models, df):
+    # {"traffic_accuracy", "count_mae"} of a model set on labelled rows,
+    # encoded with that set's own encoders (plus the catalog's aliases)
+    from feature_encoding import FeatureEncoder
+    from location_catalog import get_catalog
+
+    encoder = FeatureEncoder.from_models(models, location_aliases=get_catalog().aliases())
+    X = encoder.frame(encoder.transform(df["location_name"].tolist(), df["date_label"].tolist(),
+                                        df["time_label"].tolist()))
+    levels = models["traffic_le"].inverse_transform(models["traffic_model"].predict(X))
+    counts = models["vehicle_model"].predict(X)
+    return {"traffic_accuracy": float(np.mean(levels == df["traffic_level"].to_numpy())),
+            "count_mae": float(np.mean(np.abs(counts - df["vehicle_count"].to_numpy(dtype=np.float64))))}
+
+
+def unseen_rows(models, df):
+    # Rows on dates the models' date encoder was not fitted on, i.e. rows
+    # those models never trained on
+    return df[~df["date_label"].isin(set(models["date_encoder"].classes_))]
+
+
+def compare(candidate, reference, tolerance):
+    # Failures of the candidate against the reference's holdout metrics
+    failures = []
+    if candidate["traffic_accuracy"] < reference["traffic_accuracy"] - tolerance:
+        failures.append(f"traffic accuracy {candidate['traffic_accuracy']:.3f} < "
+                        f"reference {reference['traffic_accuracy']:.3f} - {tolerance}")
+    if candidate["count_mae"] > reference["count_mae"] * (1 + tolerance):
+        failures.append(f"vehicle count MAE {candidate['count_mae']:.2f} > "
+                        f"reference {reference['count_mae']:.2f} x (1 + {tolerance})")
+    return failures
+
+
+def served_models(model_dir=MODEL_DIR):
+    from model_registry import ModelRegistry
+
+    if not all(os.path.exists(os.path.join(artifact_dir(model_dir), fname)) for fname in ARTIFACTS.values()):
+        return None
+    return ModelRegistry(model_dir).load_all()
+
+
+# ---------------- VERSIONS ----------------
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def new_version(out_dir):
+    version = datetime.now().strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while os.path.exists(os.path.join(out_dir, version)):
+        suffix += 1
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+    return version
+
+
+def save_version(out_dir, version, models, manifest):
+    import joblib
+    import compact_forest
+
+    directory = os.path.join(out_dir, version)
+    os.makedirs(directory)
+    for name, fname in ARTIFACTS.items():
+        joblib.dump(models[name], os.path.join(directory, fname))
+    start = time.perf_counter()
+    compact_forest.export(directory)
+    manifest["timings"]["export_s"] = round(time.perf_counter() - start, 3)
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return directory
+
+
+def promote(version, out_dir=TRAINING_DIR, model_dir=MODEL_DIR, force=False):
+    directory = os.path.join(out_dir, version)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"no trained version {version!r} in {out_dir}")
+    if not manifest["check"]["passed"] and not force:
+        raise ValueError(f"{version} failed its accuracy check: {'; '.join(manifest['check']['failures'])}")
+    # One pointer, swapped atomically: the registry serves either the old
+    # version's set or the new one's, never a mix
+    target = os.path.join(model_dir, CURRENT_FILE)
+    with open(target + ".tmp", "w") as f:
+        json.dump({"version": version, "directory": os.path.relpath(os.path.abspath(directory), model_dir)}, f)
+    os.replace(target + ".tmp", target)
+    return manifest
+
+
+# ---------------- TRAINING ----------------
+def train(csv_path=None, out_dir=TRAINING_DIR, model_dir=MODEL_DIR, jobs=1, incremental=False, base=None,
+          since=None, add_trees=20, run_search=True, n_estimators=N_ESTIMATORS, tolerance=0.01,
+          holdout=HOLDOUT_FRACTION):
+    import joblib
+
+    timings = {}
+    started = time.perf_counter()
+    base_dir = os.path.join(out_dir, base) if base else artifact_dir(model_dir)
+    if incremental:
+        base_models = {name: joblib.load(os.path.join(base_dir, fname)) for name, fname in ARTIFACTS.items()}
+        base_manifest = read_manifest(base_dir)
+        if since is None and base_manifest is not None:
+            since = base_manifest["data"]["last"]
+
+    start = time.perf_counter()
+    df = load_history(csv_path, since)
+    labelled = set(LABEL_COLUMNS) <= set(df.columns)
+    df = add_labels(df)
+    timings["load_s"] = round(time.perf_counter() - start, 3)
+    if len(df) < 2:
+        raise ValueError(f"{len(df)} labelled readings" + (f" after {since}" if since else "") + "; nothing to train")
+
+    start = time.perf_counter()
+    encoders = {name: base_models[name] for name in ("location_ohe", "date_encoder", "time_encoder", "traffic_le")} \
+        if incremental else fit_encoders(df)
+    X, y = build_matrix(encoders, df)
+    train_rows, holdout_rows = split_holdout(len(df), holdout)
+    X_train, X_holdout = X.iloc[train_rows], X.iloc[holdout_rows]
+    y_train = {name: values[train_rows] for name, values in y.items()}
+    y_holdout = {name: values[holdout_rows] for name, values in y.items()}
+    timings["features_s"] = round(time.perf_counter() - start, 3)
+
+    search_results = {}
+    if incremental:
+        # Grow on the train part for the check, then on the whole window
+        start = time.perf_counter()
+        checked = dict(encoders)
+        for name in ("traffic_model", "vehicle_model"):
+            checked[name] = grow(base_models[name], X_train, y_train[name], add_trees, jobs)
+        timings["check_fit_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        models = dict(encoders)
+        for name in ("traffic_model", "vehicle_model"):
+            models[name] = grow(base_models[name], X, y[name], add_trees, jobs)
+        timings["fit_s"] = round(time.perf_counter() - start, 3)
+        params = {name: {"add_trees": add_trees, "n_estimators": models[name].n_estimators}
+                  for name in ("traffic_model", "vehicle_model")}
+    else:
+        start = time.perf_counter()
+        space = SEARCH_SPACE if run_search else {name: grid[:1] for name, grid in SEARCH_SPACE.items()}
+        ranked = search(X_train, y_train, X_holdout, y_holdout, space, jobs, n_estimators)
+        timings["search_s"] = round(time.perf_counter() - start, 3)
+        search_results = {name: [{"params": p, "score": round(v, 4), "fit_s": round(s, 3)} for p, v, s in rows]
+                          for name, rows in ranked.items()}
+        start = time.perf_counter()
+        checked = dict(encoders)
+        models = dict(encoders)
+        params = {}
+        for name in ("traffic_model", "vehicle_model"):
+            params[name] = ranked[name][0][0]
+            checked[name] = finish(make_forest(name, params[name], jobs, n_estimators).fit(X_train, y_train[name]))
+            models[name] = finish(make_forest(name, params[name], jobs, n_estimators).fit(X, y[name]))
+        timings["fit_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    holdout_df = df.iloc[holdout_rows]
+    served = base_models if incremental else served_models(model_dir)
+    fair = unseen_rows(served, holdout_df) if served is not None else holdout_df.iloc[:0]
+    if len(fair) or incremental:
+        # Incremental runs fall back to the base on the whole holdout
+        rows = fair if len(fair) else holdout_df
+        metrics = {"candidate": evaluate(checked, rows), "reference": evaluate(served, rows)}
+        reference = f"{'base' if incremental else 'served'} models on {len(rows):,} holdout rows" + \
+            (" they never trained on" if len(fair) else "")
+    else:
+        metrics = {"candidate": evaluate(checked, holdout_df),
+                   "reference": {"traffic_accuracy": shipped_score(ranked, "traffic_model"),
+                                 "count_mae": shipped_score(ranked, "vehicle_model")}}
+        reference = f"shipped parameters refitted on the training split, {len(holdout_df):,} holdout rows"
+    failures = compare(metrics["candidate"], metrics["reference"], tolerance)
+    timings["check_s"] = round(time.perf_counter() - start, 3)
+    timings["total_s"] = round(time.perf_counter() - started, 3)
+
+    version = new_version(out_dir)
+    manifest = {
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "mode": "incremental" if incremental else "full",
+        "base": (base or os.path.abspath(base_dir)) if incremental else None,
+        "source": os.path.abspath(csv_path) if csv_path else "history store",
+        "data": {"rows": len(df), "train_rows": len(X_train), "holdout_rows": len(X_holdout),
+                 "first": str(df["timestamp"].iloc[0]), "last": str(df["timestamp"].iloc[-1]),
+                 "labels": "columns" if labelled else "speed_ratio"},
+        "jobs": jobs,
+        "params": params,
+        "search": search_results,
+        "metrics": metrics,
+        "check": {"passed": not failures, "reference": reference, "tolerance": tolerance, "failures": failures},
+        "timings": timings,
+        "peak_rss_mb": {"main": round(peak_rss_mb(), 1),
+                        "workers": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1)},
+    }
+    save_version(out_dir, version, models, manifest)
+    return manifest
+
+
+def print_manifest(manifest):
+    data, metrics = manifest["data"], manifest["metrics"]
+    print(f"{manifest['version']} ({manifest['mode']}): {data['rows']:,} rows "
+          f"({data['first']} .. {data['last']}), labels from {data['labels']}")
+    for name, params in manifest["params"].items():
+        print(f"  {name}: {params}")
+    for label, values in metrics.items():
+        print(f"  {label:<10} traffic accuracy {values['traffic_accuracy']:.3f}  count MAE {values['count_mae']:.2f}")
+    timings = ", ".join(f"{k[:-2]} {v:.1f}s" for k, v in manifest["timings"].items())
+    print(f"  {timings}; peak RSS {manifest['peak_rss_mb']['main']:.0f} MB "
+          f"(workers {manifest['peak_rss_mb']['workers']:.0f} MB)")
+    check = manifest["check"]
+    print(f"  accuracy check against {check['reference']}: "
+          + ("passed" if check["passed"] else "FAILED - " + "; ".join(check["failures"])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train, version and promote the prediction models")
+    parser.add_argument("--out", default=TRAINING_DIR, help="directory holding the trained versions")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="directory the app loads models from")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="train a new version")
+    train_cmd.add_argument("--csv", help="train from a CSV instead of the history store")
+    train_cmd.add_argument("--sync", action="store_true", help="sync vehicle_data.csv into the store first")
+    train_cmd.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    train_cmd.add_argument("--no-search", action="store_true", help="fit the shipped parameters only")
+    train_cmd.add_argument("--trees", type=int, default=N_ESTIMATORS)
+    train_cmd.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION)
+    train_cmd.add_argument("--tolerance", type=float, default=0.01)
+    train_cmd.add_argument("--incremental", action="store_true", help="add trees to the base models")
+    train_cmd.add_argument("--base", help="version to grow (default: the served models)")
+    train_cmd.add_argument("--since", help="train on readings after this timestamp "
+                                           "(incremental default: the base's last reading)")
+    train_cmd.add_argument("--add-trees", type=int, default=20)
+    train_cmd.add_argument("--promote", action="store_true", help="promote the version if its check passes")
+    promote_cmd = sub.add_parser("promote", help="serve a version from the model directory")
+    promote_cmd.add_argument("version")
+    promote_cmd.add_argument("--force", action="store_true", help="promote even if the accuracy check failed")
+    sub.add_parser("list", help="trained versions")
+    args = parser.parse_args()
+
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    if args.command == "list":
+        served = read_current(args.model_dir)
+        versions = sorted(os.listdir(args.out)) if os.path.isdir(args.out) else []
+        for version in versions:
+            manifest = read_manifest(os.path.join(args.out, version))
+            if manifest is None:
+                continue
+            candidate = manifest["metrics"]["candidate"]
+            print(f"{version:<20} {manifest['mode']:<12} {manifest['data']['rows']:>10,} rows  "
+                  f"acc {candidate['traffic_accuracy']:.3f}  MAE {candidate['count_mae']:>6.2f}  "
+                  f"{'ok' if manifest['check']['passed'] else 'FAILED':<6}"
+                  f"{'  served' if served and served['version'] == version else ''}")
+        return
+
+    if args.command == "promote":
+        try:
+            manifest = promote(args.version, args.out, args.model_dir, args.force)
+        except (FileNotFoundError, ValueError) as e:
+            sys.exit(str(e))
+        print(f"promoted {manifest['version']} to {args.model_dir}")
+        return
+
+    if args.sync:
+        from history_store import get_store
+        get_store().sync_csv()
+    try:
+        manifest = train(args.csv, args.out, args.model_dir, args.jobs, args.incremental, args.base, args.since,
+                         args.add_trees, not args.no_search, args.trees, args.tolerance, args.holdout)
+    except ValueError as e:
+        sys.exit(str(e))
+    print_manifest(manifest)
+    if args.promote:
+        if not manifest["check"]["passed"]:
+            sys.exit(f"not promoting {manifest['version']}: accuracy check failed")
+        promote(manifest["version"], args.out, args.model_dir)
+        print(f"promoted {manifest['version']} to {args.model_dir}")
+
+
+if __name__ == "__main__":
+    main()
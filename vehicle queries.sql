@@ -19,6 +19,8 @@ CREATE TABLE traffic_data (
 );
 SELECT * FROM traffic_data;
 
+-- NOTE: superseded by geo_tagging.py (nearest location in locations.json with an
+-- explicit "Unknown" bucket; run `python geo_tagging.py retag`). Kept for reference.
 UPDATE traffic_data
 SET location_name = CASE 
     -- 1. Taj Mahal
@@ -70,6 +72,10 @@ END;
 
 
 
+-- NOTE: the reports below are also answered from the history store's rollup cubes
+-- (per location/date/hour, kept current on every ingest): `python rollup_queries.py`,
+-- `python rollup_queries.py verify` checks them against these full-table scans.
+
 -- Total records count:
 SELECT COUNT(*) AS total_records FROM traffic_data;
 
@@ -0,0 +1,549 @@
+"""
+Local inference/data service: predictions, the live snapshot and history
+aggregates over HTTP, backed by the model registry, the flow cache and the
+history store.
+
+    python vision_service.py --port 8600 --workers 4
+    VISION_SERVICE_URL=http://127.0.0.1:8600 streamlit run app.py
+
+The parent process loads every model (compiling the compact forests), warms
+the prediction cache, trains the short-term forecaster and binds the socket
+before forking the workers, so all of them serve from one copy of that memory
+(copy-on-write pages that are only ever read) and accept connections on the
+same listening socket. Each worker counts its own prediction cache hits.
+
+The live state has a single owner: the parent keeps the flow cache (and its
+fetcher threads), the rolling trend window and the anomaly detector (with its
+checkpoint and alert log) and serves them to the workers on a private
+localhost socket, bound before the fork. Upstream calls, trends and alerts
+are the same whichever worker answers.
+
+The dashboard talks to get_backend(): a ServiceClient when VISION_SERVICE_URL
+is set, so any number of Streamlit processes can share one service without
+loading models themselves, otherwise a LocalBackend running in-process.
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+from datetime import date as date_cls, datetime, time as time_cls
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import requests
+
+from live_fetch import FlowFetcher, FlowResult, TOMTOM_API_KEY
+from live_monitor import LiveWindow
+from location_catalog import get_catalog
+from prediction_cache import PREDICTION_WARM, PredictionCache
+
+# The LocalBackend imports models, the store and the forecaster (joblib,
+# sqlite, sklearn) where it first uses them, so a dashboard that only talks to
+# the service, or a page that only needs the live cache, never loads them
+
+SERVICE_URL = os.environ.get("VISION_SERVICE_URL") or None
+SERVICE_PORT = int(os.environ.get("VISION_SERVICE_PORT", 8600))
+SERVICE_TIMEOUT = float(os.environ.get("VISION_SERVICE_TIMEOUT", 30))
+
+# Frame columns that travel as ISO strings and are parsed back by the client
+DATETIME_COLUMNS = ("as_of", "target_time")
+
+
+class ServiceError(Exception):
+    pass
+
+
+# ---------------- IN-PROCESS BACKEND ----------------
+class LocalBackend:
+    def __init__(self, registry=None, store=None, api_key=TOMTOM_API_KEY, catalog=None, live=None):
+        self._registry = registry
+        self._store = store
+        self.catalog = catalog or get_catalog()
+        self.predictions = PredictionCache()
+        self.live_window = LiveWindow()
+        self.api_key = api_key
+        # Backend owning the live state (the service's parent), when not this one
+        self.live = live
+        self._flow_cache = None
+        self._forecaster = None
+        self._anomalies = None
+        self._lock = threading.Lock()
+
+    @property
+    def registry(self):
+        if self._registry is None:
+            from model_registry import get_registry
+            self._registry = get_registry()
+        return self._registry
+
+    @property
+    def store(self):
+        if self._store is None:
+            from history_store import get_store
+            self._store = get_store()
+        return self._store
+
+    def _models(self):
+        from feature_encoding import FeatureEncoder
+        # (version, models, encoder) of one consistent model set
+        snapshot = self.registry.snapshot()
+        version, models = snapshot
+        aliases = self.catalog.aliases()
+        encoder = self.registry.derived(
+            "feature_encoder", lambda models: FeatureEncoder.from_models(models, location_aliases=aliases), snapshot)
+        # Precompute today's and tomorrow's predictions once per model version
+        # and day (on startup, after a reload and after midnight)
+        warm_key = (version, date_cls.today())
+        if PREDICTION_WARM and self.predictions.warmed != warm_key:
+            with self._lock:
+                if self.predictions.warmed != warm_key:
+                    self.predictions.warm(models, encoder, warm_key[0], warm_key[1])
+        return version, models, encoder
+
+    def model_info(self):
+        version, _, _ = self._models()
+        return version, pd.DataFrame(self.registry.stats())
+
+    def predict(self, location, date_value, time_value):
+        # (traffic level, vehicle count) for one Prediction page input,
+        # memoized by encoded feature row and model version
+        version, models, encoder = self._models()
+        return self.predictions.predict(models, encoder, version, location, date_value, time_value)
+
+    def prediction_stats(self):
+        return self.predictions.stats()
+
+    def predict_many(self, locations, dates, times):
+        from batch_predict import predict_batch
+        _, models, encoder = self._models()
+        return predict_batch(models, locations, dates, times, encoder=encoder)
+
+    def forecast_grid(self, locations, start_date, days=1, freq_minutes=60):
+        from batch_predict import forecast_grid
+        _, models, encoder = self._models()
+        return forecast_grid(models, locations, start_date, days, freq_minutes, encoder=encoder)
+
+    @property
+    def flow_cache(self):
+        # Created on first use, i.e. after the fork (in the parent) in a
+        # pre-forked service, since the fetcher owns a thread pool
+        if self._flow_cache is None:
+            with self._lock:
+                if self._flow_cache is None:
+                    from flow_cache import FlowCache
+                    self._flow_cache = FlowCache(FlowFetcher(self.api_key))
+        return self._flow_cache
+
+    @property
+    def anomalies(self):
+        # Loaded from its checkpoint on first use (before the fork when warmed)
+        if self._anomalies is None:
+            with self._lock:
+                if self._anomalies is None:
+                    from anomaly_detector import AnomalyDetector
+                    self._anomalies = AnomalyDetector.load()
+        return self._anomalies
+
+    def live_snapshot(self, ids=None):
+        # (FlowResults for the catalog's live locations, or the given ids in
+        # order, cache counters incl. its TTL)
+        if self.live is not None:
+            return self.live.live_snapshot(ids)
+        results = self.flow_cache.get_many(self.catalog.live_points(ids))
+        self.live_window.add(results)
+        self.anomalies.observe_results(results)
+        self.anomalies.observe_store(self.store)
+        return results, {**self.flow_cache.stats(), "ttl": self.flow_cache.ttl}
+
+    def alerts(self, limit=50, since=None):
+        # Newest anomaly alerts first, optionally from `since` ("YYYY-MM-DD HH:MM:SS") on
+        if self.live is not None:
+            return self.live.alerts(limit, since)
+        from anomaly_detector import Alert
+        self.anomalies.observe_store(self.store)
+        return pd.DataFrame(self.anomalies.alerts(limit, since), columns=Alert._fields)
+
+    def live_trends(self, names):
+        # {name: recent current speeds} from the rolling window every viewer shares
+        if self.live is not None:
+            return self.live.live_trends(names)
+        return self.live_window.trends(names)
+
+    def location_names(self):
+        self.store.sync_csv()
+        return self.store.location_names()
+
+    def hourly_profile(self, filters=None):
+        # All history from hourly_agg; a HistoryFilter slice from its partitions
+        self.store.sync_csv()
+        from history_query import hourly_profile, is_filtered
+        if not is_filtered(filters):
+            return self.store.hourly_profile()
+        return hourly_profile(filters, self.store)
+
+    def history_filters(self):
+        self.store.sync_csv()
+        from history_query import filter_options
+        return filter_options(self.store)
+
+    def percentiles(self, filters=None, hours=None):
+        # p50/p90/p99 per metric for a slice, merged from the quantile sketches
+        self.store.sync_csv()
+        from history_query import percentiles
+        return percentiles(filters, hours, store=self.store)
+
+    def latest_live_readings(self):
+        return self.store.latest_live_readings()
+
+    def report(self, name, start=None, end=None):
+        from rollup_queries import run_report
+        return run_report(name, self.store, start=start, end=end)
+
+    def _flow_forecaster(self):
+        # Trained once per process; its lag windows catch up on every outlook
+        if self._forecaster is None:
+            with self._lock:
+                if self._forecaster is None:
+                    from flow_forecast import FlowForecaster
+                    self._forecaster = FlowForecaster.train_from_store(self.store)
+        return self._forecaster
+
+    def outlook(self):
+        # (15/30/60-minute forecasts per location, forecaster training stats)
+        forecaster, windows = self._flow_forecaster()
+        windows.catch_up(self.store)
+        return forecaster.forecast(windows), pd.DataFrame(forecaster.train_stats)
+
+    def warm(self):
+        # Everything worth sharing between forked workers, loaded up front
+        self.store.sync_csv()
+        self.anomalies.observe_store(self.store)
+        locations = self.store.location_names()
+        if locations:
+            # The first predict compiles the compact forests' lookup tables
+            self.forecast_grid(locations[:1], date_cls.today())
+            self._flow_forecaster()
+        else:
+            self._models()
+        # Workers open their own SQLite connections
+        self.store.close()
+
+
+# ---------------- HTTP CLIENT ----------------
+def _label(value, fmt):
+    # Dates/times as the encoder's string labels, so both backends encode alike
+    return value.strftime(fmt) if isinstance(value, (date_cls, time_cls, datetime)) else value
+
+
+def _frame_payload(df):
+    return json.loads(df.to_json(orient="split", index=False, date_format="iso"))
+
+
+def _filter_params(filters):
+    if filters is None:
+        return {}
+    return {"start": _label(filters.start, "%Y-%m-%d"), "end": _label(filters.end, "%Y-%m-%d"),
+            "location": list(filters.locations or ()), "frc": list(filters.frcs or ())}
+
+
+def _frame(payload):
+    df = pd.DataFrame(payload["data"], columns=payload["columns"])
+    for column in DATETIME_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+class ServiceClient:
+    def __init__(self, base_url=SERVICE_URL, timeout=SERVICE_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # One keep-alive session per thread (one per Streamlit session)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _call(self, path, params=None, payload=None):
+        url = self.base_url + path
+        if payload is None:
+            response = self._session().get(url, params=params, timeout=self.timeout)
+        else:
+            response = self._session().post(url, json=payload, timeout=self.timeout)
+        body = response.json()
+        if response.status_code != 200:
+            raise ServiceError(body.get("error", f"HTTP {response.status_code}"))
+        return body
+
+    def health(self):
+        return self._call("/health")
+
+    def model_info(self):
+        body = self._call("/models")
+        return body["version"], _frame(body["stats"])
+
+    def predict(self, location, date_value, time_value):
+        body = self._call("/predict", {"location": location, "date": _label(date_value, "%Y-%m-%d"),
+                                       "time": _label(time_value, "%H:%M")})
+        return body["traffic_level"], body["vehicle_count"]
+
+    def prediction_stats(self):
+        return self._call("/predictions/stats")
+
+    def predict_many(self, locations, dates, times):
+        payload = {"locations": list(locations), "dates": [_label(d, "%Y-%m-%d") for d in dates],
+                   "times": [_label(t, "%H:%M") for t in times]}
+        return _frame(self._call("/predict", payload=payload)["predictions"])
+
+    def forecast_grid(self, locations, start_date, days=1, freq_minutes=60):
+        params = {"location": list(locations), "start": _label(start_date, "%Y-%m-%d"),
+                  "days": days, "freq": freq_minutes}
+        return _frame(self._call("/forecast", params)["forecast"])
+
+    def live_snapshot(self, ids=None):
+        body = self._call("/live", None if ids is None else {"id": list(ids)})
+        return [FlowResult(**r) for r in body["results"]], body["stats"]
+
+    def live_trends(self, names):
+        return self._call("/live/trends", {"name": list(names)})["trends"]
+
+    def alerts(self, limit=50, since=None):
+        return _frame(self._call("/alerts", {"limit": limit, "since": since})["alerts"])
+
+    def location_names(self):
+        return self._call("/history/locations")["locations"]
+
+    def hourly_profile(self, filters=None):
+        return _frame(self._call("/history/hourly", _filter_params(filters))["hourly"])
+
+    def history_filters(self):
+        return self._call("/history/filters")
+
+    def percentiles(self, filters=None, hours=None):
+        params = {**_filter_params(filters), "hour": list(hours or ())}
+        return _frame(self._call("/history/percentiles", params)["percentiles"])
+
+    def latest_live_readings(self):
+        return _frame(self._call("/history/latest")["readings"])
+
+    def report(self, name, start=None, end=None):
+        return _frame(self._call(f"/reports/{name}", {"start": start, "end": end})["report"])
+
+    def outlook(self):
+        body = self._call("/outlook")
+        return _frame(body["outlook"]), _frame(body["train_stats"])
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = ServiceClient(SERVICE_URL) if SERVICE_URL else LocalBackend()
+    return _backend
+
+
+# ---------------- HTTP SERVER ----------------
+def _arg(params, name, default=KeyError, cast=str):
+    values = params.get(name)
+    if not values:
+        if default is KeyError:
+            raise KeyError(f"missing parameter '{name}'")
+        return default
+    return cast(values[-1])
+
+
+def _health(backend, params, payload):
+    return {"pid": os.getpid(), "model_version": backend.registry.version}
+
+
+def _models(backend, params, payload):
+    version, stats = backend.model_info()
+    return {"version": version, "stats": _frame_payload(stats)}
+
+
+def _predict(backend, params, payload):
+    if payload is None:
+        traffic_level, vehicle_count = backend.predict(_arg(params, "location"), _arg(params, "date"),
+                                                       _arg(params, "time"))
+        return {"traffic_level": traffic_level, "vehicle_count": vehicle_count}
+    predictions = backend.predict_many(payload["locations"], payload["dates"], payload["times"])
+    return {"predictions": _frame_payload(predictions)}
+
+
+def _forecast(backend, params, payload):
+    locations = params.get("location") or backend.location_names()
+    forecast = backend.forecast_grid(locations, _arg(params, "start"), _arg(params, "days", 1, int),
+                                     _arg(params, "freq", 60, int))
+    return {"forecast": _frame_payload(forecast)}
+
+
+def _live(backend, params, payload):
+    results, stats = backend.live_snapshot(params.get("id"))
+    return {"results": [{**r._asdict(), "error": None if r.error is None else str(r.error)} for r in results],
+            "stats": stats}
+
+
+def _alerts(backend, params, payload):
+    alerts = backend.alerts(_arg(params, "limit", 50, int), _arg(params, "since", None))
+    return {"alerts": _frame_payload(alerts)}
+
+
+def _history_filter(params):
+    from history_query import HistoryFilter
+    return HistoryFilter(_arg(params, "start", None), _arg(params, "end", None),
+                         params.get("location"), params.get("frc"))
+
+
+def _hourly(backend, params, payload):
+    return {"hourly": _frame_payload(backend.hourly_profile(_history_filter(params)))}
+
+
+def _percentiles(backend, params, payload):
+    hours = [int(hour) for hour in params.get("hour", [])]
+    return {"percentiles": _frame_payload(backend.percentiles(_history_filter(params), hours))}
+
+
+def _outlook(backend, params, payload):
+    outlook, train_stats = backend.outlook()
+    return {"outlook": _frame_payload(outlook), "train_stats": _frame_payload(train_stats)}
+
+
+ROUTES = {
+    "/health": _health,
+    "/models": _models,
+    "/predict": _predict,
+    "/predictions/stats": lambda backend, params, payload: backend.prediction_stats(),
+    "/forecast": _forecast,
+    "/live": _live,
+    "/live/trends": lambda backend, params, payload: {"trends": backend.live_trends(params.get("name", []))},
+    "/alerts": _alerts,
+    "/outlook": _outlook,
+    "/history/locations": lambda backend, params, payload: {"locations": backend.location_names()},
+    "/history/hourly": _hourly,
+    "/history/filters": lambda backend, params, payload: backend.history_filters(),
+    "/history/percentiles": _percentiles,
+    "/history/latest": lambda backend, params, payload: {"readings": _frame_payload(backend.latest_live_readings())},
+}
+
+
+def _report(backend, name, params):
+    report = backend.report(name, _arg(params, "start", None), _arg(params, "end", None))
+    return {"report": _frame_payload(report)}
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    backend = None
+    # Keep-alive: each client session reuses one connection; headers and body
+    # are separate writes, so without TCP_NODELAY every reply waits ~40 ms
+    # for the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._handle(json.loads(self.rfile.read(length) or b"{}"))
+
+    def _handle(self, payload):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        try:
+            if url.path.startswith("/reports/"):
+                status, body = 200, _report(self.backend, url.path[len("/reports/"):], params)
+            elif url.path in ROUTES:
+                status, body = 200, ROUTES[url.path](self.backend, params, payload)
+            else:
+                status, body = 404, {"error": f"unknown endpoint {url.path}"}
+        except KeyError as e:
+            status, body = 400, {"error": str(e.args[0]) if e.args else "missing parameter"}
+        except ValueError as e:
+            status, body = 400, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for every dashboard session connecting at once
+    request_queue_size = 1024
+
+
+def serve(host="127.0.0.1", port=SERVICE_PORT, workers=1, backend=None, ready=None):
+    backend = backend or LocalBackend()
+    handler = type("ServiceHandler", (_ServiceHandler,), {"backend": backend})
+    server = _Server((host, port), handler)
+    backend.warm()
+    if ready is not None:
+        ready(server)
+    if workers <= 1:
+        server.serve_forever()
+        return
+
+    # Pre-fork: no threads exist yet, models are loaded and the sockets are
+    # bound. The parent serves the live state on its own socket; workers
+    # reach it through a client
+    live_server = _Server(("127.0.0.1", 0), handler)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                live_server.socket.close()
+                backend.live = ServiceClient(f"http://127.0.0.1:{live_server.server_port}")
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    server.socket.close()
+    threading.Thread(target=live_server.serve_forever, name="live-state", daemon=True).start()
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prediction, live snapshot and history API for the dashboard")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="forked worker processes sharing the loaded models")
+    args = parser.parse_args()
+
+    def ready(server):
+        print(f"serving on http://{args.host}:{server.server_port} with {args.workers} worker(s)", flush=True)
+
+    serve(args.host, args.port, args.workers, ready=ready)
+
+
+if __name__ == "__main__":
+    main()